@@ -1,54 +1,421 @@
+import hashlib
 import os
-import osmnx as ox
+import re
+import shutil
+import tempfile
+from functools import partial
+from multiprocessing import shared_memory
 import numpy as np
-import networkx as nx
-from shapely.geometry import Point, Polygon
-import geopandas as gpd
-import matplotlib.pyplot as plt
-from PIL import Image
-from pyproj import Transformer
+
+from SphereStats.boundary_index import DEFAULT_CACHE_DIR
+from SphereStats.csr_graph import CSRGraph, attach_arrays, shared_arrays, shortest_path_tree
+from SphereStats.distance_kernels import haversine
+from SphereStats.isochrone_batch import CHUNK_SIZE, origin_chunks, run_batch
+from SphereStats.lazy_imports import lazy_import
+
+ox = lazy_import('osmnx')
+nx = lazy_import('networkx')
+Point = lazy_import('shapely.geometry', 'Point')
+Polygon = lazy_import('shapely.geometry', 'Polygon')
+wkb = lazy_import('shapely.wkb')
+shapely = lazy_import('shapely')
+gpd = lazy_import('geopandas')
+plt = lazy_import('matplotlib.pyplot')
+Image = lazy_import('PIL.Image')
+Transformer = lazy_import('pyproj', 'Transformer')
+
+# The KD-tree index pulls in scipy, which alone takes longer to import than the rest
+SphereIndex = lazy_import('SphereStats.spatial_index', 'SphereIndex')
+
+CITY = 'New York City, USA'
+
+# Bump when the snapshot layout changes so stale cached downloads are fetched again
+SNAPSHOT_VERSION = 2
+
+# Speeds in km/h per OSM highway class; 'default' covers every other class and
+# a speed of 0 closes a class to that mode. The 'maxspeed' profile uses the
+# edge's maxspeed tag where there is one and the drive speeds elsewhere, and
+# 'constant' is the flat 50 km/h that generate_isochrones used before profiles.
+# Any dict in the same format can be passed as a profile.
+DRIVE_SPEEDS = {
+    'motorway': 100, 'motorway_link': 60, 'trunk': 80, 'trunk_link': 50,
+    'primary': 60, 'primary_link': 40, 'secondary': 50, 'secondary_link': 40,
+    'tertiary': 40, 'tertiary_link': 30, 'residential': 30, 'unclassified': 30,
+    'living_street': 10, 'service': 20, 'default': 30,
+}
+SPEED_PROFILES = {
+    'walk': {'motorway': 0, 'motorway_link': 0, 'trunk': 0, 'trunk_link': 0, 'default': 5},
+    'bike': {'motorway': 0, 'motorway_link': 0, 'trunk': 0, 'trunk_link': 0, 'footway': 5,
+             'pedestrian': 5, 'steps': 2, 'default': 15},
+    'drive': DRIVE_SPEEDS,
+    'maxspeed': DRIVE_SPEEDS,
+    'constant': {'default': 50},
+}
+
+MPH = 1.609344
+
+
+def parse_maxspeed(value):
+    """
+    Speed in km/h of an OSM maxspeed tag such as '50', '25 mph' or a list of
+    them (simplified osmnx edges), nan when it holds no number.
+    """
+    if isinstance(value, (list, tuple)):
+        speeds = [parse_maxspeed(item) for item in value]
+        speeds = [speed for speed in speeds if not np.isnan(speed)]
+        return float(np.mean(speeds)) if speeds else np.nan
+    match = re.match(r'\s*([0-9]+(?:\.[0-9]+)?)\s*(mph)?', str(value))
+    if match is None:
+        return np.nan
+    return float(match.group(1)) * (MPH if match.group(2) else 1.0)
+
+
+def edge_speeds(highway, highway_classes, maxspeed, profile='drive'):
+    """
+    Speed in km/h of every edge under a profile, as one table lookup over the
+    edges' highway class codes.
+
+    Args:
+    highway: Highway class code of every edge
+    highway_classes: Class names the codes index
+    maxspeed: maxspeed tag of every edge in km/h (nan where missing)
+    profile: Name in SPEED_PROFILES or a {class: km/h, 'default': km/h} dict
+    """
+    speeds = SPEED_PROFILES[profile] if isinstance(profile, str) else profile
+    table = np.array([speeds.get(name, speeds['default']) for name in np.asarray(highway_classes).tolist()],
+                     dtype=np.float64)
+    result = table[np.asarray(highway)] if len(table) else np.zeros(len(highway))
+    if profile == 'maxspeed':
+        maxspeed = np.asarray(maxspeed)
+        result = np.where(np.isnan(maxspeed), result, maxspeed)
+    return result
+
+
+class StreetNetwork:
+    """
+    Road network held as NumPy arrays: node coordinates, edges in CSR order
+    (the outgoing edges of node i are targets[offsets[i]:offsets[i + 1]]) with
+    their length in metres, highway class and maxspeed tag, and the boundary
+    polygon of the area it was downloaded for.
+
+    Travel times for each speed profile are separate weight arrays, computed
+    once by travel_time() and kept in travel_times, so switching between
+    walking, cycling and driving never rewrites the graph. They are derived
+    from the current SPEED_PROFILES and never saved with a snapshot.
+
+    A snapshot is a directory of .npy files, which load() memory-maps so that
+    opening even a continent-scale network reads almost nothing up front.
+
+    Args:
+    osmid: OSM id of every node
+    lat, lon: Node coordinates in degrees
+    offsets, targets: CSR edge arrays (node positions, not OSM ids)
+    length: Edge lengths in metres
+    highway: Index into highway_classes for every edge
+    highway_classes: Names of the highway classes ('residential', 'primary', ...)
+    maxspeed: Edge maxspeed tags in km/h, nan where missing
+    boundary: shapely polygon of the area, or None
+    travel_times: Dict of profile name -> per-edge travel times in seconds
+    """
+
+    ARRAYS = ['osmid', 'lat', 'lon', 'offsets', 'targets', 'length', 'highway', 'highway_classes', 'maxspeed']
+
+    def __init__(self, osmid, lat, lon, offsets, targets, length, highway, highway_classes, maxspeed=None,
+                 boundary=None, travel_times=None):
+        self.osmid, self.lat, self.lon = osmid, lat, lon
+        self.offsets, self.targets, self.length = offsets, targets, length
+        self.highway, self.highway_classes = highway, highway_classes
+        self.maxspeed = np.full(len(targets), np.nan) if maxspeed is None else maxspeed
+        self.boundary = boundary
+        self.travel_times = {} if travel_times is None else travel_times
+
+    @property
+    def n_nodes(self):
+        return len(self.lat)
+
+    @property
+    def n_edges(self):
+        return len(self.targets)
+
+    @classmethod
+    def from_networkx(cls, G, boundary=None):
+        """Convert an osmnx (Multi)DiGraph with node x/y and edge length/highway attributes."""
+        nodes = list(G.nodes)
+        position = {node: i for i, node in enumerate(nodes)}
+        lon = np.array([G.nodes[node]['x'] for node in nodes], dtype=np.float64)
+        lat = np.array([G.nodes[node]['y'] for node in nodes], dtype=np.float64)
+
+        sources, targets, length, highway, maxspeed = [], [], [], [], []
+        for u, v, data in G.edges(data=True):
+            sources.append(position[u])
+            targets.append(position[v])
+            length.append(float(data.get('length', np.nan)))
+            road = data.get('highway', 'unclassified')
+            # Simplified osmnx edges merge ways and may list several classes
+            highway.append(road[0] if isinstance(road, list) else road)
+            maxspeed.append(parse_maxspeed(data.get('maxspeed')))
+
+        highway_classes, highway = np.unique(np.array(highway, dtype=str), return_inverse=True)
+        sources = np.asarray(sources, dtype=np.int64)
+        # Edges without a length get their straight-line length, not a free ride
+        length = np.asarray(length, dtype=np.float64)
+        missing = np.nonzero(np.isnan(length))[0]
+        ends = np.asarray(targets, dtype=np.int64)[missing]
+        length[missing] = haversine(lat[sources[missing]], lon[sources[missing]], lat[ends], lon[ends]) * 1000
+        order = np.argsort(sources, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=len(nodes)))])
+        osmid = np.array([node if isinstance(node, (int, np.integer)) else i for i, node in enumerate(nodes)],
+                         dtype=np.int64)
+        return cls(osmid, lat, lon, offsets, np.asarray(targets, dtype=np.int64)[order],
+                   length[order], highway.astype(np.int16)[order],
+                   highway_classes, np.asarray(maxspeed, dtype=np.float64)[order], boundary)
+
+    @classmethod
+    def from_graphml(cls, path, boundary=None):
+        """Read a GraphML file written by osmnx (ox.save_graphml)."""
+        return cls.from_networkx(ox.load_graphml(path), boundary)
+
+    def travel_time(self, profile='drive'):
+        """
+        Travel time in seconds of every edge under a speed profile (see
+        edge_speeds), inf on edges the profile closes. Named profiles are
+        computed once and kept in travel_times.
+        """
+        if isinstance(profile, str) and profile in self.travel_times:
+            return self.travel_times[profile]
+        speeds = edge_speeds(self.highway, self.highway_classes, self.maxspeed, profile)
+        with np.errstate(divide='ignore'):
+            times = np.asarray(self.length) / (speeds / 3.6)
+        if isinstance(profile, str):
+            self.travel_times[profile] = times
+        return times
+
+    def graph(self, weights='drive'):
+        """CSRGraph over the network with per-edge weights, or the travel times of a speed profile."""
+        if isinstance(weights, (str, dict)):
+            weights = self.travel_time(weights)
+        return CSRGraph(self.lat, self.lon, self.offsets, self.targets, weights)
+
+    def save(self, directory):
+        """
+        Write the network as a snapshot directory of .npy files. The files
+        are written to a fresh temporary directory next to it; an existing
+        snapshot is renamed aside and the new one renamed into place before
+        the old one is deleted, so a concurrent reader never sees a partially
+        written or half-deleted snapshot (the path is briefly missing between
+        the two renames, which readers treat as a cache miss). If another
+        process publishes a snapshot first, that one is kept.
+        """
+        parent = os.path.dirname(os.path.abspath(directory))
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=parent)
+        previous = None
+        try:
+            for name in self.ARRAYS:
+                np.save(os.path.join(staging, f"{name}.npy"), np.asarray(getattr(self, name)))
+            if self.boundary is not None:
+                np.save(os.path.join(staging, 'boundary.npy'),
+                        np.frombuffer(wkb.dumps(self.boundary), dtype=np.uint8))
+            if os.path.isdir(directory):
+                previous = tempfile.mkdtemp(prefix='.previous-', dir=parent)
+                try:
+                    os.replace(directory, previous)
+                except FileNotFoundError:
+                    pass  # Moved aside by a concurrent save
+            try:
+                os.replace(staging, directory)
+            except OSError:
+                # A concurrent save published its snapshot in between: keep it.
+                # Otherwise put the old snapshot back before failing.
+                if not os.path.isdir(directory):
+                    if previous is not None and os.listdir(previous):
+                        os.replace(previous, directory)
+                    raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+            if previous is not None:
+                shutil.rmtree(previous, ignore_errors=True)
+
+    def save_npz(self, path):
+        """Write the network as a single compressed .npz file (smaller, but loaded fully)."""
+        arrays = {name: np.asarray(getattr(self, name)) for name in self.ARRAYS}
+        if self.boundary is not None:
+            arrays['boundary'] = np.frombuffer(wkb.dumps(self.boundary), dtype=np.uint8)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Read a snapshot directory written by save() (memory-mapped unless
+        mmap is False) or an .npz file written by save_npz().
+        """
+        if os.path.isdir(path):
+            arrays = {name[:-4]: np.load(os.path.join(path, name), mmap_mode='r' if mmap else None)
+                      for name in os.listdir(path) if name.endswith('.npy')}
+        else:
+            with np.load(path) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+        boundary = arrays.pop('boundary', None)
+        if boundary is not None:
+            boundary = wkb.loads(bytes(boundary))
+        return cls(*(arrays[name] for name in cls.ARRAYS), boundary=boundary)
+
+
+def snapshot_path(place=CITY, network_type='drive', cache_dir=None):
+    """Cache directory of the snapshot of a downloaded network, keyed by place and network type."""
+    key = f"{place}|{network_type}|{SNAPSHOT_VERSION}"
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    name = re.sub(r'[^A-Za-z0-9]+', '-', place).strip('-').lower()
+    return os.path.join(cache_dir or DEFAULT_CACHE_DIR, f"{name}-{network_type}-{digest}.network")
+
+
+def download_network(place=CITY, network_type='drive'):
+    """Geocode place and download its simplified road network from OpenStreetMap."""
+    admin = ox.geocode_to_gdf(place)
+    boundary = admin.geometry.to_list()[0]
+    G = ox.graph_from_polygon(boundary, network_type=network_type, simplify=True)
+    return StreetNetwork.from_networkx(G, boundary)
+
+
+def load_network(source=None, place=CITY, network_type='drive', cache_dir=None, use_cache=True):
+    """
+    Road network for the isochrones, without network access whenever possible.
+
+    Args:
+    source: A StreetNetwork, a snapshot directory or .npz file, or a .graphml
+            file. When None, the network of place is loaded from the cache, or
+            downloaded and cached on the first call.
+    place, network_type: What to download (see osmnx.graph_from_polygon)
+    cache_dir: Directory for cached downloads (defaults to DEFAULT_CACHE_DIR)
+    use_cache: Set to False to always download and never write the cache
+
+    Returns:
+    StreetNetwork
+    """
+    if isinstance(source, StreetNetwork):
+        return source
+    if source is not None:
+        if str(source).lower().endswith('.graphml'):
+            return StreetNetwork.from_graphml(source)
+        return StreetNetwork.load(source)
+
+    path = snapshot_path(place, network_type, cache_dir) if use_cache else None
+    if path is not None and os.path.isdir(path):
+        try:
+            return StreetNetwork.load(path)
+        except (OSError, ValueError, KeyError):
+            pass  # Unreadable or partial snapshot, download again below
+
+    network = download_network(place, network_type)
+    if path is not None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        network.save(path)
+    return network
+
+
+def network_centre(network):
+    """(lon, lat) of the centroid of the network's boundary, or of its nodes without one."""
+    if network.boundary is None:
+        return float(np.mean(network.lon)), float(np.mean(network.lat))
+    admin = gpd.GeoSeries([network.boundary], crs="EPSG:4326")
+    admin_projected = admin.to_crs(admin.estimate_utm_crs())
+    centroid = admin_projected.centroid.iloc[0]
+    transformer = Transformer.from_crs(admin_projected.crs, "EPSG:4326", always_xy=True)
+    return transformer.transform(centroid.x, centroid.y)
+
+
+def isochrone_buckets(graph, source, thresholds):
+    """
+    Group the nodes of a CSRGraph by the first threshold within which they
+    are reached from source, with a single Dijkstra search cut off at the
+    largest threshold.
+
+    Args:
+    graph: CSRGraph with travel-time weights
+    source: Node id of the centre
+    thresholds: Increasing travel times, in the unit of the weights
+
+    Returns:
+    order: Ids of the reached nodes, sorted by travel time
+    counts: counts[i] nodes of order are reached within thresholds[i]
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    travel_times, _ = shortest_path_tree(graph, source, cutoff=thresholds.max())
+    order = np.nonzero(np.isfinite(travel_times))[0]
+    order = order[np.argsort(travel_times[order], kind='stable')]
+    counts = np.searchsorted(travel_times[order], thresholds, side='right')
+    return order, counts
+
+
+def isochrone_hulls(lon, lat, order, counts):
+    """
+    Convex hull of the nodes reached within each threshold (see
+    isochrone_buckets). Each hull is built from the previous hull's vertices
+    plus the newly reached nodes only, so many thresholds cost about as much
+    as one.
+
+    Returns:
+    List of shapely geometries, one per threshold (empty, point or line
+    geometries when fewer than three distinct nodes are reached)
+    """
+    hulls, vertices, previous = [], np.empty((0, 2)), 0
+    for count in counts:
+        bucket = order[previous:count]
+        points = np.concatenate([vertices, np.column_stack([lon[bucket], lat[bucket]])])
+        hull = shapely.multipoints(points).convex_hull
+        if hull.geom_type == 'Polygon':
+            vertices = np.asarray(hull.exterior.coords)[:-1]
+        elif not hull.is_empty:
+            vertices = shapely.get_coordinates(hull)
+        hulls.append(hull)
+        previous = count
+    return hulls
 
 
 # Skip plotting and gif creation in test mode
-def generate_isochrones(skip_plots=True):
+def generate_isochrones(skip_plots=True, source=None, place=CITY, network_type='drive', cache_dir=None,
+                        isochrone_times=None, profile='drive'):
+    """
+    Isochrone polygons around the centre of a road network.
+
+    The network comes from load_network: pass source (a StreetNetwork,
+    snapshot directory, .npz or .graphml file) to run without network access;
+    otherwise place is downloaded once and then read from the disk cache.
+
+    isochrone_times are the thresholds in minutes (default: 6 from 5 to 60).
+    All of them come from one bounded shortest-path search, so passing e.g.
+    60 thresholds for a smooth animation costs about the same as one.
+
+    profile sets the travel speeds: 'walk', 'bike', 'drive' (per highway
+    class), 'maxspeed' (posted limits where tagged), 'constant' (50 km/h on
+    every road) or a custom dict, see edge_speeds. The default 'drive' uses
+    per-class speeds, so its isochrones differ from the flat 50 km/h ones
+    this function produced before profiles; pass profile='constant' for those.
+    """
     # Output folder for frames
     folderout = 'frames'
     if not os.path.exists(folderout):
         os.makedirs(folderout)
 
-    # City configuration
-    city = 'New York City, USA'
-    admin = ox.geocode_to_gdf(city)
-    admin_projected = admin.to_crs(admin.estimate_utm_crs())
-    centroid = admin_projected.geometry.centroid.iloc[0]
-
-    # Transform centroid back to geographic coordinates
-    transformer = Transformer.from_crs(admin_projected.crs, "EPSG:4326", always_xy=True)
-    centroid_geo = Point(transformer.transform(centroid.x, centroid.y))
-
-    # Download the road network
-    G = ox.graph_from_polygon(admin.geometry.to_list()[0], network_type='drive', simplify=True)
+    network = load_network(source, place=place, network_type=network_type, cache_dir=cache_dir)
+    centre_lon, centre_lat = network_centre(network)
 
     # Find the nearest node to the centroid
-    center_node = ox.distance.nearest_nodes(G, centroid_geo.x, centroid_geo.y)
+    center_node = int(SphereIndex(np.column_stack([network.lat, network.lon])).query_knn([centre_lat, centre_lon])[1])
 
-    # Calculate travel time for each edge
-    walking_speed = 50 / 3.6  # Convert to meters per second
-    for u, v, data in G.edges(data=True):
-        data['travel_time'] = data['length'] / walking_speed
+    # Travel time of each edge under the speed profile, in seconds
+    G = network.graph(profile)
 
     # Isochrone times (in minutes)
-    isochrone_times = np.linspace(5, 60, 6)  # Divide into 6 evenly spaced times
-    isochrone_polys = []
-
-    for time in isochrone_times:
-        subgraph = nx.ego_graph(G, center_node, radius=time * 60, distance='travel_time')
-        node_points = [Point((data['x'], data['y'])) for node, data in subgraph.nodes(data=True)]
-        polygon = Polygon(gpd.GeoSeries(node_points).union_all().convex_hull)
+    if isochrone_times is None:
+        isochrone_times = np.linspace(5, 60, 6)  # Divide into 6 evenly spaced times
+    isochrone_times = np.sort(np.asarray(isochrone_times, dtype=np.float64))
 
+    order, counts = isochrone_buckets(G, center_node, isochrone_times * 60)
+    isochrone_polys = []
+    for hull in isochrone_hulls(network.lon, network.lat, order, counts):
         # Ensure the polygon is valid
-        if polygon.is_valid:
-            isochrone_polys.append(polygon)
+        if hull.geom_type == 'Polygon' and hull.is_valid:
+            isochrone_polys.append(hull)
 
     if not isochrone_polys:
         print("Error: No valid isochrone polygons generated.")
@@ -78,6 +445,86 @@ def generate_isochrones(skip_plots=True):
     print(f'Animation saved at {gif_path}')
 
 
+def hull_records(graph, task):
+    """
+    (origin, threshold, hull) records for a task (first, nodes, isochrone_times)
+    covering a chunk of origin nodes, numbered from first.
+    """
+    first, nodes, isochrone_times = task
+    records = []
+    for origin, node in enumerate(nodes.tolist(), first):
+        order, counts = isochrone_buckets(graph, node, isochrone_times * 60)
+        hulls = isochrone_hulls(graph.lon, graph.lat, order, counts)
+        records.extend(zip([origin] * len(hulls), isochrone_times.tolist(), hulls))
+    return records
+
+
+def hull_records_worker(task):
+    """Process-pool worker: attach to the shared graph arrays and build the hulls of a chunk of origins."""
+    segment_name, layout, first, nodes, isochrone_times = task
+    segment = shared_memory.SharedMemory(name=segment_name)
+    try:
+        arrays = attach_arrays(segment, layout)
+        graph = CSRGraph(arrays['lat'], arrays['lon'], arrays['offsets'], arrays['targets'], arrays['weights'])
+        records = hull_records(graph, (first, nodes, isochrone_times))
+        # Views into the shared buffer must be released before closing it
+        del arrays, graph
+    finally:
+        segment.close()
+    return records
+
+
+def batch_isochrones(origins, isochrone_times=None, source=None, place=CITY, network_type='drive', cache_dir=None,
+                     profile='drive', workers=1, output=None, chunk_size=CHUNK_SIZE):
+    """
+    Isochrone hulls around many origins on one road network.
+
+    The network is loaded and weighted once (see generate_isochrones for
+    source, place, network_type, cache_dir and profile) and every origin is
+    snapped to its nearest node in one spatial-index query. With workers > 1
+    the graph arrays are put in multiprocessing shared memory and chunks of
+    origins are spread over a process pool. If output (a .gpkg path) is
+    given, each chunk is written to disk as soon as it finishes (see
+    isochrone_batch.run_batch).
+
+    Args:
+    origins: (n, 2) array of (lat, lon) origins
+    isochrone_times: Thresholds in minutes shared by every origin (default: 6 from 5 to 60)
+
+    Returns:
+    GeoDataFrame of convex hulls indexed by (origin, threshold), where origin
+    is the row of origins; an origin that reaches fewer than three nodes
+    gets point or line geometries
+    """
+    network = load_network(source, place=place, network_type=network_type, cache_dir=cache_dir)
+    G = network.graph(profile)
+    if isochrone_times is None:
+        isochrone_times = np.linspace(5, 60, 6)
+    isochrone_times = np.sort(np.asarray(isochrone_times, dtype=np.float64))
+
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    nodes = np.empty(0, dtype=np.int64)
+    if len(origins):
+        _, nodes = SphereIndex(np.column_stack([network.lat, network.lon])).query_knn(origins)
+        nodes = np.asarray(nodes, dtype=np.int64).reshape(-1)
+    chunks = origin_chunks(len(origins), chunk_size)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(chunks) < 2:
+        tasks = [(rows.start, nodes[rows], isochrone_times) for rows in chunks]
+        return run_batch(partial(hull_records, G), tasks, output=output)
+
+    segment, layout = shared_arrays({'lat': G.lat, 'lon': G.lon, 'offsets': G.offsets, 'targets': G.targets,
+                                     'weights': G.weights})
+    try:
+        tasks = [(segment.name, layout, rows.start, nodes[rows], isochrone_times) for rows in chunks]
+        return run_batch(hull_records_worker, tasks, workers, output)
+    finally:
+        segment.close()
+        segment.unlink()
+
+
 # Example test for generating isochrones
 def test_generate_isochrones():
     # Call generate_isochrones with skip_plots=True
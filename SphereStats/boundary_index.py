@@ -0,0 +1,107 @@
+# SphereStats/boundary_index.py
+
+import hashlib
+import os
+import pickle
+
+import numpy as np
+
+from SphereStats.distance_kernels import EARTH_RADIUS
+from SphereStats.segment_distance import SegmentIndex, ring_segments
+from SphereStats.lazy_imports import lazy_import
+
+shpreader = lazy_import('cartopy.io.shapereader')
+
+# Built indexes are stored here unless a cache_dir is given
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'SphereStats')
+
+# Bump when the pickled SegmentIndex layout changes so stale caches are rebuilt
+CACHE_VERSION = 1
+
+
+def geometry_lines(geometry):
+    """
+    Yield the vertex sequences of a shapely geometry as [[lat, lon], ...]
+    arrays, together with whether each one is a closed ring. Polygons yield
+    their exterior and interior rings, lines yield themselves.
+    """
+    kind = geometry.geom_type
+    if kind == 'Polygon':
+        for ring in [geometry.exterior, *geometry.interiors]:
+            yield np.asarray(ring.coords)[:, 1::-1], True
+    elif kind == 'LineString':
+        yield np.asarray(geometry.coords)[:, 1::-1], False
+    elif kind == 'LinearRing':
+        yield np.asarray(geometry.coords)[:, 1::-1], True
+    elif kind.startswith('Multi') or kind == 'GeometryCollection':
+        for part in geometry.geoms:
+            yield from geometry_lines(part)
+
+
+def geometry_segments(geometries):
+    """
+    Collect the boundary segments of an iterable of shapely geometries
+    (coordinates in lon/lat degrees) as (starts, ends) arrays of [lat, lon].
+    """
+    starts, ends = [np.empty((0, 2))], [np.empty((0, 2))]
+    for geometry in geometries:
+        if geometry is None:
+            continue
+        for vertices, closed in geometry_lines(geometry):
+            if closed:
+                start, end = ring_segments(vertices)
+            else:
+                start, end = vertices[:-1], vertices[1:]
+            starts.append(start)
+            ends.append(end)
+    return np.concatenate(starts), np.concatenate(ends)
+
+
+def cache_path(shapefile, radius=EARTH_RADIUS, cache_dir=None):
+    """
+    Cache file for the index of a shapefile. The name is keyed on the absolute
+    path, size and modification time of the file, so an edited shapefile gets
+    a fresh index.
+    """
+    stat = os.stat(shapefile)
+    key = f"{os.path.abspath(shapefile)}|{stat.st_size}|{stat.st_mtime_ns}|{radius}|{CACHE_VERSION}"
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(shapefile))[0]
+    return os.path.join(cache_dir or DEFAULT_CACHE_DIR, f"{name}-{digest}.edges.pkl")
+
+
+def load_boundary_index(shapefile, radius=EARTH_RADIUS, cache_dir=None, use_cache=True):
+    """
+    SegmentIndex over every boundary segment in a shapefile, e.g. the Natural
+    Earth country borders or coastlines read by heatmap.generate_heatmap.
+
+    The first call reads the shapefile and builds the index; it is then written
+    to the cache and later calls only unpickle it.
+
+    Args:
+    shapefile: Path to the .shp file
+    radius: Sphere radius, distances are returned in the same unit
+    cache_dir: Directory for cached indexes (defaults to DEFAULT_CACHE_DIR)
+    use_cache: Set to False to always rebuild and never write the cache
+
+    Returns:
+    SegmentIndex; pass it to spherical_geometry.points_to_polygon_distance
+    or call its nearest() method directly
+    """
+    path = cache_path(shapefile, radius, cache_dir) if use_cache else None
+    if path is not None and os.path.exists(path):
+        try:
+            return SegmentIndex.load(path)
+        except (OSError, EOFError, pickle.UnpicklingError, TypeError, AttributeError, ImportError):
+            pass  # Unreadable or stale cache, rebuild below
+
+    starts, ends = geometry_segments(shpreader.Reader(shapefile).geometries())
+    index = SegmentIndex(starts, ends, radius=radius)
+
+    if path is not None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary name first so a concurrent reader never sees a partial file
+        partial = f"{path}.{os.getpid()}.tmp"
+        index.save(partial)
+        os.replace(partial, path)
+    return index
@@ -0,0 +1,306 @@
+# SphereStats/contraction_hierarchy.py
+
+import heapq
+
+import numpy as np
+
+from SphereStats.csr_graph import CSRGraph, NodeCoordinates
+
+# Witness searches give up after settling this many nodes. A search that gives
+# up early only adds a shortcut that was not needed, never a wrong one.
+WITNESS_LIMIT = 500
+
+
+def witness_distances(out_edges, source, excluded, targets, max_distance, limit=WITNESS_LIMIT):
+    """
+    Dijkstra from source over the not yet contracted graph, avoiding the node
+    being contracted, until every target is settled, max_distance is passed or
+    limit nodes are settled.
+
+    Returns:
+    Dict of the settled distance of every target that was reached
+    """
+    # The excluded node is never relaxed: no candidate distance is below -1
+    distances = {source: 0.0, excluded: -1.0}
+    found = {}
+    remaining = len(targets)
+    settled = set()
+    queue = [(0.0, source)]
+    while queue and len(settled) < limit:
+        distance, node = heapq.heappop(queue)
+        if distance > max_distance:
+            break
+        if node in settled:
+            continue
+        settled.add(node)
+        if node in targets:
+            found[node] = distance
+            remaining -= 1
+            if not remaining:
+                break
+        for neighbour, weight in out_edges[node].items():
+            candidate = distance + weight
+            if candidate < distances.get(neighbour, np.inf):
+                distances[neighbour] = candidate
+                heapq.heappush(queue, (candidate, neighbour))
+    return found
+
+
+def required_shortcuts(out_edges, in_edges, node, limit=WITNESS_LIMIT):
+    """
+    Shortcuts (source, target, weight) needed to keep all shortest paths
+    through node once it is removed: one for every in/out neighbour pair
+    without a witness path of at most the same weight.
+    """
+    shortcuts = []
+    outgoing = out_edges[node]
+    for source, in_weight in in_edges[node].items():
+        costs = {target: in_weight + out_weight for target, out_weight in outgoing.items() if target != source}
+        if not costs:
+            continue
+        found = witness_distances(out_edges, source, node, costs, max(costs.values()), limit)
+        for target, cost in costs.items():
+            if found.get(target, np.inf) > cost:
+                shortcuts.append((source, target, cost))
+    return shortcuts
+
+
+def upward_search(edges, reverse_edges, source):
+    """
+    Dijkstra from source over the upward edges of a hierarchy, given as
+    per-node lists of (neighbour, weight). Upward search spaces are small, so
+    it runs to exhaustion instead of interleaving with the opposite search.
+
+    A node is stalled (not expanded) when a more important node, reached
+    through reverse_edges, already offers a shorter way to it: no shortest
+    path continues upwards from such a node.
+
+    Returns:
+    settled: Dict of node -> distance of every settled node
+    predecessors: Dict of node -> predecessor (-1 for source)
+    """
+    distances, predecessors, settled = {source: 0.0}, {source: -1}, {}
+    queue = [(0.0, source)]
+    while queue:
+        distance, node = heapq.heappop(queue)
+        if node in settled:
+            continue
+        settled[node] = distance
+        for higher, weight in reverse_edges[node]:
+            if higher in distances and distances[higher] + weight < distance:
+                break
+        else:
+            for neighbour, weight in edges[node]:
+                candidate = distance + weight
+                if candidate < distances.get(neighbour, np.inf):
+                    distances[neighbour] = candidate
+                    predecessors[neighbour] = node
+                    heapq.heappush(queue, (candidate, neighbour))
+    return settled, predecessors
+
+
+def edge_arrays(n_nodes, edges):
+    """CSR offsets, targets, weights and middle nodes of (source, target, weight, middle) tuples."""
+    edges = np.array(edges, dtype=np.float64).reshape(-1, 4)
+    sources = edges[:, 0].astype(np.int64)
+    order = np.argsort(sources, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=n_nodes))])
+    return (offsets, edges[order, 1].astype(np.int64), edges[order, 2],
+            edges[order, 3].astype(np.int64))
+
+
+class ContractionHierarchy(NodeCoordinates):
+    """
+    Contraction hierarchy of a static CSRGraph for fast repeated shortest-path
+    queries.
+
+    Nodes are contracted one by one in order of importance (edge difference
+    plus number of contracted neighbours), adding shortcut edges that keep
+    shortest distances intact. A query then runs a bidirectional Dijkstra
+    that only climbs to more important nodes, which settles a few hundred
+    nodes instead of a large part of the graph, and unpacks the shortcuts of
+    the path it finds.
+
+    Edges are stored in two CSR structures indexed by their lower-ranked end:
+    up_* holds edges u -> v and down_* holds edges v -> u (with target v),
+    where rank[v] > rank[u]. middle is the contracted node a shortcut bypasses,
+    -1 for original edges.
+
+    Build with ContractionHierarchy.build(graph); save() and load() persist it.
+    """
+
+    ARRAYS = ['lat', 'lon', 'rank', 'up_offsets', 'up_targets', 'up_weights', 'up_middle',
+              'down_offsets', 'down_targets', 'down_weights', 'down_middle']
+
+    def __init__(self, lat, lon, rank, up_offsets, up_targets, up_weights, up_middle,
+                 down_offsets, down_targets, down_weights, down_middle):
+        super().__init__(lat, lon)
+        self.rank = np.asarray(rank, dtype=np.int64)
+        self.up_offsets, self.up_targets = np.asarray(up_offsets), np.asarray(up_targets)
+        self.up_weights, self.up_middle = np.asarray(up_weights), np.asarray(up_middle)
+        self.down_offsets, self.down_targets = np.asarray(down_offsets), np.asarray(down_targets)
+        self.down_weights, self.down_middle = np.asarray(down_weights), np.asarray(down_middle)
+        self._adjacency = None
+
+    @classmethod
+    def build(cls, graph, witness_limit=WITNESS_LIMIT):
+        """
+        Contract every node of a CSRGraph. Parallel edges keep their lightest
+        weight and self-loops are dropped, as neither is on a shortest path.
+        """
+        # Remaining graph as out/in adjacency dicts of weights; middles holds
+        # the bypassed node of every shortcut (source, target) in it
+        n_nodes = graph.n_nodes
+        out_edges = [{} for _ in range(n_nodes)]
+        in_edges = [{} for _ in range(n_nodes)]
+        middles = {}
+        sources = np.repeat(np.arange(n_nodes), np.diff(graph.offsets))
+        for source, target, weight in zip(sources.tolist(), graph.targets.tolist(), graph.weights.tolist()):
+            if source != target and weight < out_edges[source].get(target, np.inf):
+                out_edges[source][target] = in_edges[target][source] = weight
+
+        deleted = [0] * n_nodes
+
+        def priority(node):
+            shortcuts = required_shortcuts(out_edges, in_edges, node, witness_limit)
+            edge_difference = len(shortcuts) - len(out_edges[node]) - len(in_edges[node])
+            return edge_difference + deleted[node], shortcuts
+
+        queue = [(priority(node)[0], node) for node in range(n_nodes)]
+        heapq.heapify(queue)
+        rank = np.empty(n_nodes, dtype=np.int64)
+        up, down = [], []
+        level = 0
+        while queue:
+            _, node = heapq.heappop(queue)
+            # Lazy update: the priority may have gone up since it was queued
+            current, shortcuts = priority(node)
+            if queue and current > queue[0][0]:
+                heapq.heappush(queue, (current, node))
+                continue
+
+            rank[node] = level
+            level += 1
+            for target, weight in out_edges[node].items():
+                up.append((node, target, weight, middles.pop((node, target), -1)))
+                del in_edges[target][node]
+                deleted[target] += 1
+            for source, weight in in_edges[node].items():
+                down.append((node, source, weight, middles.pop((source, node), -1)))
+                del out_edges[source][node]
+                deleted[source] += 1
+            out_edges[node], in_edges[node] = {}, {}
+
+            for source, target, weight in shortcuts:
+                if weight < out_edges[source].get(target, np.inf):
+                    out_edges[source][target] = in_edges[target][source] = weight
+                    middles[(source, target)] = node
+
+        return cls(graph.lat, graph.lon, rank, *edge_arrays(n_nodes, up), *edge_arrays(n_nodes, down))
+
+    @property
+    def n_shortcuts(self):
+        return int(np.count_nonzero(self.up_middle >= 0) + np.count_nonzero(self.down_middle >= 0))
+
+    @property
+    def nbytes(self):
+        """Memory held by the hierarchy's arrays."""
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    def adjacency(self):
+        """
+        Per-node lists of (neighbour, weight) for the upward and downward
+        edges, built once: iterating Python lists is much faster than slicing
+        arrays for the small searches of a query.
+        """
+        if self._adjacency is None:
+            self._adjacency = tuple(
+                [list(zip(targets[start:stop], weights[start:stop]))
+                 for start, stop in zip(offsets[:-1], offsets[1:])]
+                for offsets, targets, weights in
+                [(self.up_offsets.tolist(), self.up_targets.tolist(), self.up_weights.tolist()),
+                 (self.down_offsets.tolist(), self.down_targets.tolist(), self.down_weights.tolist())])
+        return self._adjacency
+
+    def query(self, start, goal):
+        """
+        Shortest path between two node ids.
+
+        Returns:
+        path: List of node ids from start to goal, or None if goal is unreachable
+        distance: Total weight of the path (inf if unreachable)
+        """
+        if start == goal:
+            return [start], 0.0
+        up, down = self.adjacency()
+        # The forward search climbs along up edges from start, the backward
+        # search along down edges (reversed original edges) from goal
+        forward, forward_predecessors = upward_search(up, down, start)
+        backward, backward_predecessors = upward_search(down, up, goal)
+        best, meeting = np.inf, -1
+        for node, distance in forward.items():
+            other = backward.get(node)
+            if other is not None and distance + other < best:
+                best, meeting = distance + other, node
+
+        if meeting < 0:
+            return None, float('inf')
+
+        nodes = [meeting]
+        while forward_predecessors[nodes[-1]] >= 0:
+            nodes.append(forward_predecessors[nodes[-1]])
+        nodes.reverse()
+        while backward_predecessors[nodes[-1]] >= 0:
+            nodes.append(backward_predecessors[nodes[-1]])
+
+        path = [start]
+        for source, target in zip(nodes[:-1], nodes[1:]):
+            path.extend(self.unpack(source, target)[1:])
+        return path, float(best)
+
+    def edge_middle(self, source, target):
+        """Middle node of the hierarchy edge source -> target (-1 for an original edge)."""
+        if self.rank[source] < self.rank[target]:
+            offsets, targets, weights, middle, node, other = (
+                self.up_offsets, self.up_targets, self.up_weights, self.up_middle, source, target)
+        else:
+            offsets, targets, weights, middle, node, other = (
+                self.down_offsets, self.down_targets, self.down_weights, self.down_middle, target, source)
+        start, stop = offsets[node], offsets[node + 1]
+        matches = np.nonzero(targets[start:stop] == other)[0]
+        if not len(matches):
+            raise KeyError((source, target))
+        return int(middle[start + matches[np.argmin(weights[start + matches])]])
+
+    def unpack(self, source, target):
+        """Original-graph node ids along the hierarchy edge source -> target."""
+        path, stack = [source], [(source, target)]
+        while stack:
+            source, target = stack.pop()
+            middle = self.edge_middle(source, target)
+            if middle < 0:
+                path.append(target)
+            else:
+                stack.extend([(middle, target), (source, middle)])
+        return path
+
+    def save(self, path):
+        """Write the hierarchy arrays to an .npz file."""
+        np.savez(path, **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        """Read a hierarchy written by save()."""
+        with np.load(path) as arrays:
+            return cls(*[arrays[name] for name in cls.ARRAYS])
+
+
+def contract(graph, witness_limit=WITNESS_LIMIT):
+    """
+    Preprocess a CSRGraph (or dict-of-dicts graph) into a ContractionHierarchy,
+    whose query() answers repeated point-to-point queries much faster than
+    dijkstra. Pass it to network_routing.dijkstra in place of the graph.
+    """
+    if not isinstance(graph, CSRGraph):
+        graph = CSRGraph.from_dict(graph)
+    return ContractionHierarchy.build(graph, witness_limit)
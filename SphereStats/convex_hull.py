@@ -1,17 +1,17 @@
 import numpy as np
-from scipy.spatial import ConvexHull
-from mpl_toolkits.mplot3d.art3d import Poly3DCollection
-import matplotlib.pyplot as plt
-import cartopy.crs as ccrs
+from scipy.spatial import ConvexHull, QhullError
+
+from SphereStats.distance_kernels import to_cartesian, unit_vectors
+from SphereStats.lazy_imports import lazy_import
+
+Poly3DCollection = lazy_import('mpl_toolkits.mplot3d.art3d', 'Poly3DCollection')
+plt = lazy_import('matplotlib.pyplot')
+ccrs = lazy_import('cartopy.crs')
 
 
 # Helper function to convert spherical to Cartesian coordinates
-def spherical_to_cartesian(lat, lon, radius=6371):
-    lat, lon = np.radians(lat), np.radians(lon)
-    x = radius * np.cos(lat) * np.cos(lon)
-    y = radius * np.cos(lat) * np.sin(lon)
-    z = radius * np.sin(lat)
-    return np.array([x, y, z])
+def spherical_to_cartesian(lat, lon, radius=6371, dtype=np.float64):
+    return to_cartesian(lat, lon, radius, dtype)
 
 
 # Function to compute a convex hull on a sphere
@@ -19,20 +19,284 @@ def convex_hull_on_sphere(points):
     """
     Compute the convex hull of points on a sphere.
 
+    This is the 3D hull of the points, of which every point on the sphere is a
+    vertex. For the spherical hull of points in a hemisphere, as an ordered
+    polygon, use spherical_convex_hull.
+
     Args:
     points: Array of latitude and longitude points [[lat1, lon1], [lat2, lon2], ...]
 
     Returns:
     hull_points: Indices of the points forming the convex hull
     """
-    # Convert spherical to Cartesian coordinates
-    cartesian_points = np.array([spherical_to_cartesian(lat, lon) for lat, lon in points])
+    # Convert spherical to Cartesian coordinates in one vectorized call
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    cartesian_points = np.ascontiguousarray(spherical_to_cartesian(points[:, 0], points[:, 1]).T)
 
     # Compute convex hull in Cartesian space
     hull = ConvexHull(cartesian_points)
     return hull, cartesian_points
 
 
+# Points converted to unit vectors at a time by spherical_convex_hull
+HULL_CHUNK_SIZE = 1_000_000
+
+
+def hemisphere_centre(points, sample_size=100_000):
+    """
+    Guess the centre of a hemisphere holding all points: the mean direction
+    of an evenly spaced sample of them. Returns None if the mean vanishes.
+    """
+    step = max(1, len(points) // sample_size)
+    centre = unit_vectors(points[::step]).sum(axis=0)
+    norm = np.linalg.norm(centre)
+    return centre / norm if norm > 1e-12 else None
+
+
+def gnomonic_basis(centre):
+    """Two unit vectors completing centre to a right-handed orthonormal basis."""
+    helper = np.array([0.0, 0.0, 1.0]) if abs(centre[2]) < 0.9 else np.array([1.0, 0.0, 0.0])
+    east = np.cross(helper, centre)
+    east /= np.linalg.norm(east)
+    return east, np.cross(centre, east)
+
+
+def gnomonic_chunks(points, centre, chunk_size=HULL_CHUNK_SIZE):
+    """
+    Yield (offset, xy) for consecutive chunks of points, where xy (n, 2) is the
+    gnomonic projection around centre. Great circles project to straight lines,
+    so spherical convexity becomes planar convexity. Raises ValueError if a
+    point is not in the open hemisphere around centre.
+    """
+    basis = np.column_stack([*gnomonic_basis(centre), centre])
+    for offset in range(0, len(points), chunk_size):
+        local = unit_vectors(points[offset:offset + chunk_size]) @ basis
+        if local[:, 2].min() <= 1e-9:
+            raise ValueError("points do not fit in an open hemisphere around their mean direction")
+        yield offset, local[:, :2] / local[:, 2:]
+
+
+class ExtremePoints:
+    """
+    Akl-Toussaint pre-filter state: for each of `directions` evenly spaced
+    planar directions, the point seen so far that lies furthest along it.
+    The extreme points are actual input points, so the convex polygon they
+    form is always inside the final hull and anything strictly inside the
+    polygon can be discarded.
+    """
+
+    def __init__(self, directions=16):
+        angles = np.linspace(0, 2 * np.pi, directions, endpoint=False)
+        self.directions = np.column_stack([np.cos(angles), np.sin(angles)])
+        self.scores = np.full(directions, -np.inf)
+        self.xy = np.zeros((directions, 2))
+
+    def update(self, xy):
+        """Take the points xy (n, 2) into account."""
+        scores = self.directions @ xy.T
+        winners = scores.argmax(axis=1)
+        winner_scores = scores[np.arange(len(winners)), winners]
+        better = winner_scores > self.scores
+        self.scores[better] = winner_scores[better]
+        self.xy[better] = xy[winners[better]]
+
+    def polygon(self):
+        """The extreme points in counter-clockwise order, consecutive duplicates removed."""
+        polygon = self.xy[np.isfinite(self.scores)]
+        keep = np.any(polygon != np.roll(polygon, 1, axis=0), axis=1)
+        return polygon[keep]
+
+
+def outside_polygon(xy, polygon, tolerance=1e-12):
+    """Mask of the points xy (n, 2) not strictly inside a convex counter-clockwise polygon."""
+    if len(polygon) < 3:
+        return np.ones(len(xy), dtype=bool)
+    # Inward normal of every edge; inside means beyond every edge's offset
+    edges = np.roll(polygon, -1, axis=0) - polygon
+    normals = np.column_stack([-edges[:, 1], edges[:, 0]])
+    offsets = np.einsum('ij,ij->i', normals, polygon) + tolerance
+    return ~np.all(xy @ normals.T > offsets, axis=1)
+
+
+def spherical_convex_hull(points, directions=16, chunk_size=HULL_CHUNK_SIZE):
+    """
+    Compute the spherical convex hull of points that fit in a hemisphere, as
+    an ordered spherical polygon.
+
+    Points are projected gnomonically around their mean direction, where the
+    spherical hull is the planar hull. An Akl-Toussaint pre-filter discards
+    every point strictly inside the polygon of extreme points in `directions`
+    directions before qhull runs on the survivors. Points are processed in a
+    single pass over chunks of chunk_size, so the full set is never held as
+    3D vectors or projections.
+
+    Args:
+    points: Array of latitude and longitude points [[lat1, lon1], [lat2, lon2], ...]
+    directions: Number of extreme directions used by the pre-filter
+
+    Returns:
+    polygon: Hull vertices [[lat1, lon1], ...] in counter-clockwise order seen
+             from outside the sphere; consecutive vertices are joined by great-circle arcs
+    indices: Index of each hull vertex in points
+
+    Raises ValueError if the points do not fit in a hemisphere or are fewer
+    than three points off a common great circle.
+    """
+    points = np.asarray(points).reshape(-1, 2)
+    centre = hemisphere_centre(points)
+    if centre is None:
+        raise ValueError("points do not fit in an open hemisphere around their mean direction")
+
+    # Single pass: every chunk first updates the extreme points, then is
+    # filtered against the polygon they form so far
+    extremes = ExtremePoints(directions)
+    survivors, survivor_xy = [], []
+    for offset, xy in gnomonic_chunks(points, centre, chunk_size):
+        extremes.update(xy)
+        outside = np.nonzero(outside_polygon(xy, extremes.polygon()))[0]
+        survivors.append(outside + offset)
+        survivor_xy.append(xy[outside])
+    survivors, survivor_xy = np.concatenate(survivors), np.concatenate(survivor_xy)
+
+    # Early chunks saw a smaller polygon; filter their survivors once more
+    outside = outside_polygon(survivor_xy, extremes.polygon())
+    survivors, survivor_xy = survivors[outside], survivor_xy[outside]
+
+    # Vertices of a 2D qhull hull come in counter-clockwise order
+    try:
+        hull = ConvexHull(survivor_xy)
+    except QhullError:
+        raise ValueError("the convex hull needs at least three points off a common great circle") from None
+    indices = survivors[hull.vertices]
+    return np.asarray(points[indices], dtype=np.float64), indices
+
+
+# Points closer than this (as cos of the angle) to the edge of the projection
+# hemisphere make IncrementalSphericalHull recentre its projection
+RECENTRE_DEPTH = 0.05
+
+
+class IncrementalSphericalHull:
+    """
+    Spherical convex hull of a growing point set, updated batch by batch.
+
+    Points are projected gnomonically, as in spherical_convex_hull, and kept
+    in an incremental qhull hull that only rebuilds the facets new points can
+    see. Only hull candidates are ever stored: the hull of everything seen so
+    far equals the hull of the current vertices plus the new points, so the
+    cost of an update depends on the hull size and the batch size, never on
+    the history.
+
+    Each new point is first tested against the polygon of the hull's extreme
+    points in `directions` directions, a constant number of half-planes, and
+    most interior points are rejected there. The rest are tested exactly
+    against the hull edges and only the points outside reach qhull.
+
+    The projection is recentred on the current vertices if new points come
+    close to the edge of its hemisphere; ValueError is raised if the points
+    no longer fit in a hemisphere at all.
+
+    Args:
+    points: Optional first batch [[lat1, lon1], [lat2, lon2], ...]
+    directions: Number of extreme directions used for the fast rejection
+    """
+
+    def __init__(self, points=None, directions=16):
+        self.directions = directions
+        self.n_points = 0
+        self.hull = None
+        self.basis = None
+        self.inner = np.empty((0, 2))
+        # [lat, lon] and stream position of every point qhull holds, in qhull's order
+        self.points = np.empty((0, 2))
+        self.ids = np.empty(0, dtype=np.intp)
+        if points is not None:
+            self.add(points)
+
+    @property
+    def vertices(self):
+        """Current hull vertices [[lat1, lon1], ...] in counter-clockwise order."""
+        return self.points if self.hull is None else self.points[self.hull.vertices]
+
+    @property
+    def indices(self):
+        """Position of each current hull vertex in the stream of added points."""
+        return self.ids if self.hull is None else self.ids[self.hull.vertices]
+
+    def project(self, points):
+        """Gnomonic coordinates (n, 2) of points and their depth along the projection centre."""
+        local = unit_vectors(points) @ self.basis
+        return local[:, :2] / local[:, 2:], local[:, 2]
+
+    def add(self, points):
+        """
+        Add a batch of points [[lat1, lon1], ...].
+
+        Returns:
+        Number of points of the batch that were outside the previous hull
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        ids = np.arange(self.n_points, self.n_points + len(points))
+        self.n_points += len(points)
+        if len(points) == 0:
+            return 0
+        if self.hull is None:
+            self.rebuild(np.concatenate([self.points, points]), np.concatenate([self.ids, ids]))
+            return len(points)
+
+        xy, depth = self.project(points)
+        if depth.min() <= RECENTRE_DEPTH:
+            self.rebuild(np.concatenate([self.vertices, points]), np.concatenate([self.indices, ids]))
+            return len(points)
+
+        candidates = np.nonzero(outside_polygon(xy, self.inner))[0]
+        equations = self.hull.equations
+        beyond = xy[candidates] @ equations[:, :2].T + equations[:, 2] > 1e-12
+        outside = candidates[beyond.any(axis=1)]
+        if len(outside) == 0:
+            return 0
+
+        self.hull.add_points(xy[outside])
+        self.points = np.concatenate([self.points, points[outside]])
+        self.ids = np.concatenate([self.ids, ids[outside]])
+
+        # Points swallowed by later updates stay in qhull's arrays; drop them now and then
+        if len(self.points) > 2 * len(self.hull.vertices) + 1024:
+            self.rebuild(self.vertices, self.indices, recentre=False)
+        else:
+            self.update_inner()
+        return len(outside)
+
+    def rebuild(self, points, ids, recentre=True):
+        """Rebuild the hull from hull candidates, optionally recentring the projection."""
+        if recentre:
+            centre = hemisphere_centre(points)
+            if centre is None:
+                raise ValueError("points do not fit in an open hemisphere around their mean direction")
+            self.basis = np.column_stack([*gnomonic_basis(centre), centre])
+
+        xy, depth = self.project(points)
+        if depth.min() <= 1e-9:
+            raise ValueError("points do not fit in an open hemisphere around their mean direction")
+        if self.hull is not None:
+            self.hull.close()
+        try:
+            vertices = ConvexHull(xy).vertices
+            self.hull = ConvexHull(xy[vertices], incremental=True)
+        except QhullError:
+            # Fewer than three points off a common great circle: keep them until there are
+            self.hull, self.points, self.ids = None, points, ids
+            return
+        self.points, self.ids = points[vertices], ids[vertices]
+        self.update_inner()
+
+    def update_inner(self):
+        """Recompute the fast-rejection polygon from the current vertices."""
+        extremes = ExtremePoints(self.directions)
+        extremes.update(self.hull.points[self.hull.vertices])
+        self.inner = extremes.polygon()
+
+
 # Function to visualize the convex hull in 3D
 def plot_convex_hull_3d(hull, cartesian_points):
     """
@@ -68,15 +332,17 @@ def plot_convex_hull_3d(hull, cartesian_points):
 
 
 # Function to plot convex hull in 2D projection
-def plot_convex_hull_2d(points, hull, projection=ccrs.Mollweide()):
+def plot_convex_hull_2d(points, hull, projection=None):
     """
     Visualize the convex hull on a 2D map projection.
 
     Args:
     points: Original spherical points [[lat1, lon1], [lat2, lon2], ...]
     hull: ConvexHull object
-    projection: Cartopy projection for visualization
+    projection: Cartopy projection for visualization (Mollweide by default)
     """
+    if projection is None:
+        projection = ccrs.Mollweide()
     fig = plt.figure(figsize=(12, 8))
     ax = plt.axes(projection=projection)
     ax.set_global()
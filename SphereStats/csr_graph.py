@@ -0,0 +1,449 @@
+# SphereStats/csr_graph.py
+
+import heapq
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from SphereStats.distance_kernels import EARTH_RADIUS
+from SphereStats.distance_matrix import row_slices
+
+
+class NodeCoordinates:
+    """
+    Integer node ids 0..n_nodes-1 with their (lat, lon) coordinates, shared by
+    the graph types so that nodes can be given as ids or as (lat, lon) tuples.
+    """
+
+    def __init__(self, lat, lon):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self._ids = None
+
+    @property
+    def n_nodes(self):
+        return len(self.lat)
+
+    @property
+    def coords(self):
+        """Node coordinates as an (n_nodes, 2) array of [lat, lon]."""
+        return np.column_stack([self.lat, self.lon])
+
+    def node(self, node_id):
+        """The (lat, lon) tuple of a node id."""
+        return float(self.lat[node_id]), float(self.lon[node_id])
+
+    def node_id(self, node):
+        """
+        Integer id of a node given as an id or as a (lat, lon) tuple.
+        Raises KeyError for unknown nodes.
+        """
+        if isinstance(node, (int, np.integer)):
+            if not 0 <= node < self.n_nodes:
+                raise KeyError(node)
+            return int(node)
+        if self._ids is None:
+            # Built once, on the first lookup by coordinates
+            self._ids = {}
+            for node_id, key in enumerate(zip(self.lat.tolist(), self.lon.tolist())):
+                self._ids.setdefault(key, node_id)
+        return self._ids[(float(node[0]), float(node[1]))]
+
+
+class CSRGraph(NodeCoordinates):
+    """
+    Directed weighted graph stored in compressed sparse row (CSR) arrays.
+
+    Nodes are integer ids 0..n_nodes-1 with their coordinates in lat/lon
+    arrays. The outgoing edges of node u are targets[offsets[u]:offsets[u + 1]]
+    with the matching weights. Undirected graphs store each edge both ways.
+
+    version starts at 0 and goes up with every change to the edge weights
+    (set_weight, update_weights), so caches of query results can tell
+    whether they are still valid.
+
+    For existing callers the graph also behaves like the old dict-of-dicts
+    keyed by (lat, lon) tuples: `node in graph`, `graph[node]` (a dict of
+    neighbour -> weight), iteration and items(). These views are built on
+    demand and are meant for small graphs and plotting.
+
+    Args:
+    lat, lon: Node coordinates in degrees
+    offsets: Array of n_nodes + 1 edge offsets
+    targets: Target node id of every edge
+    weights: Weight of every edge
+    """
+
+    def __init__(self, lat, lon, offsets, targets, weights):
+        super().__init__(lat, lon)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        if len(self.offsets) != len(self.lat) + 1 or self.offsets[-1] != len(self.targets):
+            raise ValueError("offsets must hold n_nodes + 1 entries ending at the number of edges")
+        if len(self.targets) != len(self.weights):
+            raise ValueError("targets and weights must have the same length")
+        self.version = 0
+
+    @classmethod
+    def from_edges(cls, lat, lon, sources, targets, weights):
+        """Build a graph from parallel arrays of edge sources, targets and weights."""
+        sources = np.asarray(sources, dtype=np.int64)
+        order = np.argsort(sources, kind='stable')
+        counts = np.bincount(sources, minlength=len(lat))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return cls(lat, lon, offsets, np.asarray(targets)[order], np.asarray(weights)[order])
+
+    @classmethod
+    def from_dict(cls, graph):
+        """
+        Convert a dict-of-dicts graph {(lat, lon): {(lat, lon): weight, ...}, ...}.
+        Node ids follow the order in which nodes first appear.
+        """
+        ids = {}
+        for node, neighbours in graph.items():
+            ids.setdefault(node, len(ids))
+            for neighbour in neighbours:
+                ids.setdefault(neighbour, len(ids))
+
+        sources, targets, weights = [], [], []
+        for node, neighbours in graph.items():
+            source = ids[node]
+            for neighbour, weight in neighbours.items():
+                sources.append(source)
+                targets.append(ids[neighbour])
+                weights.append(weight)
+
+        coords = np.array(list(ids), dtype=np.float64).reshape(-1, 2)
+        return cls.from_edges(coords[:, 0], coords[:, 1], sources, targets, weights)
+
+    def to_dict(self):
+        """Convert to the dict-of-dicts format keyed by (lat, lon) tuples."""
+        return {self.node(u): self[self.node(u)] for u in range(self.n_nodes)}
+
+    @property
+    def n_edges(self):
+        return len(self.targets)
+
+    def neighbours(self, node_id):
+        """(targets, weights) arrays of the outgoing edges of a node id."""
+        start, stop = self.offsets[node_id], self.offsets[node_id + 1]
+        return self.targets[start:stop], self.weights[start:stop]
+
+    def set_weight(self, source, target, weight):
+        """Change the weight of the edge(s) source -> target. Raises KeyError if there is none."""
+        start, stop = self.offsets[source], self.offsets[source + 1]
+        matches = np.nonzero(self.targets[start:stop] == target)[0]
+        if not len(matches):
+            raise KeyError((source, target))
+        self.weights[start + matches] = weight
+        self.version += 1
+
+    def update_weights(self, weights):
+        """Replace every edge weight at once, e.g. with new travel times."""
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != self.weights.shape:
+            raise ValueError(f"weights has shape {weights.shape}, expected {self.weights.shape}")
+        self.weights[...] = weights
+        self.version += 1
+
+    def __len__(self):
+        return self.n_nodes
+
+    def __iter__(self):
+        return (self.node(u) for u in range(self.n_nodes))
+
+    def __contains__(self, node):
+        try:
+            self.node_id(node)
+        except (KeyError, TypeError, IndexError):
+            return False
+        return True
+
+    def __getitem__(self, node):
+        targets, weights = self.neighbours(self.node_id(node))
+        return {self.node(v): w for v, w in zip(targets.tolist(), weights.tolist())}
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        return ((node, self[node]) for node in self)
+
+    def save(self, path):
+        """Write the graph arrays to an .npz file."""
+        np.savez(path, lat=self.lat, lon=self.lon, offsets=self.offsets, targets=self.targets,
+                 weights=self.weights)
+
+    @classmethod
+    def load(cls, path):
+        """Read a graph written by save()."""
+        with np.load(path) as arrays:
+            return cls(arrays['lat'], arrays['lon'], arrays['offsets'], arrays['targets'], arrays['weights'])
+
+
+def shortest_path_tree(graph, source, targets=None, cutoff=np.inf):
+    """
+    Dijkstra from one source over a CSRGraph.
+
+    Distances, predecessors and settled flags live in arrays allocated once
+    per search, indexed by node id; stale heap entries are skipped when
+    popped instead of being re-expanded.
+
+    Args:
+    graph: CSRGraph
+    source: Source node id
+    targets: Optional iterable of node ids; the search stops once all are settled
+    cutoff: Do not settle nodes further away than this
+
+    Returns:
+    distances: Array of shortest distances, inf for nodes that were not settled
+    predecessors: Array of predecessor ids on the shortest path, -1 for the source and unreached nodes
+    """
+    # Plain lists: element access from Python is several times faster than on ndarrays
+    n_nodes = graph.n_nodes
+    distances = [np.inf] * n_nodes
+    predecessors = [-1] * n_nodes
+    settled = bytearray(n_nodes)
+    offsets, edge_targets, edge_weights = graph.offsets, graph.targets, graph.weights
+
+    remaining = None if targets is None else set(int(target) for target in targets)
+    distances[source] = 0.0
+    queue = [(0.0, source)]
+    while queue:
+        distance, node = heapq.heappop(queue)
+        if settled[node]:
+            continue
+        if distance > cutoff:
+            break
+        settled[node] = 1
+        if remaining is not None:
+            remaining.discard(node)
+            if not remaining:
+                break
+
+        start, stop = offsets[node], offsets[node + 1]
+        for neighbour, weight in zip(edge_targets[start:stop].tolist(), edge_weights[start:stop].tolist()):
+            candidate = distance + weight
+            if candidate < distances[neighbour]:
+                distances[neighbour] = candidate
+                predecessors[neighbour] = node
+                heapq.heappush(queue, (candidate, neighbour))
+
+    reached = np.frombuffer(settled, dtype=bool)
+    distances = np.where(reached, distances, np.inf)
+    predecessors = np.where(reached, predecessors, -1)
+    return distances, predecessors
+
+
+def reconstruct_path(predecessors, source, goal):
+    """Node ids from source to goal along a predecessor array, or None if goal was not reached."""
+    if goal != source and predecessors[goal] < 0:
+        return None
+    path = [goal]
+    while path[-1] != source:
+        path.append(int(predecessors[path[-1]]))
+    path.reverse()
+    return path
+
+
+def csr_dijkstra(graph, start, goal):
+    """
+    Shortest path between two node ids of a CSRGraph.
+
+    Returns:
+    path: List of node ids from start to goal, or None if goal is unreachable
+    distance: Total weight of the path (inf if unreachable)
+    """
+    distances, predecessors = shortest_path_tree(graph, start, targets=[goal])
+    return reconstruct_path(predecessors, start, goal), float(distances[goal])
+
+
+# Heuristic estimates are shrunk by this factor so that rounding in the edge
+# weights (typically haversine distances themselves) cannot make them overestimate
+HEURISTIC_SLACK = 1 - 1e-9
+
+
+def great_circle_heuristic(goal_lat, goal_lon, radius=EARTH_RADIUS, max_speed=None):
+    """
+    A* heuristic: estimate(lat, lon) returns the great-circle distance to the
+    goal, divided by max_speed when given (for travel-time weights).
+
+    It is admissible and consistent as long as no edge weighs less than the
+    great-circle distance (or travel time at max_speed) between its endpoints.
+    """
+    scale = radius * HEURISTIC_SLACK / (max_speed or 1.0)
+    phi2, lambda2 = math.radians(goal_lat), math.radians(goal_lon)
+    cos_phi2 = math.cos(phi2)
+
+    def estimate(lat, lon):
+        phi1 = math.radians(lat)
+        a = (math.sin((phi2 - phi1) / 2) ** 2
+             + math.cos(phi1) * cos_phi2 * math.sin((lambda2 - math.radians(lon)) / 2) ** 2)
+        return 2 * scale * math.asin(min(1.0, math.sqrt(a)))
+
+    return estimate
+
+
+def csr_astar(graph, start, goal, max_speed=None, radius=EARTH_RADIUS):
+    """
+    A* shortest path between two node ids of a CSRGraph, guided by the
+    great-circle distance to the goal (see great_circle_heuristic).
+
+    Args:
+    graph: CSRGraph
+    start, goal: Node ids
+    max_speed: Highest speed on any edge, in radius units per weight unit, for travel-time weights
+    radius: Sphere radius in the unit of the edge weights (or of max_speed)
+
+    Returns:
+    path: List of node ids from start to goal, or None if goal is unreachable
+    distance: Total weight of the path (inf if unreachable)
+    expanded: Number of nodes expanded by the search
+    """
+    estimate = great_circle_heuristic(graph.lat[goal], graph.lon[goal], radius, max_speed)
+    lat, lon = graph.lat, graph.lon
+    offsets, edge_targets, edge_weights = graph.offsets, graph.targets, graph.weights
+
+    # Only nodes the search touches get an entry, so the cost follows the
+    # explored region rather than the size of the graph
+    distances = {start: 0.0}
+    predecessors = {start: -1}
+    settled = set()
+    queue = [(estimate(lat[start], lon[start]), start)]
+    while queue:
+        _, node = heapq.heappop(queue)
+        if node in settled:
+            continue
+        settled.add(node)
+        if node == goal:
+            break
+
+        distance = distances[node]
+        start_edge, stop_edge = offsets[node], offsets[node + 1]
+        for neighbour, weight in zip(edge_targets[start_edge:stop_edge].tolist(),
+                                     edge_weights[start_edge:stop_edge].tolist()):
+            candidate = distance + weight
+            if candidate < distances.get(neighbour, np.inf):
+                distances[neighbour] = candidate
+                predecessors[neighbour] = node
+                heapq.heappush(queue, (candidate + estimate(lat[neighbour], lon[neighbour]), neighbour))
+
+    if goal not in settled:
+        return None, float('inf'), len(settled)
+    path = [goal]
+    while path[-1] != start:
+        path.append(predecessors[path[-1]])
+    path.reverse()
+    return path, float(distances[goal]), len(settled)
+
+
+def shared_arrays(arrays):
+    """
+    Copy a dict of arrays into one multiprocessing shared memory segment.
+
+    Returns:
+    segment: The SharedMemory (close and unlink it when done)
+    layout: List of (name, dtype, shape, offset) for attach_arrays
+    """
+    layout, offset = [], 0
+    for name, array in arrays.items():
+        layout.append((name, array.dtype.str, array.shape, offset))
+        offset += -(-array.nbytes // 8) * 8  # Keep every array 8-byte aligned
+    segment = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for (name, dtype, shape, start), array in zip(layout, arrays.values()):
+        np.ndarray(shape, dtype=dtype, buffer=segment.buf, offset=start)[...] = array
+    return segment, layout
+
+
+def attach_arrays(segment, layout):
+    """Views of the arrays in a segment written by shared_arrays."""
+    return {name: np.ndarray(shape, dtype=dtype, buffer=segment.buf, offset=start)
+            for name, dtype, shape, start in layout}
+
+
+def fill_cost_rows(graph, sources, targets, cutoff, costs, predecessors):
+    """Fill one row of costs (and of predecessors, if given) per source."""
+    for row, source in enumerate(sources.tolist()):
+        distances, tree = shortest_path_tree(graph, source, targets=targets, cutoff=cutoff)
+        costs[row] = distances[targets]
+        if predecessors is not None:
+            predecessors[row] = tree
+
+
+def cost_rows_worker(task):
+    """Process-pool worker: attach to the shared graph and output, and fill a block of rows."""
+    segment_name, layout, rows, cutoff = task
+    segment = shared_memory.SharedMemory(name=segment_name)
+    try:
+        arrays = attach_arrays(segment, layout)
+        graph = CSRGraph(arrays['lat'], arrays['lon'], arrays['offsets'], arrays['targets'], arrays['weights'])
+        fill_cost_rows(graph, arrays['sources'][rows], arrays['target_ids'], cutoff,
+                       arrays['costs'][rows], arrays['predecessors'][rows] if 'predecessors' in arrays else None)
+        # Views into the shared buffer must be released before closing it
+        del arrays, graph
+    finally:
+        segment.close()
+
+
+def cost_matrix(graph, sources, targets=None, cutoff=np.inf, return_predecessors=False, workers=1):
+    """
+    Shortest-path costs from every source to every target of a CSRGraph.
+
+    Each source runs one Dijkstra search that stops as soon as every target
+    is settled (or the cutoff is passed), instead of one search per pair.
+    Sources are independent, so with workers > 1 they are split over a
+    process pool; the graph and the output live in multiprocessing shared
+    memory, so workers only receive a segment name and a row range.
+
+    Args:
+    graph: CSRGraph
+    sources: Node ids of the sources
+    targets: Node ids of the targets; defaults to every node
+    cutoff: Targets further than this are reported as inf
+    return_predecessors: Also return each source's shortest-path tree
+    workers: Number of processes sharing the sources; None uses every CPU
+
+    Returns:
+    costs: (n_sources, n_targets) array of path weights, inf where unreachable
+    predecessors: (n_sources, n_nodes) array of predecessor ids, -1 outside the
+                  searched tree (only with return_predecessors); use
+                  reconstruct_path(predecessors[i], sources[i], goal) for paths
+    """
+    sources = np.asarray(sources, dtype=np.int64).reshape(-1)
+    target_ids = np.arange(graph.n_nodes) if targets is None else np.asarray(targets, dtype=np.int64).reshape(-1)
+    if len(target_ids) and not (0 <= target_ids.min() and target_ids.max() < graph.n_nodes):
+        raise ValueError("targets must be node ids of the graph")
+    if len(sources) and not (0 <= sources.min() and sources.max() < graph.n_nodes):
+        raise ValueError("sources must be node ids of the graph")
+
+    costs = np.empty((len(sources), len(target_ids)))
+    predecessors = np.empty((len(sources), graph.n_nodes), dtype=np.int64) if return_predecessors else None
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(sources) < 2:
+        fill_cost_rows(graph, sources, target_ids, cutoff, costs, predecessors)
+    else:
+        arrays = {'lat': graph.lat, 'lon': graph.lon, 'offsets': graph.offsets, 'targets': graph.targets,
+                  'weights': graph.weights, 'sources': sources, 'target_ids': target_ids, 'costs': costs}
+        if return_predecessors:
+            arrays['predecessors'] = predecessors
+        segment, layout = shared_arrays(arrays)
+        try:
+            tasks = [(segment.name, layout, rows, cutoff) for rows in row_slices(len(sources), workers)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(cost_rows_worker, tasks))
+            shared = attach_arrays(segment, layout)
+            costs[...] = shared['costs']
+            if return_predecessors:
+                predecessors[...] = shared['predecessors']
+            del shared
+        finally:
+            segment.close()
+            segment.unlink()
+
+    return (costs, predecessors) if return_predecessors else costs
@@ -1,9 +1,14 @@
 # SphereStats/distance_calculations.py
 
 import numpy as np
-from math import radians, sin, cos, sqrt, atan2
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
+from math import radians, sin, cos, sqrt
+
+from SphereStats.distance_kernels import haversine
+from SphereStats.lazy_imports import lazy_import
+
+plt = lazy_import('matplotlib.pyplot')
+Axes3D = lazy_import('mpl_toolkits.mplot3d', 'Axes3D')
+
 
 EARTH_RADIUS = 6371  # Default Earth radius in kilometers
 
@@ -12,12 +17,7 @@ def geodetic_distance(lat1, lon1, lat2, lon2, radius=EARTH_RADIUS):
     """
     Calculate the geodetic distance (great-circle distance) using the haversine formula.
     """
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    return radius * c
+    return float(haversine(lat1, lon1, lat2, lon2, radius=radius))
 
 
 def spherical_to_cartesian(lat, lon, radius=EARTH_RADIUS):
@@ -0,0 +1,180 @@
+# SphereStats/distance_kernels.py
+
+from collections import namedtuple
+
+import numpy as np
+
+EARTH_RADIUS = 6371  # Earth's radius in kilometers
+
+# Points in radians together with cos(lat), the only trigonometric value the
+# haversine formula needs per point. Build them once with prepare_points and
+# pass them to the kernels below as often as needed.
+PreparedPoints = namedtuple('PreparedPoints', ['lat', 'lon', 'cos_lat'])
+
+# Worst-case absolute error (km on a 6371 km sphere) of great_circle_distance
+# for each working precision, as (below 19,000 km, anywhere). Rounding error
+# is nearly constant up to ~19,000 km and grows close to the antipode, where
+# arcsin(sqrt(a)) is ill-conditioned. float32 is fine for heatmaps and for
+# screening candidates; use float64 when the distances themselves matter.
+ERROR_BOUNDS = {
+    np.dtype(np.float32): (0.05, 10.0),
+    np.dtype(np.float64): (1e-8, 1e-3),
+}
+
+
+def error_bound(distance, dtype=np.float64, radius=EARTH_RADIUS):
+    """
+    Upper bound on the absolute error of a great-circle distance computed in
+    `dtype`, scaled to `radius`. Works element-wise on arrays of distances.
+    """
+    near, anywhere = ERROR_BOUNDS[np.dtype(dtype)]
+    scale = radius / EARTH_RADIUS
+    return np.where(np.asarray(distance) < 19000 * scale, near, anywhere) * scale
+
+
+def to_cartesian(lat, lon, radius=EARTH_RADIUS, dtype=np.float64):
+    """
+    Convert latitude and longitude in degrees to Cartesian coordinates.
+    Returns an array of shape (3, ...) holding x, y and z in `dtype`.
+    """
+    lat = np.radians(np.asarray(lat, dtype=dtype))
+    lon = np.radians(np.asarray(lon, dtype=dtype))
+    cos_lat = np.cos(lat)
+
+    xyz = np.empty((3,) + np.broadcast_shapes(lat.shape, lon.shape), dtype=dtype)
+    np.multiply(cos_lat, np.cos(lon), out=xyz[0, ...])
+    np.multiply(cos_lat, np.sin(lon), out=xyz[1, ...])
+    np.sin(lat, out=xyz[2, ...])
+    xyz *= radius
+    return xyz
+
+
+def unit_vectors(points, dtype=np.float64):
+    """Convert [[lat1, lon1], [lat2, lon2], ...] in degrees to an (N, 3) array of unit vectors."""
+    points = np.asarray(points, dtype=dtype).reshape(-1, 2)
+    return np.ascontiguousarray(to_cartesian(points[:, 0], points[:, 1], radius=1, dtype=dtype).T)
+
+
+def prepare_points(lat, lon, dtype=np.float64):
+    """
+    Convert latitudes and longitudes in degrees to contiguous float arrays in
+    radians and precompute the cosine of the latitude.
+    """
+    lat = np.asarray(np.radians(np.asarray(lat, dtype=dtype)), order='C')
+    lon = np.asarray(np.radians(np.asarray(lon, dtype=dtype)), order='C')
+    return PreparedPoints(lat, lon, np.cos(lat))
+
+
+def as_prepared(points, dtype=np.float64):
+    """
+    Return points as PreparedPoints. Accepts PreparedPoints (returned unchanged)
+    or an array-like of [lat, lon] pairs in degrees.
+    """
+    if isinstance(points, PreparedPoints):
+        return points
+    points = np.asarray(points, dtype=dtype)
+    return prepare_points(points[..., 0], points[..., 1], dtype=dtype)
+
+
+def astype(points, dtype):
+    """Cast PreparedPoints to another precision without recomputing any trigonometry."""
+    return PreparedPoints(*(np.asarray(values, dtype=dtype) for values in points))
+
+
+def pairwise(p1, p2):
+    """
+    Reshape two sets of PreparedPoints so that the kernels broadcast them into
+    an N x M grid (rows from p1, columns from p2). No data is copied.
+    """
+    p1 = PreparedPoints(*(np.reshape(values, (-1, 1)) for values in p1))
+    p2 = PreparedPoints(*(np.reshape(values, (1, -1)) for values in p2))
+    return p1, p2
+
+
+def _buffer(buffer, p1, p2):
+    # Allocate an output buffer of the broadcast shape unless the caller gave one
+    if buffer is not None:
+        return buffer
+    shape = np.broadcast_shapes(np.shape(p1.lat), np.shape(p1.lon), np.shape(p2.lat), np.shape(p2.lon))
+    return np.empty(shape, dtype=np.result_type(p1.lat, p2.lat))
+
+
+def _result(out):
+    # Hand scalars back as NumPy scalars rather than 0-d arrays
+    return out if out.ndim else out[()]
+
+
+def haversine_term(p1, p2, out=None, work=None):
+    """
+    Compute a = sin²(Δlat/2) + cos(lat1)·cos(lat2)·sin²(Δlon/2) for two
+    broadcastable sets of PreparedPoints.
+
+    `out` and `work` are optional buffers of the broadcast shape. Both are
+    overwritten; the result is written into `out`.
+    """
+    out = _buffer(out, p1, p2)
+    work = _buffer(work, p1, p2)
+
+    np.subtract(p2.lat, p1.lat, out=out)
+    out *= 0.5
+    np.sin(out, out=out)
+    np.square(out, out=out)
+
+    np.subtract(p2.lon, p1.lon, out=work)
+    work *= 0.5
+    np.sin(work, out=work)
+    np.square(work, out=work)
+    work *= p1.cos_lat
+    work *= p2.cos_lat
+
+    out += work
+    np.clip(out, 0.0, 1.0, out=out)  # Clip for numerical stability
+    return out
+
+
+def central_angle(p1, p2, out=None, work=None):
+    """Central angle (in radians) between two broadcastable sets of PreparedPoints."""
+    out = haversine_term(p1, p2, out=out, work=work)
+    np.sqrt(out, out=out)
+    np.arcsin(out, out=out)
+    out *= 2.0
+    return _result(out)
+
+
+def great_circle_distance(p1, p2, radius=EARTH_RADIUS, out=None, work=None):
+    """Great-circle distance between two broadcastable sets of PreparedPoints."""
+    out = haversine_term(p1, p2, out=out, work=work)
+    np.sqrt(out, out=out)
+    np.arcsin(out, out=out)
+    out *= 2.0 * radius
+    return _result(out)
+
+
+def chord_length(p1, p2, radius=EARTH_RADIUS, out=None, work=None):
+    """Straight-line (3D chord) distance between two broadcastable sets of PreparedPoints."""
+    out = haversine_term(p1, p2, out=out, work=work)
+    np.sqrt(out, out=out)
+    out *= 2.0 * radius
+    return _result(out)
+
+
+def chord_to_distance(chord, radius=EARTH_RADIUS):
+    """Convert a chord length on the unit sphere to a great-circle distance on `radius`."""
+    half = np.minimum(np.asarray(chord, dtype=np.float64) / 2.0, 1.0)
+    return 2.0 * radius * np.arcsin(half)
+
+
+def distance_to_chord(distance, radius=EARTH_RADIUS):
+    """Convert a great-circle distance on `radius` to the chord length on the unit sphere."""
+    angle = np.minimum(np.asarray(distance, dtype=np.float64) / radius, np.pi)
+    return 2.0 * np.sin(angle / 2.0)
+
+
+def haversine(lat1, lon1, lat2, lon2, radius=EARTH_RADIUS, out=None, dtype=np.float64):
+    """
+    Calculate the great-circle distance between points given in degrees.
+    Inputs broadcast against each other like any NumPy operation and the
+    computation runs in `dtype` (see ERROR_BOUNDS for the accuracy of each).
+    """
+    return great_circle_distance(prepare_points(lat1, lon1, dtype), prepare_points(lat2, lon2, dtype),
+                                 radius=radius, out=out)
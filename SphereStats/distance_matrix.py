@@ -0,0 +1,296 @@
+# SphereStats/distance_matrix.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from SphereStats.distance_kernels import (
+    EARTH_RADIUS,
+    PreparedPoints,
+    as_prepared,
+    astype,
+    error_bound,
+    great_circle_distance,
+    pairwise,
+)
+
+# Scratch memory per tile: the work buffer plus the output tile being written.
+# 1 MiB keeps a tile resident in L2 cache on most machines.
+DEFAULT_MAX_BYTES = 2 ** 20
+
+# Output rows staged in shared memory per process-pool worker and round
+STAGING_BYTES = 2 ** 26
+
+
+def block_shape(n_rows, n_cols, itemsize=8, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Choose the (rows, cols) of a tile so that the work buffer and the output
+    tile together use at most max_bytes. Whole rows are preferred so that each
+    tile writes contiguous memory.
+    """
+    elements = max(1, max_bytes // (2 * itemsize))
+    cols = max(1, min(n_cols, elements))
+    rows = max(1, min(n_rows, elements // cols))
+    return rows, cols
+
+
+def iter_blocks(n_rows, n_cols, rows, cols):
+    """Yield (row_slice, col_slice) pairs covering an n_rows x n_cols matrix."""
+    for r0 in range(0, n_rows, rows):
+        for c0 in range(0, n_cols, cols):
+            yield slice(r0, min(r0 + rows, n_rows)), slice(c0, min(c0 + cols, n_cols))
+
+
+def flatten_points(points, dtype=np.float64):
+    """Return points as 1-D PreparedPoints."""
+    return PreparedPoints(*(np.ravel(values) for values in as_prepared(points, dtype)))
+
+
+def fill_tiles(a, b, radius, out, max_bytes=DEFAULT_MAX_BYTES):
+    """Fill out (len(a) x len(b)) tile by tile, reusing one scratch buffer."""
+    n_rows, n_cols = out.shape
+    rows, cols = block_shape(n_rows, n_cols, out.dtype.itemsize, max_bytes)
+    work_buffer = np.empty(rows * cols, dtype=out.dtype)
+
+    for row_slice, col_slice in iter_blocks(n_rows, n_cols, rows, cols):
+        p1 = PreparedPoints(*(values[row_slice] for values in a))
+        p2 = PreparedPoints(*(values[col_slice] for values in b))
+        tile = out[row_slice, col_slice]
+        work = work_buffer[:tile.size].reshape(tile.shape)
+        great_circle_distance(*pairwise(p1, p2), radius=radius, out=tile, work=work)
+    return out
+
+
+def row_slices(n_rows, parts):
+    """Split range(n_rows) into at most `parts` contiguous, non-empty slices."""
+    bounds = np.linspace(0, n_rows, min(parts, n_rows) + 1).astype(int)
+    return [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def fill_threaded(a, b, radius, out, max_bytes, workers):
+    """Fill row blocks of out from a thread pool. NumPy releases the GIL inside the kernels."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(fill_tiles, PreparedPoints(*(values[rows] for values in a)), b,
+                        radius, out[rows], max_bytes)
+            for rows in row_slices(len(out), workers)
+        ]
+        for future in futures:
+            future.result()
+    return out
+
+
+def shared_rows_worker(task):
+    """Process-pool worker: attach to the shared inputs and staging buffer and fill a row block."""
+    inputs_name, input_dtype, output_name, output_dtype, n_rows, n_cols, stage_rows, rows, staged, radius, \
+        max_bytes = task
+    inputs = shared_memory.SharedMemory(name=inputs_name)
+    output = shared_memory.SharedMemory(name=output_name)
+    try:
+        packed = np.ndarray((3, n_rows + n_cols), dtype=input_dtype, buffer=inputs.buf)
+        out = np.ndarray((stage_rows, n_cols), dtype=output_dtype, buffer=output.buf)
+        a = PreparedPoints(*packed[:, rows])
+        b = PreparedPoints(*packed[:, n_rows:])
+        fill_tiles(a, b, radius, out[staged], max_bytes)
+        # Views into the shared buffers must be released before closing them
+        del packed, out, a, b
+    finally:
+        inputs.close()
+        output.close()
+
+
+def fill_processes(a, b, radius, out, max_bytes, workers):
+    """
+    Fill out from a process pool. The inputs live in
+    multiprocessing.shared_memory and the workers write into a shared staging
+    buffer of at most STAGING_BYTES per worker, which is copied into out after
+    every round. Peak memory therefore stays close to out itself (which may
+    be an np.memmap), and workers only receive segment names and row ranges.
+    """
+    n_rows, n_cols = out.shape
+    input_dtype = np.result_type(a.lat, b.lat)
+    row_bytes = n_cols * out.dtype.itemsize
+    stage_rows = min(n_rows, workers * max(1, STAGING_BYTES // row_bytes))
+    inputs = shared_memory.SharedMemory(create=True, size=3 * (n_rows + n_cols) * input_dtype.itemsize)
+    output = shared_memory.SharedMemory(create=True, size=stage_rows * row_bytes)
+    try:
+        packed = np.ndarray((3, n_rows + n_cols), dtype=input_dtype, buffer=inputs.buf)
+        packed[:, :n_rows] = a
+        packed[:, n_rows:] = b
+        staging = np.ndarray((stage_rows, n_cols), dtype=out.dtype, buffer=output.buf)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for start in range(0, n_rows, stage_rows):
+                stop = min(start + stage_rows, n_rows)
+                tasks = [
+                    (inputs.name, input_dtype.str, output.name, out.dtype.str, n_rows, n_cols, stage_rows,
+                     slice(start + staged.start, start + staged.stop), staged, radius, max_bytes)
+                    for staged in row_slices(stop - start, workers)
+                ]
+                list(pool.map(shared_rows_worker, tasks))
+                out[start:stop] = staging[:stop - start]
+
+        del packed, staging
+    finally:
+        inputs.close()
+        inputs.unlink()
+        output.close()
+        output.unlink()
+    return out
+
+
+def distance_matrix(a, b=None, radius=EARTH_RADIUS, out=None, max_bytes=DEFAULT_MAX_BYTES,
+                    workers=1, backend='thread', dtype=np.float64):
+    """
+    Compute the N x M matrix of great-circle distances between two point sets.
+
+    Args:
+    a: N points as PreparedPoints or [[lat1, lon1], [lat2, lon2], ...] in degrees
+    b: M points in the same format; defaults to a
+    radius: Sphere radius, the result is in the same unit
+    out: Optional (N, M) array to write into (e.g. a np.memmap for very large results)
+    max_bytes: Scratch memory budget per tile
+    workers: Number of threads/processes sharing the rows; None uses every CPU
+    backend: 'thread' or 'process' (inputs and a staging buffer for the output in shared memory)
+    dtype: Working precision for points given in degrees (see distance_kernels.ERROR_BOUNDS)
+
+    Returns:
+    out: The (N, M) distance matrix
+    """
+    if backend not in ('thread', 'process'):
+        raise ValueError(f"Unknown backend {backend!r}, expected 'thread' or 'process'")
+    a = flatten_points(a, dtype)
+    b = a if b is None else flatten_points(b, dtype)
+    n_rows, n_cols = a.lat.size, b.lat.size
+
+    dtype = np.result_type(a.lat, b.lat)
+    if out is None:
+        out = np.empty((n_rows, n_cols), dtype=dtype)
+    elif out.shape != (n_rows, n_cols):
+        raise ValueError(f"out has shape {out.shape}, expected {(n_rows, n_cols)}")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or n_rows < 2 or out.size == 0:
+        return fill_tiles(a, b, radius, out, max_bytes)
+    if backend == 'thread':
+        return fill_threaded(a, b, radius, out, max_bytes, workers)
+    return fill_processes(a, b, radius, out, max_bytes, workers)
+
+
+def distances_from(origin, points, radius=EARTH_RADIUS, out=None, max_bytes=DEFAULT_MAX_BYTES,
+                   workers=1, backend='thread', dtype=np.float64):
+    """
+    Compute the great-circle distance from one origin (lat, lon) to each of M points.
+    Accepts the same out/max_bytes/workers/backend/dtype options as distance_matrix.
+    """
+    column = None if out is None else out.reshape(-1, 1)
+    column = distance_matrix(points, [origin], radius=radius, out=column, max_bytes=max_bytes,
+                             workers=workers, backend=backend, dtype=dtype)
+    return column[:, 0] if out is None else out
+
+
+def screened_tiles(a, b, radius, max_bytes):
+    """
+    Yield (row_slice, col_slice, distances) for every tile of the float32
+    distance matrix between a and b. The distances array is a reused buffer.
+    """
+    a32, b32 = astype(a, np.float32), astype(b, np.float32)
+    n_rows, n_cols = a.lat.size, b.lat.size
+    rows, cols = block_shape(n_rows, n_cols, 4, max_bytes)
+    out_buffer = np.empty(rows * cols, dtype=np.float32)
+    work_buffer = np.empty(rows * cols, dtype=np.float32)
+
+    for row_slice, col_slice in iter_blocks(n_rows, n_cols, rows, cols):
+        p1 = PreparedPoints(*(values[row_slice] for values in a32))
+        p2 = PreparedPoints(*(values[col_slice] for values in b32))
+        p1, p2 = pairwise(p1, p2)
+        shape = (p1.lat.shape[0], p2.lat.shape[1])
+        tile = out_buffer[:shape[0] * shape[1]].reshape(shape)
+        work = work_buffer[:tile.size].reshape(shape)
+        yield row_slice, col_slice, great_circle_distance(p1, p2, radius=radius, out=tile, work=work)
+
+
+def refine(a, b, rows, cols, radius):
+    """Exact float64 distances for the (rows[k], cols[k]) pairs only."""
+    p1 = PreparedPoints(*(values[rows] for values in a))
+    p2 = PreparedPoints(*(values[cols] for values in b))
+    return np.asarray(great_circle_distance(p1, p2, radius=radius))
+
+
+def pairs_within(a, b, max_distance, radius=EARTH_RADIUS, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Find every pair of points closer than max_distance.
+
+    All pairs are screened in float32; only the candidates that pass the
+    screen (padded by the float32 error bound) are recomputed in float64, so
+    the result is exact while the full N x M pass runs at single precision.
+
+    Returns:
+    rows, cols: Indices into a and b of the matching pairs
+    distances: Their float64 great-circle distances
+    """
+    a = flatten_points(a)
+    b = flatten_points(b)
+    threshold = max_distance + error_bound(max_distance, np.float32, radius)
+
+    rows, cols = [], []
+    for row_slice, col_slice, distances in screened_tiles(a, b, radius, max_bytes):
+        i, j = np.nonzero(distances <= threshold)
+        rows.append(i + row_slice.start)
+        cols.append(j + col_slice.start)
+
+    rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.intp)
+    cols = np.concatenate(cols) if cols else np.empty(0, dtype=np.intp)
+    distances = refine(a, b, rows, cols, radius)
+    keep = distances <= max_distance
+    return rows[keep], cols[keep], distances[keep]
+
+
+def nearest(a, b, radius=EARTH_RADIUS, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    For each point in a, find the closest point in b.
+
+    A single float32 pass keeps, per row, only the candidates within twice the
+    float32 error bound of the running minimum; those are then refined in
+    float64 to pick the exact nearest neighbour.
+
+    Returns:
+    indices: Index into b of the nearest point for each point in a
+    distances: The float64 distance to it
+    """
+    a = flatten_points(a)
+    b = flatten_points(b)
+    n_rows = a.lat.size
+    best = np.full(n_rows, np.inf, dtype=np.float32)
+
+    rows, cols, screened = [], [], []
+    for row_slice, col_slice, distances in screened_tiles(a, b, radius, max_bytes):
+        np.minimum(best[row_slice], distances.min(axis=1), out=best[row_slice])
+        limit = best[row_slice] + 2 * error_bound(best[row_slice], np.float32, radius)
+        i, j = np.nonzero(distances <= limit[:, None])
+        rows.append(i + row_slice.start)
+        cols.append(j + col_slice.start)
+        screened.append(distances[i, j])
+
+    if n_rows == 0 or b.lat.size == 0:
+        return np.full(n_rows, -1, dtype=np.intp), np.full(n_rows, np.inf)
+
+    # Candidates kept early against a larger running minimum are dropped here
+    rows, cols, screened = np.concatenate(rows), np.concatenate(cols), np.concatenate(screened)
+    keep = screened <= best[rows] + 2 * error_bound(best[rows], np.float32, radius)
+    rows, cols = rows[keep], cols[keep]
+
+    distances = refine(a, b, rows, cols, radius)
+    order = np.lexsort((distances, rows))
+    first = np.ones(order.size, dtype=bool)
+    first[1:] = rows[order][1:] != rows[order][:-1]
+    winners = order[first]
+
+    indices = np.empty(n_rows, dtype=np.intp)
+    nearest_distances = np.empty(n_rows)
+    indices[rows[winners]] = cols[winners]
+    nearest_distances[rows[winners]] = distances[winners]
+    return indices, nearest_distances
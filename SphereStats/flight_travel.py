@@ -1,26 +1,19 @@
 # flight_travel.py
 
 import numpy as np
-import matplotlib.pyplot as plt
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
+
+from SphereStats.distance_kernels import haversine as haversine_distance
+from SphereStats.lazy_imports import lazy_import
+
+plt = lazy_import('matplotlib.pyplot')
+ccrs = lazy_import('cartopy.crs')
+cfeature = lazy_import('cartopy.feature')
+
 
 # Constants
 EARTH_RADIUS = 6371  # in kilometers
 FLIGHT_SPEED = 900  # Average commercial flight speed in km/h
 
-# Function to calculate great-circle distance
-def haversine_distance(lat1, lon1, lat2, lon2):
-    """
-    Calculate the great-circle distance between two points on the Earth (in km).
-    """
-    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = np.sin(dlat / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2)**2
-    c = 2 * np.arcsin(np.sqrt(a))
-    return EARTH_RADIUS * c
-
 # City coordinates
 cities = {
     "New York": (40.7128, -74.0060),
@@ -1,19 +1,23 @@
 # great_circle.py
 
 import numpy as np
-import matplotlib.pyplot as plt
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
 
-def great_circle_arc(lat1, lon1, lat2, lon2, num_points=100):
+from SphereStats.lazy_imports import lazy_import
+
+plt = lazy_import('matplotlib.pyplot')
+ccrs = lazy_import('cartopy.crs')
+cfeature = lazy_import('cartopy.feature')
+
+
+def great_circle_arc(lat1, lon1, lat2, lon2, num_points=100, dtype=np.float64):
     """
     Calculate points along the great-circle arc between two geographical coordinates.
-    Returns arrays of latitude and longitude points along the arc.
+    Returns arrays of latitude and longitude points along the arc, computed in `dtype`.
     """
-    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=dtype)) for value in [lat1, lon1, lat2, lon2])
 
     # Interpolate the great circle
-    t = np.linspace(0, 1, num_points)
+    t = np.linspace(0, 1, num_points, dtype=dtype)
     d = 2 * np.arcsin(np.sqrt(np.sin((lat2 - lat1) / 2)**2 +
                               np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2))
     A = np.sin((1 - t) * d) / np.sin(d)
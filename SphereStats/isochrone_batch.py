@@ -0,0 +1,73 @@
+# SphereStats/isochrone_batch.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from SphereStats.distance_matrix import row_slices
+from SphereStats.lazy_imports import lazy_import
+
+gpd = lazy_import('geopandas')
+pd = lazy_import('pandas')
+
+# Origins handed to a worker at a time; finished chunks are written out as they arrive
+CHUNK_SIZE = 64
+
+
+def origin_chunks(n_origins, chunk_size=CHUNK_SIZE):
+    """Slices splitting n_origins into chunks of about chunk_size."""
+    return row_slices(n_origins, -(-n_origins // max(chunk_size, 1)))
+
+
+def records_frame(records):
+    """GeoDataFrame of (origin, threshold, geometry) records."""
+    origins, thresholds, geometries = zip(*records) if records else ((), (), ())
+    return gpd.GeoDataFrame({'origin': np.asarray(origins, dtype=np.int64),
+                             'threshold': np.asarray(thresholds, dtype=np.float64)},
+                            geometry=list(geometries), crs="EPSG:4326")
+
+
+def run_batch(worker, tasks, workers=1, output=None, layer='isochrones'):
+    """
+    Run worker over tasks and gather the isochrones they return.
+
+    Each task covers a chunk of origins and worker(task) returns a list of
+    (origin, threshold, geometry) records for it. With workers > 1 the tasks
+    go to a process pool. If output is given, every finished chunk is
+    appended to that GeoPackage layer as soon as it arrives, so a long run
+    keeps its progress on disk (an existing file is replaced).
+
+    Args:
+    worker: Module-level function, so it can be sent to worker processes
+    tasks: List of task arguments
+    workers: Number of processes; None uses every CPU
+    output: Optional path of a .gpkg file
+
+    Returns:
+    GeoDataFrame indexed by (origin, threshold)
+    """
+    if output is not None and os.path.exists(output):
+        os.remove(output)
+
+    frames = []
+
+    def collect(records):
+        frame = records_frame(records)
+        if output is not None and len(frame):
+            frame.to_file(output, layer=layer, driver='GPKG', mode='a', geometry_type='Unknown')
+        frames.append(frame)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(tasks) < 2:
+        for task in tasks:
+            collect(worker(task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for future in as_completed([pool.submit(worker, task) for task in tasks]):
+                collect(future.result())
+
+    isochrones = gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), crs="EPSG:4326") if frames \
+        else records_frame([])
+    return isochrones.set_index(['origin', 'threshold']).sort_index()
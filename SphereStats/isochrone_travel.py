@@ -1,58 +1,279 @@
-# From your own library (SphereStats)
-from SphereStats.flight_travel import haversine_distance
 import numpy as np
-import matplotlib.pyplot as plt
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-from shapely.geometry import Point
-from shapely.ops import unary_union
-import geopandas as gpd
-from matplotlib.patches import Patch
+
+from SphereStats.distance_kernels import haversine as haversine_distance
+from SphereStats.isochrone_batch import CHUNK_SIZE, origin_chunks, run_batch
+from SphereStats.lazy_imports import lazy_import
+
+plt = lazy_import('matplotlib.pyplot')
+ccrs = lazy_import('cartopy.crs')
+cfeature = lazy_import('cartopy.feature')
+Point = lazy_import('shapely.geometry', 'Point')
+Polygon = lazy_import('shapely.geometry', 'Polygon')
+MultiPolygon = lazy_import('shapely.geometry', 'MultiPolygon')
+contourpy = lazy_import('contourpy')
+unary_union = lazy_import('shapely.ops', 'unary_union')
+gpd = lazy_import('geopandas')
+Patch = lazy_import('matplotlib.patches', 'Patch')
+
 
 # Constants for the isochrone functionality
 EARTH_RADIUS = 6371  # in kilometers
 TRAVEL_SPEED = 60  # Speed in km/h (assumed constant)
 TIME_THRESHOLDS = [1, 2, 3]  # Travel time thresholds in hours
+DEFAULT_TOLERANCE = 0.1  # Target accuracy of isochrone boundaries in kilometers
+MAX_GRID_POINTS = 4_000_000  # Adaptive grids are coarsened beyond this size
+LAT_BAND = 5  # Batch origins share grid offsets within bands of this many degrees of latitude
+
 
-# Function to calculate haversine distance
-def haversine_distance(lat1, lon1, lat2, lon2):
+def circle_vertex_count(radius, tolerance=DEFAULT_TOLERANCE):
     """
-    Calculate the great-circle distance between two points on the Earth (in km).
+    Number of vertices for a polygon approximating a circle of great-circle
+    radius `radius` (km) whose edges stray at most `tolerance` km from it:
+    an edge spanning 2π/n of a circle of (Euclidean) radius ρ misses it by
+    ρ·(1 - cos(π/n)) at its middle.
     """
-    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = np.sin(dlat / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2)**2
-    c = 2 * np.arcsin(np.sqrt(a))
-    return EARTH_RADIUS * c
+    rho = EARTH_RADIUS * np.sin(min(radius / EARTH_RADIUS, np.pi / 2))
+    if tolerance >= rho:
+        return 8
+    return int(min(max(np.ceil(np.pi / np.arccos(1 - tolerance / rho)), 8), 1_000_000))
 
-def generate_isochrones(center_lat, center_lon, time_thresholds):
+
+def geodesic_circle(center_lat, center_lon, radius, tolerance=DEFAULT_TOLERANCE):
     """
-    Generate isochrones based on time thresholds.
-    Returns a list of GeoDataFrames representing isochrones.
+    Boundary of the spherical cap of great-circle radius `radius` (km) around
+    a centre, as a polygon in lon/lat degrees with circle_vertex_count
+    vertices. Longitudes are unwrapped across the antimeridian, and a cap
+    around a pole is closed along that pole. A cap holding both poles is the
+    whole globe with the complementary cap around the antipode as a hole.
+
+    Returns:
+    shapely Polygon
     """
-    # Generate grid points around the center location
-    lats = np.linspace(center_lat - 5, center_lat + 5, 200)
-    lons = np.linspace(center_lon - 5, center_lon + 5, 200)
-    lon_grid, lat_grid = np.meshgrid(lons, lats)
+    delta = radius / EARTH_RADIUS
+    if delta >= np.pi:
+        return Polygon([(-180, -90), (180, -90), (180, 90), (-180, 90)])
+    if delta > np.radians(90 + abs(center_lat)):
+        antipode_lon = (center_lon + 360) % 360 - 180
+        hole = geodesic_circle(-center_lat, antipode_lon, np.pi * EARTH_RADIUS - radius, tolerance)
+        west, east = antipode_lon - 180, antipode_lon + 180
+        return Polygon([(west, -90), (east, -90), (east, 90), (west, 90)], [hole.exterior.coords])
+    bearings = np.linspace(0, 2 * np.pi, circle_vertex_count(radius, tolerance), endpoint=False)
+    phi1, lambda1 = np.radians(center_lat), np.radians(center_lon)
+    sin_phi2 = np.sin(phi1) * np.cos(delta) + np.cos(phi1) * np.sin(delta) * np.cos(bearings)
+    phi2 = np.arcsin(np.clip(sin_phi2, -1, 1))
+    lambda2 = lambda1 + np.arctan2(np.sin(bearings) * np.sin(delta) * np.cos(phi1),
+                                   np.cos(delta) - np.sin(phi1) * sin_phi2)
+    lats, lons = np.degrees(phi2), np.degrees(np.unwrap(lambda2))
 
-    # Calculate distances and travel times for each point in the grid
-    distances = haversine_distance(center_lat, center_lon, lat_grid, lon_grid)
-    travel_times = distances / TRAVEL_SPEED  # Time in hours
+    # A cap holding a pole: the boundary winds once around it
+    pole = 90.0 if delta > np.radians(90 - center_lat) else -90.0 if delta > np.radians(90 + center_lat) else None
+    if pole is not None:
+        order = np.argsort(lons)
+        lats, lons = lats[order], lons[order]
+        lats = np.concatenate([lats, [lats[0], pole, pole]])
+        lons = np.concatenate([lons, [lons[0] + 360, lons[0] + 360, lons[0]]])
+    return Polygon(np.column_stack([lons, lats]))
 
-    # Create polygons for isochrones
-    isochrones = []
-    for threshold in time_thresholds:
+
+def grid_offsets(time_thresholds, speed=TRAVEL_SPEED, tolerance=DEFAULT_TOLERANCE, max_lat=0.0, min_lat=None,
+                 max_points=MAX_GRID_POINTS):
+    """
+    Grid axes, in degrees relative to a centre, sized for the thresholds: the
+    extent just covers the largest reachable distance (widened in longitude
+    by 1/cos(latitude), up to the whole globe near the poles) and the spacing
+    h keeps the contouring error of the smallest isochrone, about h²/(8·r)
+    for radius r, within tolerance.
+
+    The same offsets serve every centre whose absolute latitude lies between
+    min_lat (default: max_lat) and max_lat.
+
+    Returns:
+    lat_offsets, lon_offsets: 1-D grid axes
+    """
+    radii = speed * np.asarray(time_thresholds, dtype=np.float64)
+    reach = np.degrees(radii.max() / EARTH_RADIUS) * 1.05 + 1e-6
+    spacing = np.degrees(np.sqrt(8 * max(radii.min(), tolerance) * tolerance) / EARTH_RADIUS)
+
+    widest = min(abs(max_lat) + reach, 90.0)
+    half_width = 180.0 if widest >= 89.0 else min(reach / np.cos(np.radians(widest)), 180.0)
+    min_lat = abs(max_lat) if min_lat is None else min(abs(min_lat), 89.0)
+
+    n_lat = int(np.ceil(2 * reach / spacing)) + 1
+    n_lon = int(np.ceil(2 * half_width / (spacing / np.cos(np.radians(min_lat))))) + 1
+    scale = max(1.0, np.sqrt(n_lat * n_lon / max_points))
+    n_lat, n_lon = max(int(n_lat / scale), 3), max(int(n_lon / scale), 3)
+    return np.linspace(-reach, reach, n_lat), np.linspace(-half_width, half_width, n_lon)
+
+
+def grid_travel_times(center_lat, center_lon, lat_offsets, lon_offsets, speed=TRAVEL_SPEED):
+    """
+    Travel times (hours) from a centre over the grid of offsets around it.
+
+    The haversine term sin²(Δφ/2) + cos φ1·cos φ2·sin²(Δλ/2) separates into
+    per-row and per-column factors, so only the final square root and arcsine
+    run over the whole grid.
+
+    Returns:
+    lats, lons: 1-D grid axes in degrees (rows beyond the poles dropped)
+    travel_times: Array of shape (len(lats), len(lons))
+    """
+    lats = center_lat + lat_offsets
+    within = np.abs(lats) <= 90.0
+    lats, lat_offsets = lats[within], lat_offsets[within]
+    rows = np.sin(np.radians(lat_offsets) / 2) ** 2
+    scale = np.cos(np.radians(center_lat)) * np.cos(np.radians(lats))
+    columns = np.sin(np.radians(lon_offsets) / 2) ** 2
+    h = np.minimum(rows[:, None] + scale[:, None] * columns, 1.0)
+    distances = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(h, out=h), out=h)
+    return lats, center_lon + lon_offsets, np.divide(distances, speed, out=distances)
+
+
+def contour_polygons(x, y, values, thresholds):
+    """
+    Regions of a grid where values <= threshold, for every threshold, traced
+    by marching squares (contourpy, which ships with matplotlib).
+
+    The contour generator, which holds the grid, is built once and each
+    threshold is a single vectorized pass over it. Region edges are
+    interpolated between grid points, so the result is much smoother than
+    unions of buffered grid points at the same resolution.
+
+    Args:
+    x, y: 1-D grid coordinates (e.g. lons and lats)
+    values: Array of shape (len(y), len(x))
+    thresholds: Levels to trace
+
+    Returns:
+    List of shapely MultiPolygons (with holes), one per threshold
+    """
+    generator = contourpy.contour_generator(x, y, values, fill_type='OuterOffset')
+    lower = np.nanmin(values) - 1.0
+    regions = []
+    for threshold in thresholds:
+        polygons = []
+        if threshold > lower + 1.0:
+            for points, offsets in zip(*generator.filled(lower, threshold)):
+                rings = [points[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+                polygons.append(Polygon(rings[0], rings[1:]))
+        regions.append(MultiPolygon(polygons))
+    return regions
+
+
+def buffered_points(lon_grid, lat_grid, travel_times, thresholds):
+    """
+    Fallback: union of buffered grid points within each threshold (slow, but
+    needs no contouring). Points are buffered by one grid step so the union
+    has no gaps between them.
+    """
+    step = max(np.ptp(lon_grid, axis=1).max() / max(lon_grid.shape[1] - 1, 1),
+               np.ptp(lat_grid, axis=0).max() / max(lat_grid.shape[0] - 1, 1))
+    regions = []
+    for threshold in thresholds:
         mask = travel_times <= threshold
         points_within = [
             Point(lon, lat) for lon, lat, within in zip(lon_grid.flatten(), lat_grid.flatten(), mask.flatten()) if within
         ]
-        isochrones.append(unary_union([point.buffer(0.1) for point in points_within]))  # Approximate regions
+        regions.append(unary_union([point.buffer(step) for point in points_within]))  # Approximate regions
+    return regions
+
+
+def isochrone_regions(center_lat, center_lon, time_thresholds, method='contour', speed=TRAVEL_SPEED,
+                      tolerance=DEFAULT_TOLERANCE, offsets=None):
+    """
+    Isochrone geometries around one centre (see generate_isochrones).
+
+    offsets: (lat_offsets, lon_offsets) from grid_offsets, to reuse one grid
+             for many centres; by default sized for this centre
+
+    Returns:
+    List of shapely geometries, one per threshold
+    """
+    if method not in ('analytic', 'contour', 'buffer'):
+        raise ValueError(f"Unknown method {method!r}, expected 'analytic', 'contour' or 'buffer'")
+    if method == 'analytic':
+        return [geodesic_circle(center_lat, center_lon, speed * threshold, tolerance) for threshold in time_thresholds]
+
+    # Travel times over the grid of points around the center location
+    if offsets is None:
+        offsets = grid_offsets(time_thresholds, speed, tolerance, center_lat)
+    lats, lons, travel_times = grid_travel_times(center_lat, center_lon, *offsets, speed)
+
+    # Create polygons for isochrones
+    if method == 'contour':
+        try:
+            return contour_polygons(lons, lats, travel_times, time_thresholds)
+        except ImportError:
+            pass  # No contourpy, use the point buffers below
+    lon_grid, lat_grid = np.meshgrid(lons, lats)
+    return buffered_points(lon_grid, lat_grid, travel_times, time_thresholds)
+
+
+def generate_isochrones(center_lat, center_lon, time_thresholds, method='contour', speed=TRAVEL_SPEED,
+                        tolerance=DEFAULT_TOLERANCE):
+    """
+    Generate isochrones based on time thresholds.
+    Returns a list of GeoDataFrames representing isochrones.
+
+    method='analytic' returns each constant-speed isochrone directly as a
+    geodesic circle whose vertex count follows tolerance (km).
+    method='contour' traces the regions from a travel-time grid with
+    marching squares; method='buffer' uses the older union of buffered grid
+    points, which is also the fallback when contourpy is not available.
+    The grid's extent and resolution follow the thresholds and tolerance
+    (see grid_offsets).
+    """
+    isochrones = isochrone_regions(center_lat, center_lon, time_thresholds, method, speed, tolerance)
 
     # Convert to GeoDataFrames
     iso_gdfs = [gpd.GeoDataFrame(geometry=[iso], crs="EPSG:4326") for iso in isochrones]
     return iso_gdfs
 
+
+def isochrone_chunk(task):
+    """Process-pool worker: (origin, threshold, geometry) records for a chunk of origins."""
+    indices, origins, time_thresholds, method, speed, tolerance, offsets = task
+    records = []
+    for origin, (center_lat, center_lon) in zip(indices.tolist(), origins.tolist()):
+        regions = isochrone_regions(center_lat, center_lon, time_thresholds, method, speed, tolerance, offsets)
+        records.extend(zip([origin] * len(regions), time_thresholds, regions))
+    return records
+
+
+def batch_isochrones(origins, time_thresholds, method='contour', speed=TRAVEL_SPEED, tolerance=DEFAULT_TOLERANCE,
+                     workers=1, output=None, chunk_size=CHUNK_SIZE):
+    """
+    Isochrones around many centres with shared thresholds.
+
+    Origins are grouped into bands of LAT_BAND degrees of latitude and the
+    grid offsets are sized once per band, then reused for every origin in
+    it. Chunks of origins are spread over workers processes and, if output
+    (a .gpkg path) is given, written to disk as each chunk finishes (see
+    isochrone_batch.run_batch).
+
+    Args:
+    origins: (n, 2) array of (lat, lon) centres
+    time_thresholds: Travel times in hours, shared by every origin
+
+    Returns:
+    GeoDataFrame of geometries indexed by (origin, threshold), where origin
+    is the row of origins
+    """
+    if method not in ('analytic', 'contour', 'buffer'):
+        raise ValueError(f"Unknown method {method!r}, expected 'analytic', 'contour' or 'buffer'")
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    time_thresholds = [float(threshold) for threshold in time_thresholds]
+    bands = np.minimum(np.abs(origins[:, 0]) // LAT_BAND, 90 // LAT_BAND - 1).astype(int)
+    tasks = []
+    for band in np.unique(bands).tolist():
+        indices = np.nonzero(bands == band)[0]
+        offsets = None
+        if method != 'analytic':
+            offsets = grid_offsets(time_thresholds, speed, tolerance, (band + 1) * LAT_BAND, band * LAT_BAND)
+        tasks.extend((indices[rows], origins[indices[rows]], time_thresholds, method, speed, tolerance, offsets)
+                     for rows in origin_chunks(len(indices), chunk_size))
+    return run_batch(isochrone_chunk, tasks, workers, output)
+
+
 def plot_isochrones():
     """
     Plot the isochrones generated from the center location.
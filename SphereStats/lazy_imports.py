@@ -0,0 +1,50 @@
+# SphereStats/lazy_imports.py
+
+# Every SphereStats module binds its plotting and GIS dependencies (matplotlib,
+# cartopy, shapely, geopandas, ...) with lazy_import at module level, so they
+# are only imported on first use and importing the computational API stays fast.
+
+import importlib
+
+
+class LazyImport:
+    """
+    Stand-in for a module, or for one attribute of a module, that is imported
+    the first time it is used. Plotting and GIS dependencies are bound this way
+    so that importing the computational API never loads them.
+    """
+
+    def __init__(self, module_name, attribute=None):
+        self._module_name = module_name
+        self._attribute = attribute
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            target = importlib.import_module(self._module_name)
+            if self._attribute is not None:
+                target = getattr(target, self._attribute)
+            self._target = target
+        return self._target
+
+    def __getattr__(self, name):
+        # Only reached for names not set in __init__; never resolve for those
+        if name in ('_module_name', '_attribute', '_target'):
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        name = self._module_name if self._attribute is None else f"{self._module_name}.{self._attribute}"
+        state = 'loaded' if self._target is not None else 'not loaded'
+        return f"<lazy import {name} ({state})>"
+
+
+def lazy_import(module_name, attribute=None):
+    """
+    Return a lazily imported module, e.g. plt = lazy_import('matplotlib.pyplot'),
+    or a lazily imported attribute, e.g. Point = lazy_import('shapely.geometry', 'Point').
+    """
+    return LazyImport(module_name, attribute)
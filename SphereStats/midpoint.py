@@ -1,26 +1,20 @@
 import numpy as np
-import matplotlib.pyplot as plt
+
+from SphereStats.distance_kernels import to_cartesian
+from SphereStats.lazy_imports import lazy_import
+
+plt = lazy_import('matplotlib.pyplot')
+
 
 # Earth's radius in kilometers
 EARTH_RADIUS = 6371
 
-def to_cartesian(lat, lon, radius=EARTH_RADIUS):
-    """
-    Convert latitude and longitude to Cartesian coordinates.
-    """
-    lat_rad = np.radians(lat)
-    lon_rad = np.radians(lon)
-    x = radius * np.cos(lat_rad) * np.cos(lon_rad)
-    y = radius * np.cos(lat_rad) * np.sin(lon_rad)
-    z = radius * np.sin(lat_rad)
-    return np.array([x, y, z])
-
-def midpoint(lat1, lon1, lat2, lon2, radius=EARTH_RADIUS):
+def midpoint(lat1, lon1, lat2, lon2, radius=EARTH_RADIUS, dtype=np.float64):
     """
     Calculate the Cartesian midpoint between two geographic points on a sphere.
     """
-    p1 = to_cartesian(lat1, lon1, radius)
-    p2 = to_cartesian(lat2, lon2, radius)
+    p1 = to_cartesian(lat1, lon1, radius, dtype)
+    p2 = to_cartesian(lat2, lon2, radius, dtype)
     midpoint_cartesian = (p1 + p2) / np.linalg.norm(p1 + p2)  # Normalize to unit vector
     return midpoint_cartesian * radius  # Scale to sphere's radius
 
@@ -1,37 +1,56 @@
 import numpy as np
 import heapq
-import matplotlib.pyplot as plt
-import cartopy.crs as ccrs
-from cartopy.geodesic import Geodesic
 
-EARTH_RADIUS = 6371  # in kilometers
+from SphereStats.contraction_hierarchy import ContractionHierarchy
+from SphereStats.csr_graph import CSRGraph, csr_astar, csr_dijkstra, great_circle_heuristic
+from SphereStats.distance_kernels import haversine
+from SphereStats.distance_matrix import distance_matrix
+from SphereStats.lazy_imports import lazy_import
+
+plt = lazy_import('matplotlib.pyplot')
+ccrs = lazy_import('cartopy.crs')
+Geodesic = lazy_import('cartopy.geodesic', 'Geodesic')
 
-def to_cartesian(lat, lon, radius=EARTH_RADIUS):
-    lat_rad = np.radians(lat)
-    lon_rad = np.radians(lon)
-    x = radius * np.cos(lat_rad) * np.cos(lon_rad)
-    y = radius * np.cos(lat_rad) * np.sin(lon_rad)
-    z = radius * np.sin(lat_rad)
-    return np.array([x, y, z])
+# The KD-tree index pulls in scipy, which alone takes longer to import than the rest
+SphereIndex = lazy_import('SphereStats.spatial_index', 'SphereIndex')
 
-def haversine_distance(p1, p2):
-    R = EARTH_RADIUS
-    dlat = np.radians(p2[0] - p1[0])
-    dlon = np.radians(p2[1] - p1[1])
 
-    a = np.sin(dlat / 2) ** 2 + np.cos(np.radians(p1[0])) * np.cos(np.radians(p2[0])) * np.sin(dlon / 2) ** 2
-    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+EARTH_RADIUS = 6371  # in kilometers
 
-    distance = R * c
-    return distance
+def haversine_distance(p1, p2, dtype=np.float64):
+    return haversine(p1[0], p1[1], p2[0], p2[1], radius=EARTH_RADIUS, dtype=dtype)
 
 def dijkstra(graph, start, goal):
+    """
+    Shortest path from start to goal.
+
+    graph is a CSRGraph or a dict-of-dicts {node: {neighbour: weight}}. On a
+    CSRGraph, nodes may be integer ids or (lat, lon) tuples and the path is
+    returned in the same form as start. For many queries on the same graph,
+    pass the ContractionHierarchy from contraction_hierarchy.contract(graph)
+    instead; it returns the same paths in a fraction of the time.
+
+    Returns:
+    path: List of nodes from start to goal, or None if goal is unreachable
+    distance: Total weight of the path (inf if unreachable)
+    """
+    if isinstance(graph, (CSRGraph, ContractionHierarchy)):
+        if isinstance(graph, ContractionHierarchy):
+            path, distance = graph.query(graph.node_id(start), graph.node_id(goal))
+        else:
+            path, distance = csr_dijkstra(graph, graph.node_id(start), graph.node_id(goal))
+        if path is not None and not isinstance(start, (int, np.integer)):
+            path = [graph.node(node) for node in path]
+        return path, distance
+
     queue = [(0, start)]
     distances = {start: 0}
     previous_nodes = {start: None}
 
     while queue:
         current_distance, current_node = heapq.heappop(queue)
+        if current_distance > distances[current_node]:
+            continue  # Stale entry, the node was reached more cheaply since
 
         if current_node == goal:
             path = []
@@ -51,14 +70,115 @@ def dijkstra(graph, start, goal):
 
     return None, float("inf")
 
-def create_network(cities):
-    graph = {city: {} for city in cities}
-    for i, city1 in enumerate(cities):
-        for j, city2 in enumerate(cities):
-            if i != j:
-                distance = haversine_distance(city1, city2)
-                graph[city1][city2] = distance
-    return graph
+def astar(graph, start, goal, max_speed=None):
+    """
+    Shortest path from start to goal by A* search, using the great-circle
+    distance to the goal as heuristic. Nodes must carry their (lat, lon)
+    coordinates, as on a CSRGraph or a dict-of-dicts keyed by (lat, lon).
+
+    Edge weights are either distances in km, no shorter than the great-circle
+    distance between their endpoints, or travel times, in which case max_speed
+    (km per weight unit, e.g. km/h for weights in hours) must be at least the
+    speed on any edge. The path is then the same as dijkstra's.
+
+    Returns:
+    path: List of nodes from start to goal, or None if goal is unreachable
+    distance: Total weight of the path (inf if unreachable)
+    expanded: Number of nodes expanded by the search
+    """
+    if isinstance(graph, CSRGraph):
+        path, distance, expanded = csr_astar(graph, graph.node_id(start), graph.node_id(goal),
+                                             max_speed=max_speed, radius=EARTH_RADIUS)
+        if path is not None and not isinstance(start, (int, np.integer)):
+            path = [graph.node(node) for node in path]
+        return path, distance, expanded
+
+    estimate = great_circle_heuristic(goal[0], goal[1], EARTH_RADIUS, max_speed)
+    queue = [(estimate(*start), start)]
+    distances = {start: 0}
+    previous_nodes = {start: None}
+    settled = set()
+
+    while queue:
+        _, current_node = heapq.heappop(queue)
+        if current_node in settled:
+            continue
+        settled.add(current_node)
+
+        if current_node == goal:
+            path = [goal]
+            while previous_nodes[path[-1]] is not None:
+                path.append(previous_nodes[path[-1]])
+            path.reverse()
+            return path, distances[goal], len(settled)
+
+        for neighbor, weight in graph[current_node].items():
+            distance = distances[current_node] + weight
+            if neighbor not in distances or distance < distances[neighbor]:
+                distances[neighbor] = distance
+                previous_nodes[neighbor] = current_node
+                heapq.heappush(queue, (distance + estimate(*neighbor), neighbor))
+
+    return None, float("inf"), len(settled)
+
+def create_network(cities, k=None, max_distance=None, directed=False):
+    """
+    Graph between cities [(lat1, lon1), ...] weighted by great-circle
+    distance (km), as a CSRGraph whose node ids follow the order of cities.
+
+    By default every city is connected to every other one, which needs
+    O(n²) edges. For large networks, give k and/or max_distance to keep only
+    the edges to each city's k nearest neighbours and/or to the cities within
+    max_distance km (e.g. an aircraft's range). Neighbours are found with a
+    SphereIndex and the edges go straight into the sparse graph, so this
+    scales to hundreds of thousands of cities.
+
+    Args:
+    cities: [(lat1, lon1), ...] in degrees
+    k: Connect each city to its k nearest neighbours
+    max_distance: Only connect cities at most this far apart (km)
+    directed: With k, keep only the edges from each city to its own nearest
+              neighbours; by default every edge is added in both directions.
+              Edges found by max_distance alone always go both ways.
+
+    Returns:
+    CSRGraph
+    """
+    coords = np.asarray(cities, dtype=np.float64).reshape(-1, 2)
+    n_cities = len(coords)
+
+    if k is None and max_distance is None:
+        distances = distance_matrix(coords)
+        sources, targets = np.nonzero(~np.eye(n_cities, dtype=bool))
+        return CSRGraph.from_edges(coords[:, 0], coords[:, 1], sources, targets, distances[sources, targets])
+
+    index = SphereIndex(coords, radius=EARTH_RADIUS)
+    if k is None:
+        # query_pairs gives each pair once (i < j); the range relation is symmetric
+        pairs, _ = index.query_pairs(max_distance)
+        pairs = np.concatenate([pairs, pairs[:, ::-1]])
+    else:
+        # One extra neighbour, as each city is usually its own nearest
+        k_query = min(k + 1, n_cities)
+        max_range = np.inf if max_distance is None else max_distance
+        _, neighbours = index.query_knn(coords, k=k_query, max_distance=max_range)
+        neighbours = neighbours.reshape(n_cities, k_query)
+        rows = np.repeat(np.arange(n_cities)[:, None], k_query, axis=1)
+        keep = (neighbours != rows) & (neighbours < n_cities)
+        # Cities with duplicates may not find themselves; keep at most k neighbours each
+        keep &= np.cumsum(keep, axis=1) <= k
+        pairs = np.column_stack([rows[keep], neighbours[keep]])
+
+    if not directed:
+        low, high = pairs.min(axis=1), pairs.max(axis=1)
+        keys = np.sort(low * n_cities + high)
+        keys = keys[np.diff(keys, prepend=-1) != 0]
+        pairs = np.column_stack([keys // n_cities, keys % n_cities])
+        pairs = np.concatenate([pairs, pairs[:, ::-1]])
+    sources, targets = pairs[:, 0], pairs[:, 1]
+    weights = haversine(coords[sources, 0], coords[sources, 1], coords[targets, 0], coords[targets, 1],
+                        radius=EARTH_RADIUS)
+    return CSRGraph.from_edges(coords[:, 0], coords[:, 1], sources, targets, weights)
 
 def plot_network(cities, path=None, graph=None):
     latitudes, longitudes = zip(*cities)
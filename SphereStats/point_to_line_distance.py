@@ -1,25 +1,20 @@
 import numpy as np
-import matplotlib.pyplot as plt
+
+from SphereStats.distance_kernels import to_cartesian
+from SphereStats.lazy_imports import lazy_import
+
+plt = lazy_import('matplotlib.pyplot')
+
 
 # Constants for Earth's radius
 EARTH_RADIUS = 6371  # in kilometers
 
-# Convert lat/lon to Cartesian coordinates
-def to_cartesian(lat, lon, radius=EARTH_RADIUS):
-    """Convert latitude and longitude to Cartesian coordinates."""
-    lat_rad = np.radians(lat)
-    lon_rad = np.radians(lon)
-    x = radius * np.cos(lat_rad) * np.cos(lon_rad)
-    y = radius * np.cos(lat_rad) * np.sin(lon_rad)
-    z = radius * np.sin(lat_rad)
-    return np.array([x, y, z])
-
 # Shortest distance from point to line on a sphere
-def point_to_line_distance(lat_p, lon_p, lat1, lon1, lat2, lon2, radius=EARTH_RADIUS):
+def point_to_line_distance(lat_p, lon_p, lat1, lon1, lat2, lon2, radius=EARTH_RADIUS, dtype=np.float64):
     """Calculate the shortest distance from a point to a line on a sphere."""
-    p = to_cartesian(lat_p, lon_p, radius)
-    l1 = to_cartesian(lat1, lon1, radius)
-    l2 = to_cartesian(lat2, lon2, radius)
+    p = to_cartesian(lat_p, lon_p, radius, dtype)
+    l1 = to_cartesian(lat1, lon1, radius, dtype)
+    l2 = to_cartesian(lat2, lon2, radius, dtype)
 
     # Normalize to unit vectors
     p /= np.linalg.norm(p)
@@ -39,7 +34,7 @@ def point_to_line_distance(lat_p, lon_p, lat1, lon1, lat2, lon2, radius=EARTH_RA
     angle = np.arccos(np.clip(cos_angle, -1.0, 1.0))  # Clip for numerical stability
 
     # Convert angular distance to linear distance
-    distance = radius * angle
+    distance = np.dtype(dtype).type(radius * angle)  # Keep the requested precision
     return distance
 
 # Plot the sphere, points, and geodesic line
@@ -91,13 +86,14 @@ def plot_sphere_and_distance(lat_p, lon_p, lat1, lon1, lat2, lon2):
     plt.show()
 
 # Example: New Delhi to London-Singapore geodesic line
-lat_p, lon_p = 28.6139, 77.2090  # New Delhi
-lat1, lon1 = 51.5074, -0.1278    # London
-lat2, lon2 = 1.3521, 103.8198    # Singapore
+if __name__ == "__main__":
+    lat_p, lon_p = 28.6139, 77.2090  # New Delhi
+    lat1, lon1 = 51.5074, -0.1278    # London
+    lat2, lon2 = 1.3521, 103.8198    # Singapore
 
-# Calculate distance and plot
-distance = point_to_line_distance(lat_p, lon_p, lat1, lon1, lat2, lon2)
-plot_sphere_and_distance(lat_p, lon_p, lat1, lon1, lat2, lon2)
+    # Calculate distance and plot
+    distance = point_to_line_distance(lat_p, lon_p, lat1, lon1, lat2, lon2)
+    plot_sphere_and_distance(lat_p, lon_p, lat1, lon1, lat2, lon2)
 
-# Output the calculated distance
-print(f"The shortest distance from the point to the line is: {distance:.2f} km")
+    # Output the calculated distance
+    print(f"The shortest distance from the point to the line is: {distance:.2f} km")
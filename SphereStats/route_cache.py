@@ -0,0 +1,111 @@
+# SphereStats/route_cache.py
+
+from collections import OrderedDict
+
+import numpy as np
+
+from SphereStats.csr_graph import reconstruct_path, shortest_path_tree
+
+
+class RouteCache:
+    """
+    LRU cache of shortest-path queries on a CSRGraph.
+
+    Routes are keyed by (graph version, start, goal). Changing an edge weight
+    through the graph's set_weight/update_weights bumps its version, which
+    drops every cached route and tree on the next query.
+
+    On a miss the search from start is kept as a shortest-path tree. Dijkstra
+    settles nodes in order of distance, so the tree answers every later query
+    from the same start whose goal is no further away than the goal it was
+    searched for, without a new search (counted in tree_hits).
+
+    Args:
+    graph: CSRGraph
+    max_routes: Number of routes kept
+    max_trees: Number of shortest-path trees kept, one per start node
+
+    Attributes:
+    hits: Queries answered from the route cache
+    tree_hits: Route misses answered from a cached shortest-path tree
+    misses: Queries that needed a search
+    evictions: Routes and trees dropped to stay within the size limits
+    """
+
+    def __init__(self, graph, max_routes=4096, max_trees=64):
+        self.graph = graph
+        self.max_routes = max_routes
+        self.max_trees = max_trees
+        self.routes = OrderedDict()
+        self.trees = OrderedDict()
+        self.version = graph.version
+        self.hits = self.tree_hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self.routes)
+
+    def clear(self):
+        """Drop every cached route and tree (the counters are kept)."""
+        self.routes.clear()
+        self.trees.clear()
+
+    @property
+    def stats(self):
+        return {'hits': self.hits, 'tree_hits': self.tree_hits, 'misses': self.misses,
+                'evictions': self.evictions, 'routes': len(self.routes), 'trees': len(self.trees)}
+
+    def route(self, start, goal):
+        """
+        Shortest path from start to goal, with the same contract as
+        network_routing.dijkstra: nodes are ids or (lat, lon) tuples and the
+        path is returned in the same form as start.
+
+        Returns:
+        path: List of nodes from start to goal, or None if goal is unreachable
+        distance: Total weight of the path (inf if unreachable)
+        """
+        graph = self.graph
+        path, distance = self.query(graph.node_id(start), graph.node_id(goal))
+        if path is not None and not isinstance(start, (int, np.integer)):
+            return [graph.node(node) for node in path], distance
+        return path, distance
+
+    def query(self, start, goal):
+        """Shortest path between two node ids as (list of ids or None, distance)."""
+        if self.version != self.graph.version:
+            self.clear()
+            self.version = self.graph.version
+
+        key = (self.version, start, goal)
+        cached = self.routes.get(key)
+        if cached is not None:
+            self.routes.move_to_end(key)
+            self.hits += 1
+            path, distance = cached
+            return (None if path is None else list(path)), distance
+
+        tree = self.trees.get(start)
+        if tree is not None and tree[0][goal] <= tree[2]:
+            self.trees.move_to_end(start)
+            self.tree_hits += 1
+            distances, predecessors, _ = tree
+        else:
+            self.misses += 1
+            distances, predecessors = shortest_path_tree(self.graph, start, targets=[goal])
+            # Every node up to the goal's distance is settled; an unreachable
+            # goal means the whole component was searched
+            reach = distances[goal] if np.isfinite(distances[goal]) else np.inf
+            if tree is None or reach >= tree[2]:
+                self.store(self.trees, start, (distances, predecessors, reach), self.max_trees)
+
+        path = reconstruct_path(predecessors, start, goal)
+        distance = float(distances[goal])
+        self.store(self.routes, key, (None if path is None else tuple(path), distance), self.max_routes)
+        return path, distance
+
+    def store(self, entries, key, value, max_size):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > max_size:
+            entries.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,405 @@
+# SphereStats/segment_distance.py
+
+import pickle
+from collections import namedtuple
+
+import numpy as np
+
+from SphereStats.distance_kernels import EARTH_RADIUS, unit_vectors
+from SphereStats.distance_matrix import DEFAULT_MAX_BYTES, block_shape, iter_blocks
+
+# Great-circle segments as unit vectors, with everything that only depends on
+# the segment precomputed:
+#   normals:      unit normal of the segment's great-circle plane (start x end)
+#   start_planes: normal x start, points from the start towards the end
+#   end_planes:   end x normal, points from the end back towards the start
+# A point p projects inside the segment iff p·start_planes > 0 and
+# p·end_planes > 0. Degenerate segments (coincident or antipodal endpoints)
+# get all-zero normals and planes, so only their endpoints are ever used.
+Edges = namedtuple('Edges', ['starts', 'ends', 'normals', 'start_planes', 'end_planes'])
+
+# Number of (points x edges) float64 temporaries alive while a tile is processed
+TILE_ARRAYS = 8
+
+
+def prepare_edges(starts, ends, dtype=np.float64):
+    """
+    Precompute great-circle segments from their endpoints.
+
+    Args:
+    starts: Segment start points [[lat1, lon1], ...] in degrees
+    ends: Segment end points in the same format
+    """
+    starts = unit_vectors(starts, dtype)
+    ends = unit_vectors(ends, dtype)
+    normals = np.cross(starts, ends)
+    norms = np.linalg.norm(normals, axis=1, keepdims=True)
+    degenerate = norms < 1e-15
+    normals = np.divide(normals, norms, out=np.zeros_like(normals), where=~degenerate)
+    return Edges(starts, ends, normals, np.cross(normals, starts), np.cross(ends, normals))
+
+
+def polygon_edges(polygon_coords, dtype=np.float64):
+    """
+    Precompute the edges of a closed polygon ring [[lat1, lon1], [lat2, lon2], ...].
+    Edge i joins vertex i to vertex i + 1 (the last vertex joins the first).
+    An explicitly closed ring (first vertex repeated at the end) is accepted too.
+    """
+    starts, ends = ring_segments(polygon_coords)
+    return prepare_edges(starts, ends, dtype)
+
+
+def ring_segments(ring):
+    """
+    Split a closed ring [[lat1, lon1], ...] into (starts, ends) arrays of its
+    edges. An explicit closing vertex is dropped.
+    """
+    vertices = np.asarray(ring, dtype=np.float64).reshape(-1, 2)
+    if len(vertices) > 1 and np.array_equal(vertices[0], vertices[-1]):
+        vertices = vertices[:-1]
+    return vertices, np.roll(vertices, -1, axis=0)
+
+
+def slice_edges(edges, selection):
+    """Return the subset of edges picked by a slice, mask or index array."""
+    return Edges(*(values[selection] for values in edges))
+
+
+def chord_angle(cosines):
+    """
+    Angle from its cosine via the chord, 2·asin(√(2 - 2cos) / 2). This is no
+    more accurate than arccos for small angles: the rounding error of the
+    cosine limits the result to about 1.5e-8 rad (0.1 m on Earth) absolute,
+    so angles below that are not resolved. Use it for bounds and endpoint
+    distances, not where sub-metre accuracy at tiny separations matters.
+    """
+    chord = np.sqrt(np.clip(2.0 - 2.0 * cosines, 0.0, 4.0))
+    return 2.0 * np.arcsin(np.minimum(chord / 2.0, 1.0))
+
+
+def segment_angles(points, edges):
+    """
+    Central angles (radians) between each unit vector in points (P, 3) and each
+    bounded segment in edges, as a (P, E) array. Points that project inside a
+    segment use the cross-track angle, all others the nearer endpoint.
+    """
+    cross_track = np.abs(points @ edges.normals.T)
+    np.clip(cross_track, 0.0, 1.0, out=cross_track)
+    np.arcsin(cross_track, out=cross_track)
+
+    inside = points @ edges.start_planes.T > 0
+    inside &= points @ edges.end_planes.T > 0
+
+    nearest_end = np.maximum(points @ edges.starts.T, points @ edges.ends.T)
+    return np.where(inside, cross_track, chord_angle(nearest_end))
+
+
+def segment_distances(points, edges, radius=EARTH_RADIUS, max_bytes=DEFAULT_MAX_BYTES, dtype=np.float64):
+    """
+    Distance from every point to the nearest of a set of great-circle segments.
+
+    The (points x edges) problem is processed in tiles that fit in max_bytes,
+    keeping a running minimum per point.
+
+    Args:
+    points: Query points [[lat1, lon1], ...] in degrees, or an (N, 3) array of unit vectors
+    edges: Edges from prepare_edges or polygon_edges
+    radius: Sphere radius, distances are returned in the same unit
+
+    Returns:
+    distances: Great-circle distance from each point to its nearest segment
+    indices: Index of that segment in edges
+    """
+    points = np.asarray(points)
+    if points.ndim != 2 or points.shape[1] != 3:
+        points = unit_vectors(points, dtype)
+    n_points, n_edges = len(points), len(edges.starts)
+
+    best = np.full(n_points, np.inf)
+    best_edge = np.zeros(n_points, dtype=np.intp)
+    if n_edges == 0:
+        return best, best_edge
+
+    itemsize = np.dtype(dtype).itemsize
+    rows, cols = block_shape(n_points, n_edges, itemsize * TILE_ARRAYS // 2, max_bytes)
+    for row_slice, col_slice in iter_blocks(n_points, n_edges, rows, cols):
+        angles = segment_angles(points[row_slice], slice_edges(edges, col_slice))
+        nearest = angles.argmin(axis=1)
+        nearest_angle = angles[np.arange(len(nearest)), nearest]
+
+        tile_best, tile_edge = best[row_slice], best_edge[row_slice]
+        better = nearest_angle < tile_best
+        tile_best[better] = nearest_angle[better]
+        tile_edge[better] = nearest[better] + col_slice.start
+
+    return best * radius, best_edge
+
+
+# Result of SegmentIndex.nearest, one entry per query point:
+#   segment:     index of the nearest segment
+#   distance:    great-circle distance to the closest point of that segment
+#   fraction:    position of that closest point along the segment (0 = start, 1 = end)
+#   cross_track: signed distance to the segment's great circle (positive to the
+#                left of the start -> end direction)
+SegmentMatch = namedtuple('SegmentMatch', ['segment', 'distance', 'fraction', 'cross_track'])
+
+
+def project_onto_segments(points, edges, lengths):
+    """
+    Row-wise projection of points (M, 3) onto the matching segments of edges
+    (M entries each). Returns (angle, fraction, cross_track_angle) in radians.
+    """
+    along_x = np.einsum('ij,ij->i', points, edges.starts)
+    along_y = np.einsum('ij,ij->i', points, edges.start_planes)
+    to_end = np.einsum('ij,ij->i', points, edges.ends)
+    cross_track = np.arcsin(np.clip(np.einsum('ij,ij->i', points, edges.normals), -1.0, 1.0))
+
+    inside = (along_y > 0) & (np.einsum('ij,ij->i', points, edges.end_planes) > 0)
+    endpoint_fraction = np.where(along_x >= to_end, 0.0, 1.0)
+    along = np.arctan2(along_y, along_x)
+    fraction = np.where(inside, along / np.where(lengths > 0, lengths, 1.0), endpoint_fraction)
+
+    angle = np.where(inside, np.abs(cross_track), chord_angle(np.maximum(along_x, to_end)))
+    return angle, np.clip(fraction, 0.0, 1.0), cross_track
+
+
+def gathered_dots(a, rows, b, columns):
+    """
+    Dot products between a[:, rows] and b[:, columns] for coordinate-major
+    (3, N) arrays. Gathering three 1-D arrays is much faster than gathering
+    rows of an (N, 3) array.
+    """
+    dots = a[0][rows] * b[0][columns]
+    dots += a[1][rows] * b[1][columns]
+    dots += a[2][rows] * b[2][columns]
+    return dots
+
+
+def spatial_order(vectors, leafsize):
+    """
+    Order vectors (N, 3) for an implicit binary tree with leafsize vectors per
+    leaf: leaf i holds positions [i * leafsize, (i + 1) * leafsize) and node i
+    of a level has children 2i and 2i + 1. Every node is split across the axis
+    of its largest extent, so nearby vectors share leaves.
+    """
+    order = np.arange(len(vectors))
+    capacity = leafsize
+    while capacity < len(vectors):
+        capacity *= 2
+
+    # (start, stop, capacity of each child) of the nodes still to split
+    stack = [(0, len(vectors), capacity // 2)]
+    while stack:
+        start, stop, child = stack.pop()
+        if child < leafsize:
+            continue
+        if stop - start > child:
+            members = vectors[order[start:stop]]
+            axis = np.argmax(members.max(axis=0) - members.min(axis=0))
+            split = np.argpartition(members[:, axis], child)
+            order[start:stop] = order[start:stop][split]
+            stack.append((start + child, stop, child // 2))
+        stack.append((start, min(stop, start + child), child // 2))
+    return order
+
+
+def enclosing_caps(centres, radii, group_starts):
+    """
+    Bounding caps of groups of caps. Group g holds the caps from
+    group_starts[g] up to the next start; the caps must be ordered by group.
+    """
+    sums = np.add.reduceat(centres, group_starts, axis=0)
+    norms = np.linalg.norm(sums, axis=1, keepdims=True)
+    # Members that cancel out have no meaningful centre; such a cap covers the sphere
+    degenerate = norms[:, 0] < 1e-12
+    group_centres = np.divide(sums, norms, out=centres[group_starts].copy(), where=~degenerate[:, None])
+
+    groups = np.repeat(np.arange(len(group_starts)), np.diff(np.append(group_starts, len(centres))))
+    reach = chord_angle(np.einsum('ij,ij->i', centres, group_centres[groups])) + radii
+    group_radii = np.maximum.reduceat(reach, group_starts)
+    group_radii[degenerate] = np.pi
+    return group_centres, np.minimum(group_radii + 1e-12, np.pi)
+
+
+class SegmentIndex:
+    """
+    Nearest-segment engine for many points against many great-circle segments.
+
+    Segments are cut into pieces no longer than max_piece and every piece is
+    enclosed in a bounding spherical cap centred on its midpoint, with half
+    the piece's angular length as radius. The caps are grouped into a binary
+    tree, splitting every node across its widest axis, with leafsize caps per
+    leaf and every node a cap enclosing its children.
+
+    Queries descend the tree level by level for a whole batch of points at
+    once. The distance to anything inside a cap is at least the distance to
+    its centre minus its radius and the distance to the nearest segment is at
+    most the distance to the centre plus the radius, so every subtree whose
+    lower bound exceeds the best upper bound is dropped. Each point ends up
+    evaluating exact distances for only the few segments around it.
+
+    Args:
+    starts: Segment start points [[lat1, lon1], ...] in degrees
+    ends: Segment end points in the same format
+    radius: Sphere radius, distances are returned in the same unit
+    max_piece: Longest piece covered by a single cap, in the unit of radius
+               (defaults to the median segment length)
+    leafsize: Caps per leaf of the tree
+    """
+
+    def __init__(self, starts, ends, radius=EARTH_RADIUS, max_piece=None, leafsize=8):
+        self.edges = prepare_edges(starts, ends)
+        self.radius = radius
+        self.leafsize = leafsize
+
+        cosines = np.einsum('ij,ij->i', self.edges.starts, self.edges.ends)
+        self.lengths = np.arctan2(np.linalg.norm(np.cross(self.edges.starts, self.edges.ends), axis=1), cosines)
+
+        if max_piece is None:
+            piece = np.median(self.lengths) if len(self.lengths) else 0.0
+        else:
+            piece = max_piece / radius
+        piece = max(piece, 1e-9)
+
+        # Caps of (nearly) antipodal segments cover the whole sphere; their
+        # great circle is undefined, so they are never cut
+        antipodal = np.linalg.norm(self.edges.starts + self.edges.ends, axis=1) < 1e-12
+        counts = np.where(antipodal, 1, np.maximum(np.ceil(self.lengths / piece), 1)).astype(np.intp)
+        cap_segments = np.repeat(np.arange(len(counts)), counts)
+        first_piece = np.cumsum(counts) - counts
+        piece_number = np.arange(len(cap_segments)) - first_piece[cap_segments]
+
+        # Midpoint of each piece, walking from the start along the tangent start_planes
+        along = (piece_number + 0.5) / counts[cap_segments] * self.lengths[cap_segments]
+        cap_centres = (np.cos(along)[:, None] * self.edges.starts[cap_segments]
+                       + np.sin(along)[:, None] * self.edges.start_planes[cap_segments])
+        cap_radii = np.where(antipodal, np.pi, self.lengths / (2 * counts))[cap_segments] + 1e-12
+
+        order = spatial_order(cap_centres, leafsize)
+        cap_centres = cap_centres[order]
+        self.cap_segments = cap_segments[order]
+        self.cap_radii = cap_radii[order]
+
+        # Tree levels from the leaves up, stored root first. Centres are kept
+        # coordinate-major, shape (3, nodes), for gathered_dots.
+        self.levels = []
+        centres, radii, size = cap_centres, self.cap_radii, leafsize
+        while len(centres):
+            centres, radii = enclosing_caps(centres, radii, np.arange(0, len(centres), size))
+            self.levels.insert(0, (np.ascontiguousarray(centres.T), radii))
+            if len(centres) == 1:
+                break
+            size = 2
+        self.cap_centres = np.ascontiguousarray(cap_centres.T)
+
+    @classmethod
+    def from_polygon(cls, polygon_coords, radius=EARTH_RADIUS, **kwargs):
+        """
+        Index the edges of a polygon. polygon_coords is one closed ring
+        [[lat1, lon1], ...] or a list of rings (e.g. islands and holes); edges
+        are numbered ring after ring, edge i of a ring joining its vertex i to
+        vertex i + 1.
+        """
+        rings = [polygon_coords] if np.ndim(polygon_coords[0]) == 1 else polygon_coords
+        segments = [ring_segments(ring) for ring in rings]
+        starts = np.concatenate([start for start, _ in segments]) if segments else np.empty((0, 2))
+        ends = np.concatenate([end for _, end in segments]) if segments else np.empty((0, 2))
+        return cls(starts, ends, radius=radius, **kwargs)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def _leaf_caps(self, nodes):
+        # Caps held by each leaf node (short leaves repeat their last cap)
+        caps = self.leafsize * nodes[:, None] + np.arange(self.leafsize)
+        return np.minimum(caps, len(self.cap_radii) - 1).ravel()
+
+    def _probe(self, points):
+        # Follow the child with the smaller lower bound down to one leaf per point.
+        # Cap centres lie on their segments, so the nearest centre in that leaf
+        # is an upper bound on the distance that is usually already tight.
+        rows = np.arange(points.shape[1])
+        nodes = np.zeros(len(rows), dtype=np.intp)
+        for centres, radii in self.levels[1:]:
+            children = np.minimum(2 * nodes[:, None] + np.arange(2), len(radii) - 1)
+            lower = chord_angle(gathered_dots(points, rows[:, None], centres, children)) - radii[children]
+            nodes = children[rows, lower.argmin(axis=1)]
+        caps = self._leaf_caps(nodes).reshape(len(rows), -1)
+        return chord_angle(gathered_dots(points, rows[:, None], self.cap_centres, caps)).min(axis=1) + 1e-12
+
+    def _descend(self, points):
+        # Branch and bound through the levels for one batch of coordinate-major
+        # unit vectors (3, N). Returns the nearest segment and its angle per point.
+        bound = self._probe(points)
+        rows = np.arange(points.shape[1])
+        nodes = np.zeros(len(rows), dtype=np.intp)
+
+        for depth, (centres, radii) in enumerate(self.levels):
+            if depth:
+                rows = np.repeat(rows, 2)
+                nodes = (2 * nodes[:, None] + np.arange(2)).ravel()
+                valid = nodes < len(radii)
+                rows, nodes = rows[valid], nodes[valid]
+            angle = chord_angle(gathered_dots(points, rows, centres, nodes))
+            node_radii = radii[nodes]
+            # Every cap holds a point of a segment, so angle + radius bounds the distance from above
+            np.minimum.at(bound, rows, angle + node_radii)
+            keep = angle - node_radii <= bound[rows]
+            rows, nodes = rows[keep], nodes[keep]
+
+        # Leaves to caps; cap centres lie on their segments and tighten the bound further
+        rows = np.repeat(rows, self.leafsize)
+        caps = self._leaf_caps(nodes)
+        angle = chord_angle(gathered_dots(points, rows, self.cap_centres, caps))
+        np.minimum.at(bound, rows, angle + 1e-12)
+        keep = angle - self.cap_radii[caps] <= bound[rows]
+        rows, segments = rows[keep], self.cap_segments[caps[keep]]
+
+        points = points.T
+        angles, _, _ = project_onto_segments(points[rows], slice_edges(self.edges, segments), self.lengths[segments])
+        best = np.full(len(points), np.inf)
+        np.minimum.at(best, rows, angles)
+        best_segment = np.empty(len(points), dtype=np.intp)
+        winners = angles <= best[rows]
+        best_segment[rows[winners]] = segments[winners]
+        return best_segment, best
+
+    def nearest(self, points, batch_size=4096):
+        """
+        Find the nearest segment of each point.
+
+        Args:
+        points: Query points [[lat1, lon1], ...] in degrees, or an (N, 3) array of unit vectors
+        batch_size: Points descending the tree together; bounds the temporary memory
+
+        Returns:
+        SegmentMatch of arrays, one entry per point
+        """
+        points = np.asarray(points)
+        if points.ndim != 2 or points.shape[1] != 3:
+            points = unit_vectors(points)
+        if len(self) == 0:
+            raise ValueError("SegmentIndex has no segments")
+
+        best_segment = np.empty(len(points), dtype=np.intp)
+        for start in range(0, len(points), batch_size):
+            batch = slice(start, start + batch_size)
+            best_segment[batch], _ = self._descend(np.ascontiguousarray(points[batch].T))
+
+        angle, fraction, cross_track = project_onto_segments(points, slice_edges(self.edges, best_segment),
+                                                             self.lengths[best_segment])
+        return SegmentMatch(best_segment, angle * self.radius, fraction, cross_track * self.radius)
+
+    def save(self, path):
+        """Write the built index, including the tree, to `path`."""
+        with open(path, 'wb') as handle:
+            pickle.dump(self, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by save() without rebuilding it."""
+        with open(path, 'rb') as handle:
+            index = pickle.load(handle)
+        if not isinstance(index, cls):
+            raise TypeError(f"{path} does not contain a {cls.__name__}")
+        return index
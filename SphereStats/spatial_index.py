@@ -0,0 +1,128 @@
+# SphereStats/spatial_index.py
+
+import pickle
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from SphereStats.distance_kernels import (
+    EARTH_RADIUS,
+    chord_to_distance,
+    distance_to_chord,
+    unit_vectors,
+)
+
+
+class SphereIndex:
+    """
+    Nearest-neighbour index for points on a sphere.
+
+    Points are stored as 3D unit vectors in a KD-tree. Euclidean (chord)
+    distance between unit vectors is monotonic in great-circle distance, so
+    the tree answers great-circle k-NN and radius queries exactly; chords are
+    converted to great-circle distances with 2·R·arcsin(chord / 2).
+
+    Args:
+    points: Indexed points [[lat1, lon1], [lat2, lon2], ...] in degrees
+    radius: Sphere radius, distances are returned in the same unit
+    leafsize: KD-tree leaf size
+    """
+
+    def __init__(self, points, radius=EARTH_RADIUS, leafsize=16):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.radius = radius
+        self.tree = cKDTree(unit_vectors(self.points), leafsize=leafsize)
+
+    def __len__(self):
+        return len(self.points)
+
+    def query_knn(self, points, k=1, max_distance=np.inf, workers=1):
+        """
+        Find the k nearest indexed points of each query point.
+
+        Args:
+        points: One (lat, lon) pair or an (M, 2) array of query points
+        k: Number of neighbours
+        max_distance: Ignore neighbours further away than this
+        workers: Parallel query threads (-1 uses every CPU)
+
+        Returns:
+        distances: Great-circle distances, shape (M, k), or (M,) when k == 1.
+                   Missing neighbours have distance inf.
+        indices: Indices into the indexed points; missing neighbours get len(self)
+        """
+        single = np.ndim(points) == 1
+        upper_bound = distance_to_chord(max_distance, self.radius) if np.isfinite(max_distance) else np.inf
+        chords, indices = self.tree.query(unit_vectors(points), k=k, distance_upper_bound=upper_bound,
+                                          workers=workers)
+        found = np.isfinite(chords)
+        distances = np.full(chords.shape, np.inf)
+        distances[found] = chord_to_distance(chords[found], self.radius)
+        if single:
+            return distances[0], indices[0]
+        return distances, indices
+
+    def query_radius(self, points, r, return_distances=False, sort=False, workers=1):
+        """
+        Find all indexed points within great-circle distance r of each query point.
+
+        Args:
+        points: One (lat, lon) pair or an (M, 2) array of query points
+        r: Search radius, in the unit of self.radius
+        return_distances: Also return the great-circle distance of every match
+        sort: Order the matches of each query by increasing distance
+        workers: Parallel query threads (-1 uses every CPU)
+
+        Returns:
+        indices: Array of indices (single query) or a list of arrays, one per query
+        distances: Matching distances, only when return_distances is True
+        """
+        single = np.ndim(points) == 1
+        queries = unit_vectors(points)
+        # Pad the chord by a few ulps so points exactly at distance r are included
+        chord = distance_to_chord(r, self.radius) * (1 + 1e-12)
+        matches = self.tree.query_ball_point(queries, chord, workers=workers)
+
+        indices, distances = [], []
+        for query, match in zip(queries, matches):
+            match = np.asarray(match, dtype=np.intp)
+            if return_distances or sort:
+                chords = np.linalg.norm(self.tree.data[match] - query, axis=1)
+                if sort:
+                    order = np.argsort(chords, kind='stable')
+                    match, chords = match[order], chords[order]
+                distances.append(chord_to_distance(chords, self.radius))
+            indices.append(match)
+
+        if single:
+            indices, distances = indices[0], (distances[0] if distances else None)
+        if return_distances:
+            return indices, distances
+        return indices
+
+    def query_pairs(self, r):
+        """
+        Find every pair of indexed points within great-circle distance r of each other.
+
+        Returns:
+        pairs: (P, 2) array of index pairs (i, j) with i < j
+        distances: Great-circle distance of every pair
+        """
+        chord = distance_to_chord(r, self.radius) * (1 + 1e-12)
+        pairs = self.tree.query_pairs(chord, output_type='ndarray').reshape(-1, 2)
+        chords = np.linalg.norm(self.tree.data[pairs[:, 0]] - self.tree.data[pairs[:, 1]], axis=1)
+        return pairs, chord_to_distance(chords, self.radius)
+
+    def save(self, path):
+        """Write the built index, including the KD-tree, to `path`."""
+        with open(path, 'wb') as handle:
+            pickle.dump(self, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by save() without rebuilding the tree."""
+        with open(path, 'rb') as handle:
+            index = pickle.load(handle)
+        if not isinstance(index, cls):
+            raise TypeError(f"{path} does not contain a {cls.__name__}")
+        return index
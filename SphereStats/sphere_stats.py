@@ -1,21 +1,15 @@
 import numpy as np
-import matplotlib.pyplot as plt
-
-def to_cartesian(lat, lon, radius=1):
-    """Convert latitude and longitude to Cartesian coordinates."""
-    lat, lon = np.radians(lat), np.radians(lon)
-    return np.array([
-        radius * np.cos(lat) * np.cos(lon),  # x
-        radius * np.cos(lat) * np.sin(lon),  # y
-        radius * np.sin(lat)                 # z
-    ])
-
-def haversine(lat1, lon1, lat2, lon2, radius=6371):
-    """Calculate the great-circle distance using the Haversine formula."""
-    lat1, lon1, lat2, lon2 = np.radians([lat1, lon1, lat2, lon2])
-    dlat, dlon = lat2 - lat1, lon2 - lon1
-    a = np.sin(dlat / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2)**2
-    return radius * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+from SphereStats import distance_kernels
+from SphereStats.distance_kernels import haversine
+from SphereStats.lazy_imports import lazy_import
+
+plt = lazy_import('matplotlib.pyplot')
+
+
+def to_cartesian(lat, lon, radius=1, dtype=np.float64):
+    """Convert latitude and longitude to Cartesian coordinates (unit sphere by default)."""
+    return distance_kernels.to_cartesian(lat, lon, radius, dtype)
 
 def plot_great_circle_with_stats(lat1, lon1, lat2, lon2):
     """Plot a great-circle path between two points on a sphere and display the distance."""
@@ -1,72 +1,61 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import numpy as np
-
 
-def haversine(lat1, lon1, lat2, lon2):
-    """Calculate the great-circle distance between two points on the Earth's surface."""
-    # Convert degrees to radians
-    lat1, lon1, lat2, lon2 = map(np.radians, [lat1, lon1, lat2, lon2])
+from SphereStats.distance_kernels import haversine, to_cartesian
+from SphereStats.distance_matrix import DEFAULT_MAX_BYTES
+from SphereStats.segment_distance import Edges, SegmentIndex, polygon_edges, segment_distances
+from SphereStats.lazy_imports import lazy_import
 
-    # Haversine formula
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
-    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
-    radius = 6371  # Earth's radius in kilometers
-    distance = radius * c
-    return distance
+plt = lazy_import('matplotlib.pyplot')
 
 
 # Constants for Earth's radius
 EARTH_RADIUS = 6371  # in kilometers
 
 
-# Convert lat/lon to Cartesian coordinates
-def to_cartesian(lat, lon, radius=EARTH_RADIUS):
-    """Convert latitude and longitude to Cartesian coordinates."""
-    lat_rad = np.radians(lat)
-    lon_rad = np.radians(lon)
-    x = radius * np.cos(lat_rad) * np.cos(lon_rad)
-    y = radius * np.cos(lat_rad) * np.sin(lon_rad)
-    z = radius * np.sin(lat_rad)
-    return np.array([x, y, z])
+# Calculate the shortest distance from many points to the boundary of a polygon on a sphere
+def points_to_polygon_distance(points, polygon_coords, radius=EARTH_RADIUS, max_bytes=DEFAULT_MAX_BYTES,
+                               dtype=np.float64):
+    """
+    Calculate the shortest distance from each point to the boundary of a polygon on a sphere.
+
+    Edges are bounded great-circle segments; their normals are computed once
+    and all point/edge pairs are evaluated in vectorized chunks of max_bytes.
+    For polygons with many thousands of vertices pass a SegmentIndex instead
+    (SegmentIndex.from_polygon, or boundary_index.load_boundary_index for a
+    shapefile); each point then only visits the edges near it. max_bytes and
+    dtype do not apply to a SegmentIndex, which computes in float64 and
+    bounds its memory by query batch (SegmentIndex.nearest's batch_size).
+
+    Args:
+    points: Query points [[lat1, lon1], [lat2, lon2], ...] in degrees
+    polygon_coords: Polygon vertices [[lat1, lon1], ...], Edges from polygon_edges() or a SegmentIndex
+    radius: Sphere radius, distances are returned in the same unit
+
+    Returns:
+    distances: Distance from each point to the nearest edge
+    edge_indices: Index of that edge (edge i joins vertex i to vertex i + 1)
+    """
+    if isinstance(polygon_coords, SegmentIndex):
+        match = polygon_coords.nearest(points)
+        return match.distance * (radius / polygon_coords.radius), match.segment
+    edges = polygon_coords if isinstance(polygon_coords, Edges) else polygon_edges(polygon_coords, dtype)
+    return segment_distances(points, edges, radius=radius, max_bytes=max_bytes, dtype=dtype)
 
 
 # Calculate the shortest distance from a point to the nearest boundary of a polygon on a sphere
-def point_to_polygon_distance(lat_p, lon_p, polygon_coords, radius=EARTH_RADIUS):
+def point_to_polygon_distance(lat_p, lon_p, polygon_coords, radius=EARTH_RADIUS, dtype=np.float64):
     """Calculate the shortest distance from a point to the nearest boundary of a polygon on a sphere."""
-    # Convert the point to Cartesian coordinates
-    p = to_cartesian(lat_p, lon_p, radius)
-
-    # Initialize the minimum distance as a large value
-    min_distance = float('inf')
-
-    # Iterate over each edge of the polygon (pairs of consecutive points)
-    for i in range(len(polygon_coords)):
-        lat1, lon1 = polygon_coords[i]
-        lat2, lon2 = polygon_coords[(i + 1) % len(polygon_coords)]  # Wrap around to the first point
-
-        # Convert polygon points to Cartesian coordinates
-        p1 = to_cartesian(lat1, lon1, radius)
-        p2 = to_cartesian(lat2, lon2, radius)
-
-        # Compute the shortest distance from the point to the edge (line segment)
-        dist = point_to_line_distance(lat_p, lon_p, lat1, lon1, lat2, lon2, radius)
-
-        # Update the minimum distance
-        min_distance = min(min_distance, dist)
-
-    return np.float64(min_distance)
+    distances, _ = points_to_polygon_distance([[lat_p, lon_p]], polygon_coords, radius, dtype=dtype)
+    return np.dtype(dtype).type(distances[0])
 
 
 # Compute the shortest distance from a point to a line (great-circle segment)
-def point_to_line_distance(lat_p, lon_p, lat1, lon1, lat2, lon2, radius=EARTH_RADIUS):
+def point_to_line_distance(lat_p, lon_p, lat1, lon1, lat2, lon2, radius=EARTH_RADIUS, dtype=np.float64):
     """Compute the shortest distance from a point to a line segment on the sphere."""
     # Convert points to Cartesian coordinates
-    p = to_cartesian(lat_p, lon_p, radius)
-    l1 = to_cartesian(lat1, lon1, radius)
-    l2 = to_cartesian(lat2, lon2, radius)
+    p = to_cartesian(lat_p, lon_p, radius, dtype)
+    l1 = to_cartesian(lat1, lon1, radius, dtype)
+    l2 = to_cartesian(lat2, lon2, radius, dtype)
 
     # Normalize to unit vectors
     p /= np.linalg.norm(p)
@@ -86,7 +75,7 @@ def point_to_line_distance(lat_p, lon_p, lat1, lon1, lat2, lon2, radius=EARTH_RA
     angle = np.arccos(np.clip(cos_angle, -1.0, 1.0))  # Clip for numerical stability
 
     # Convert angular distance to linear distance
-    distance = np.float64(radius * angle)  # Use np.float64 for the distance
+    distance = np.dtype(dtype).type(radius * angle)  # Keep the requested precision
     return distance
 
 
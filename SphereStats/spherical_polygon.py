@@ -0,0 +1,165 @@
+# SphereStats/spherical_polygon.py
+
+import numpy as np
+
+from SphereStats.distance_kernels import unit_vectors
+from SphereStats.distance_matrix import DEFAULT_MAX_BYTES, block_shape, iter_blocks
+from SphereStats.segment_distance import ring_segments
+
+# Offset (radians) of each ring's reference point from the middle of its longest edge
+REFERENCE_OFFSET = 1e-9
+
+
+def ring_vertices(ring):
+    """Unit vectors (N, 3) of a ring's vertices, without the closing vertex or repeated vertices."""
+    vertices = unit_vectors(ring_segments(ring)[0])
+    repeated = np.all(vertices == np.roll(vertices, -1, axis=0), axis=1)
+    return vertices[~repeated] if len(vertices) > 1 else vertices
+
+
+def left_area(vertices):
+    """
+    Area (steradians) of the region to the left of a ring traversed in vertex
+    order, from the Gauss-Bonnet theorem: 2π minus the sum of the turning angles.
+    """
+    normals = np.cross(vertices, np.roll(vertices, -1, axis=0))
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+    following = np.roll(normals, -1, axis=0)
+    corners = np.roll(vertices, -1, axis=0)
+    turns = np.arctan2(np.einsum('ij,ij->i', np.cross(normals, following), corners),
+                       np.einsum('ij,ij->i', normals, following))
+    return (2 * np.pi - turns.sum()) % (4 * np.pi)
+
+
+def crossing_planes(vertices):
+    """
+    Precompute the crossing test of one ring.
+
+    A reference point q is placed just left of the ring's longest edge. The
+    arc from q to a point p crosses edge AB exactly when the orientations
+    (A, B, p), (q, p, A) and (p, q, B) all agree with (B, A, q). Each of them
+    is the dot product of p with a vector that only depends on the edge and q,
+    so the three vectors are stored per edge, flipped so that "crosses" reads
+    as "all three dot products are positive".
+
+    Returns:
+    planes: (3, E, 3) array of the per-edge vectors
+    reference_inside: Whether q lies inside the ring
+    """
+    starts, ends = vertices, np.roll(vertices, -1, axis=0)
+    normals = np.cross(starts, ends)
+    lengths = np.linalg.norm(normals, axis=1)
+
+    longest = np.argmax(lengths)
+    middle = starts[longest] + ends[longest]
+    middle /= np.linalg.norm(middle)
+    reference = middle + REFERENCE_OFFSET * normals[longest] / lengths[longest]
+    reference /= np.linalg.norm(reference)
+
+    signs = np.where(normals @ reference < 0, 1.0, -1.0)[:, None]
+    planes = np.stack([normals * signs,
+                       np.cross(starts, reference) * signs,
+                       np.cross(reference, ends) * signs])
+
+    # The reference point is left of its edge; the inside is the smaller region
+    reference_inside = left_area(vertices) <= 2 * np.pi
+    return planes, reference_inside
+
+
+class SphericalPolygon:
+    """
+    Polygon on the sphere prepared for fast point-in-polygon tests.
+
+    Edges are great-circle arcs between consecutive vertices, so rings may
+    cross the antimeridian, and the inside of every ring is the smaller of the
+    two regions it bounds, so a ring may enclose a pole. Vertex order
+    (clockwise or counter-clockwise) does not matter. A point is inside the
+    polygon when it is inside an odd number of rings, which covers holes and
+    multi-part polygons.
+
+    Args:
+    rings: One ring [[lat1, lon1], [lat2, lon2], ...] in degrees, or a list of rings
+    """
+
+    def __init__(self, rings):
+        rings = [rings] if np.ndim(rings[0]) == 1 else rings
+        planes, self.reference_inside = [np.empty((3, 0, 3))], False
+        all_vertices = [np.empty((0, 3))]
+        for ring in rings:
+            vertices = ring_vertices(ring)
+            if len(vertices) < 3:
+                continue  # Encloses no area
+            ring_planes, reference_inside = crossing_planes(vertices)
+            planes.append(ring_planes)
+            all_vertices.append(vertices)
+            self.reference_inside ^= reference_inside
+
+        # A cap narrower than a hemisphere around every vertex also holds every
+        # edge, and anything outside it lies outside every (smaller-region)
+        # ring, so points outside the cap are rejected with one dot product
+        all_vertices = np.concatenate(all_vertices)
+        self.cap_centre, self.cap_cosine = None, -1.0
+        centre = all_vertices.sum(axis=0)
+        if np.linalg.norm(centre) > 1e-12:
+            centre /= np.linalg.norm(centre)
+            cosine = (all_vertices @ centre).min()
+            if cosine > 1e-12:
+                self.cap_centre, self.cap_cosine = centre, cosine
+
+        # Crossing parities of all rings can simply be added up: a point is
+        # inside iff the XOR of every ring's (reference inside, crossings odd) is set
+        self.planes = np.ascontiguousarray(np.concatenate(planes, axis=1).reshape(-1, 3))
+        self.n_edges = len(self.planes) // 3
+
+    def contains(self, points, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Test which points lie inside the polygon.
+
+        Args:
+        points: One (lat, lon) pair, [[lat1, lon1], ...] in degrees, or an (N, 3) array of unit vectors
+        max_bytes: Memory budget of one (points x edges) tile
+
+        Returns:
+        Boolean array, one entry per point (a bool for a single point)
+        """
+        single = np.ndim(points) == 1
+        points = np.asarray(points)
+        if points.ndim != 2 or points.shape[1] != 3:
+            points = unit_vectors(points)
+        n_points = len(points)
+
+        inside = np.zeros(n_points, dtype=bool)
+        candidates = np.arange(n_points)
+        if self.cap_centre is not None:
+            candidates = np.nonzero(points @ self.cap_centre >= self.cap_cosine - 1e-12)[0]
+        candidate_points = points[candidates]
+        candidate_inside = np.full(len(candidates), self.reference_inside)
+
+        planes = self.planes.reshape(3, self.n_edges, 3)
+        rows, cols = block_shape(len(candidates), max(self.n_edges, 1), 3 * 8 + 4, max_bytes)
+        for row_slice, col_slice in iter_blocks(len(candidates), self.n_edges, rows, cols):
+            tile_planes = planes[:, col_slice].reshape(-1, 3)
+            positive = candidate_points[row_slice] @ tile_planes.T > 0
+            positive = positive.reshape(-1, 3, col_slice.stop - col_slice.start)
+            crossings = np.count_nonzero(positive.all(axis=1), axis=1)
+            candidate_inside[row_slice] ^= (crossings % 2).astype(bool)
+
+        inside[candidates] = candidate_inside
+        return bool(inside[0]) if single else inside
+
+
+def contains(polygon, points, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Test which points lie inside a polygon on the sphere.
+
+    Args:
+    polygon: A SphericalPolygon, one ring [[lat1, lon1], ...] in degrees or a list of rings.
+             Build the SphericalPolygon once when testing the same polygon repeatedly.
+    points: One (lat, lon) pair, [[lat1, lon1], ...] in degrees, or an (N, 3) array of unit vectors
+
+    Returns:
+    Boolean array, one entry per point (a bool for a single point)
+    """
+    if not isinstance(polygon, SphericalPolygon):
+        polygon = SphericalPolygon(polygon)
+    return polygon.contains(points, max_bytes=max_bytes)
@@ -1,23 +1,21 @@
 import numpy as np
-import matplotlib.pyplot as plt
+
+from SphereStats.distance_kernels import (
+    PreparedPoints,
+    as_prepared,
+    great_circle_distance,
+    haversine,
+    to_cartesian,
+)
+from SphereStats.lazy_imports import lazy_import
+
+plt = lazy_import('matplotlib.pyplot')
+
 
 EARTH_RADIUS = 6371  # Earth's radius in kilometers
 
-def to_cartesian(lat, lon, radius=EARTH_RADIUS):
-    lat_rad = np.radians(lat)
-    lon_rad = np.radians(lon)
-    x = radius * np.cos(lat_rad) * np.cos(lon_rad)
-    y = radius * np.cos(lat_rad) * np.sin(lon_rad)
-    z = radius * np.sin(lat_rad)
-    return np.array([x, y, z])
-
-def haversine_distance(p1, p2):
-    R = EARTH_RADIUS
-    dlat = np.radians(p2[0] - p1[0])
-    dlon = np.radians(p2[1] - p1[1])
-    a = np.sin(dlat / 2) ** 2 + np.cos(np.radians(p1[0])) * np.cos(np.radians(p2[0])) * np.sin(dlon / 2) ** 2
-    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
-    return R * c
+def haversine_distance(p1, p2, dtype=np.float64):
+    return haversine(p1[0], p1[1], p2[0], p2[1], radius=EARTH_RADIUS, dtype=dtype)
 
 def interpolate_waypoints(start, end, num_points=5):
     start_cartesian = to_cartesian(*start)
@@ -36,10 +34,13 @@ def interpolate_waypoints(start, end, num_points=5):
     return waypoints
 
 def total_travel_distance(waypoints):
-    total_distance = 0
-    for i in range(1, len(waypoints)):
-        total_distance += haversine_distance(waypoints[i-1], waypoints[i])
-    return total_distance
+    if len(waypoints) < 2:
+        return 0
+    # Prepare every waypoint once and measure all consecutive legs in one call
+    points = as_prepared(waypoints)
+    starts = PreparedPoints(*(values[:-1] for values in points))
+    ends = PreparedPoints(*(values[1:] for values in points))
+    return great_circle_distance(starts, ends, radius=EARTH_RADIUS).sum()
 
 def plot_waypoints(start, end, waypoints):
     latitudes, longitudes = zip(start, end)
@@ -0,0 +1,105 @@
+# benchmarks/contraction_hierarchy.py
+"""
+Contraction hierarchy preprocessing and query benchmark.
+
+Builds a road-like travel-time graph (a Delaunay mesh of local roads at
+40 km/h plus a coarser mesh of highways at 110 km/h between every 20th node),
+contracts it and reports preprocessing time and peak memory, the size of the
+hierarchy in memory and on disk, and the latency of random point-to-point
+queries next to plain Dijkstra on the same pairs. Every query is checked
+against Dijkstra's distance.
+
+    python benchmarks/contraction_hierarchy.py --nodes 20000 --queries 1000
+"""
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+from scipy.spatial import Delaunay
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SphereStats.contraction_hierarchy import ContractionHierarchy  # noqa: E402
+from SphereStats.csr_graph import CSRGraph, csr_dijkstra  # noqa: E402
+from SphereStats.distance_kernels import haversine  # noqa: E402
+
+
+def mesh_edges(lat, lon, nodes):
+    """Both directions of every Delaunay edge between the given node ids."""
+    simplices = nodes[Delaunay(np.column_stack([lon[nodes], lat[nodes]])).simplices]
+    edges = np.concatenate([simplices[:, [0, 1]], simplices[:, [1, 2]], simplices[:, [2, 0]]])
+    edges = np.unique(np.sort(edges, axis=1), axis=0)
+    return np.concatenate([edges, edges[:, ::-1]])
+
+
+def road_graph(n_nodes, seed=0):
+    """Travel-time graph (hours) with local roads and a highway layer."""
+    rng = np.random.default_rng(seed)
+    lat, lon = rng.uniform(40, 45, n_nodes), rng.uniform(0, 6, n_nodes)
+    local = mesh_edges(lat, lon, np.arange(n_nodes))
+    highway = mesh_edges(lat, lon, rng.choice(n_nodes, max(n_nodes // 20, 3), replace=False))
+    edges = np.concatenate([local, highway])
+    speeds = np.concatenate([np.full(len(local), 40.0), np.full(len(highway), 110.0)])
+    weights = haversine(lat[edges[:, 0]], lon[edges[:, 0]], lat[edges[:, 1]], lon[edges[:, 1]]) / speeds
+    return CSRGraph.from_edges(lat, lon, edges[:, 0], edges[:, 1], weights)
+
+
+def latencies(function, pairs):
+    times, results = [], []
+    for start, goal in pairs:
+        begin = time.perf_counter()
+        results.append(function(start, goal))
+        times.append(time.perf_counter() - begin)
+    return np.array(times) * 1e3, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--dijkstra-queries', type=int, default=100,
+                        help='Number of the query pairs also timed with plain Dijkstra')
+    args = parser.parse_args(argv)
+
+    graph = road_graph(args.nodes)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    hierarchy = ContractionHierarchy.build(graph)
+    seconds = time.perf_counter() - start
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'hierarchy.npz')
+        hierarchy.save(path)
+        file_mb = os.path.getsize(path) / 2 ** 20
+        start = time.perf_counter()
+        hierarchy = ContractionHierarchy.load(path)
+        load_seconds = time.perf_counter() - start
+
+    print(f"graph: {graph.n_nodes} nodes, {graph.n_edges} edges")
+    print(f"preprocessing: {seconds:.2f} s, peak RSS growth {rss_growth / 1024:.1f} MB, "
+          f"{hierarchy.n_shortcuts} shortcuts")
+    print(f"hierarchy: {hierarchy.nbytes / 2 ** 20:.2f} MB in memory, {file_mb:.2f} MB on disk, "
+          f"loaded in {load_seconds * 1e3:.1f} ms")
+
+    pairs = np.random.default_rng(1).integers(graph.n_nodes, size=(args.queries, 2)).tolist()
+    hierarchy.query(*pairs[0])  # Builds the adjacency lists once
+    ch_ms, ch_results = latencies(hierarchy.query, pairs)
+    dijkstra_ms, dijkstra_results = latencies(lambda u, v: csr_dijkstra(graph, u, v),
+                                              pairs[:args.dijkstra_queries])
+    for (_, distance), (_, expected) in zip(ch_results, dijkstra_results):
+        assert abs(distance - expected) <= 1e-9 * max(expected, 1.0), (distance, expected)
+
+    print(f"{'query ms':>16s} {'mean':>8s} {'median':>8s} {'p99':>8s}")
+    for name, times in [('hierarchy', ch_ms), ('dijkstra', dijkstra_ms)]:
+        print(f"{name:>16s} {times.mean():8.3f} {np.median(times):8.3f} {np.percentile(times, 99):8.3f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+# benchmarks/convex_hull_scaling.py
+"""
+Spherical convex hull scaling benchmark.
+
+Times spherical_convex_hull on fleet-like point clouds (positions scattered
+around a few depots) from 1e3 points up to --max-points, and for sizes up to
+--baseline-max also the same hull without the Akl-Toussaint pre-filter, i.e.
+qhull on every projected point. Points are stored as float32 so that 1e8
+positions fit in memory (0.8 GB).
+
+    python benchmarks/convex_hull_scaling.py --max-points 1e8
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.spatial import ConvexHull
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from SphereStats.convex_hull import gnomonic_chunks, hemisphere_centre, spherical_convex_hull  # noqa: E402
+
+DEPOTS = np.array([[48.8, 2.3], [52.5, 13.4], [41.9, 12.5], [40.4, -3.7], [59.3, 18.1]])
+
+
+def fleet_positions(n_points, seed=0, chunk_size=10_000_000):
+    """n_points positions scattered around DEPOTS, generated chunk by chunk."""
+    rng = np.random.default_rng(seed)
+    points = np.empty((n_points, 2), dtype=np.float32)
+    for start in range(0, n_points, chunk_size):
+        stop = min(start + chunk_size, n_points)
+        depots = DEPOTS[rng.integers(len(DEPOTS), size=stop - start)]
+        points[start:stop] = depots + rng.normal(0, 3, (stop - start, 2))
+    return points
+
+
+def without_prefilter(points):
+    """Same hull, but qhull sees every projected point."""
+    centre = hemisphere_centre(points)
+    xy = np.concatenate([xy for _, xy in gnomonic_chunks(points, centre)])
+    return ConvexHull(xy).vertices
+
+
+def best_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--max-points', type=float, default=1e7)
+    parser.add_argument('--baseline-max', type=float, default=1e6,
+                        help='Largest size also timed without the pre-filter')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'points':>12s} {'hull s':>9s} {'Mpts/s':>8s} {'vertices':>9s} {'no filter s':>12s}")
+    n_points = 1000
+    while n_points <= args.max_points:
+        points = fleet_positions(n_points)
+        repeat = args.repeat if n_points <= 1e6 else 1
+        seconds, (polygon, _) = best_time(lambda: spherical_convex_hull(points), repeat)
+        baseline = '-'
+        if n_points <= args.baseline_max:
+            baseline_seconds, vertices = best_time(lambda: without_prefilter(points), repeat)
+            assert len(vertices) == len(polygon)
+            baseline = f"{baseline_seconds:.4f}"
+        print(f"{n_points:12d} {seconds:9.4f} {n_points / seconds / 1e6:8.2f} {len(polygon):9d} {baseline:>12s}")
+        del points
+        n_points *= 10
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# benchmarks/import_time.py
+"""
+Import-time regression benchmark.
+
+Imports each SphereStats module in a fresh interpreter and reports the import
+time, the peak resident memory of that interpreter and whether any plotting/GIS
+dependency was loaded. Exits with status 1 if a module exceeds --max-ms or
+pulls in a heavy dependency, so it can run as a CI gate.
+
+    python benchmarks/import_time.py --repeat 5 --max-ms 500
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('matplotlib', 'mpl_toolkits', 'cartopy', 'shapely', 'geopandas', 'osmnx',
+                 'networkx', 'PIL', 'pyproj')
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = sorted({{name.split('.')[0] for name in sys.modules}} & set({heavy!r}))
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{'seconds': elapsed, 'heavy': heavy, 'rss_kb': rss_kb}}))
+"""
+
+
+def package_modules():
+    """All importable modules of the package, plus the package itself."""
+    names = ['SphereStats']
+    for filename in sorted(os.listdir(os.path.join(ROOT, 'SphereStats'))):
+        if filename.endswith('.py') and filename != '__init__.py':
+            names.append('SphereStats.' + filename[:-3])
+    return names
+
+
+def measure(module, repeat=3):
+    """Best-of-`repeat` import time for `module` in a fresh interpreter."""
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return min(runs, key=lambda run: run['seconds'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='Fail if any module takes longer than this to import')
+    args = parser.parse_args(argv)
+
+    failed = False
+    print(f"{'module':40s} {'import ms':>10s} {'max RSS MB':>11s}  heavy deps")
+    for module in package_modules():
+        result = measure(module, args.repeat)
+        ms = result['seconds'] * 1000
+        print(f"{module:40s} {ms:10.1f} {result['rss_kb'] / 1024:11.1f}  {', '.join(result['heavy']) or '-'}")
+        if result['heavy'] or (args.max_ms is not None and ms > args.max_ms):
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,204 @@
 import unittest
 import os
+import shutil
+import tempfile
+from unittest import mock
 from SphereStats.Isochrone_NewYork import *  # Import everything from your iso_travel.py in SphereStats
 
 
+def street_graph(n=12, seed=0):
+    """osmnx-style MultiDiGraph: an n x n grid of two-way streets around Manhattan."""
+    rng = np.random.default_rng(seed)
+    G = nx.MultiDiGraph(crs='EPSG:4326')
+    for i in range(n):
+        for j in range(n):
+            G.add_node(1000 + i * n + j, x=-74.0 + 0.005 * j, y=40.7 + 0.005 * i)
+    for i in range(n):
+        for j in range(n):
+            node = 1000 + i * n + j
+            for di, dj, highway in [(0, 1, 'residential'), (1, 0, ['primary', 'secondary'])]:
+                if i + di < n and j + dj < n:
+                    other = 1000 + (i + di) * n + j + dj
+                    length = float(rng.uniform(400, 600))
+                    maxspeed = '25 mph' if highway == 'residential' and j % 2 else None
+                    G.add_edge(node, other, length=length, highway=highway, maxspeed=maxspeed)
+                    G.add_edge(other, node, length=length, highway=highway, maxspeed=maxspeed)
+    boundary = Polygon([(-74.001, 40.699), (-73.944, 40.699), (-73.944, 40.756), (-74.001, 40.756)])
+    return G, boundary
+
+
+class TestStreetNetwork(unittest.TestCase):
+
+    def setUp(self):
+        self.G, self.boundary = street_graph()
+        self.network = StreetNetwork.from_networkx(self.G, self.boundary)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        if os.path.exists('frames'):
+            shutil.rmtree('frames')
+
+    def assertSameNetwork(self, loaded):
+        for name in StreetNetwork.ARRAYS:
+            np.testing.assert_array_equal(np.asarray(getattr(loaded, name)), getattr(self.network, name))
+        self.assertTrue(loaded.boundary.equals(self.boundary))
+
+    def test_from_networkx(self):
+        self.assertEqual(self.network.n_nodes, 144)
+        self.assertEqual(self.network.n_edges, self.G.number_of_edges())
+        self.assertEqual(list(self.network.highway_classes), ['primary', 'residential'])
+        targets = self.network.targets[self.network.offsets[0]:self.network.offsets[1]]
+        self.assertEqual(sorted(self.network.osmid[targets]), sorted(self.G.successors(1000)))
+
+    def test_missing_length(self):
+        u, v, key = next(iter(self.G.edges(keys=True)))
+        del self.G.edges[u, v, key]['length']
+        network = StreetNetwork.from_networkx(self.G)
+        source, target = list(self.G.nodes).index(u), list(self.G.nodes).index(v)
+        edges = np.arange(network.offsets[source], network.offsets[source + 1])
+        edge = edges[network.targets[edges] == target][0]
+        expected = haversine(network.lat[source], network.lon[source], network.lat[target], network.lon[target])
+        self.assertAlmostEqual(network.length[edge], expected * 1000)
+
+    def test_save_replaces_snapshot(self):
+        path = os.path.join(self.directory, 'nyc.network')
+        self.network.save(path)
+        StreetNetwork.from_networkx(*street_graph(n=5)).save(path)
+        StreetNetwork.from_networkx(*street_graph(n=6)).save(path)
+        self.assertEqual(StreetNetwork.load(path).n_nodes, 36)
+        self.assertEqual(os.listdir(self.directory), ['nyc.network'])
+
+    def test_save_ignores_leftover_staging(self):
+        # Files from a crashed save under the old staging name must not leak in
+        path = os.path.join(self.directory, 'nyc.network')
+        leftover = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(leftover)
+        np.save(os.path.join(leftover, 'boundary.npy'), np.frombuffer(wkb.dumps(self.boundary), dtype=np.uint8))
+        network = StreetNetwork.from_networkx(self.G)
+        network.save(path)
+        self.assertIsNone(StreetNetwork.load(path).boundary)
+        self.assertNotIn('boundary.npy', os.listdir(path))
+
+    def test_save_keeps_concurrent_snapshot(self):
+        path = os.path.join(self.directory, 'nyc.network')
+        replace, raced = os.replace, []
+
+        def racing_replace(source, target):
+            # Another process publishes its snapshot just before ours
+            if target == path and not raced:
+                raced.append(True)
+                StreetNetwork.from_networkx(*street_graph(n=5)).save(path)
+            replace(source, target)
+
+        with mock.patch('SphereStats.Isochrone_NewYork.os.replace', racing_replace):
+            self.network.save(path)
+        self.assertEqual(StreetNetwork.load(path).n_nodes, 25)
+        self.assertEqual(os.listdir(self.directory), ['nyc.network'])
+
+    def test_snapshot_is_memory_mapped(self):
+        path = os.path.join(self.directory, 'nyc.network')
+        self.network.save(path)
+        self.network.save(path)  # Overwrites an existing snapshot
+        loaded = StreetNetwork.load(path)
+        self.assertIsInstance(loaded.length, np.memmap)
+        self.assertSameNetwork(loaded)
+
+    def test_npz_and_graphml(self):
+        npz = os.path.join(self.directory, 'nyc.npz')
+        self.network.save_npz(npz)
+        self.assertSameNetwork(load_network(npz))
+
+        graphml = os.path.join(self.directory, 'nyc.graphml')
+        ox.save_graphml(self.G, graphml)
+        loaded = load_network(graphml)
+        self.assertEqual(loaded.n_edges, self.network.n_edges)
+        self.assertAlmostEqual(float(loaded.length.sum()), float(self.network.length.sum()), places=3)
+
+    def test_cached_download(self):
+        path = snapshot_path('Test Town', 'drive', self.directory)
+        self.assertNotEqual(path, snapshot_path('Test Town', 'walk', self.directory))
+        self.network.save(path)
+        # A cache hit never touches the network
+        self.assertSameNetwork(load_network(place='Test Town', network_type='drive', cache_dir=self.directory))
+
+    def test_generate_isochrones_offline(self):
+        path = os.path.join(self.directory, 'nyc.network')
+        self.network.save(path)
+        polygons = generate_isochrones(skip_plots=True, source=path)
+        self.assertEqual(len(polygons), 6)
+        areas = [polygon.area for polygon in polygons]
+        self.assertTrue(all(a <= b for a, b in zip(areas[:-1], areas[1:])))
+
+    def test_speed_profiles(self):
+        residential = self.network.highway_classes[self.network.highway] == 'residential'
+        drive = self.network.travel_time('drive')
+        np.testing.assert_allclose(drive[residential], self.network.length[residential] / (30 / 3.6))
+        np.testing.assert_allclose(drive[~residential], self.network.length[~residential] / (60 / 3.6))
+        np.testing.assert_allclose(self.network.travel_time('walk'), self.network.length / (5 / 3.6))
+        np.testing.assert_allclose(self.network.travel_time('constant'), self.network.length / (50 / 3.6))
+        self.assertIs(self.network.travel_time('drive'), drive)
+
+        tagged = ~np.isnan(self.network.maxspeed)
+        self.assertTrue(np.all(residential[tagged]))
+        np.testing.assert_allclose(self.network.travel_time('maxspeed')[tagged],
+                                   self.network.length[tagged] / (25 * 1.609344 / 3.6))
+
+        closed = self.network.travel_time({'primary': 0, 'default': 10})
+        self.assertTrue(np.all(np.isinf(closed[~residential])))
+        self.assertEqual(set(self.network.travel_times), {'drive', 'walk', 'constant', 'maxspeed'})
+
+    def test_profiles_not_saved_with_snapshot(self):
+        self.network.travel_time('bike')
+        path = os.path.join(self.directory, 'nyc.network')
+        self.network.save(path)
+        self.assertFalse(any(name.startswith('travel_time') for name in os.listdir(path)))
+        # Weights follow the speed table in use when the snapshot is loaded
+        original = SPEED_PROFILES['bike']
+        SPEED_PROFILES['bike'] = {'default': 10}
+        try:
+            loaded = StreetNetwork.load(path)
+            self.assertEqual(loaded.travel_times, {})
+            np.testing.assert_allclose(loaded.travel_time('bike'), self.network.length / (10 / 3.6))
+        finally:
+            SPEED_PROFILES['bike'] = original
+        self.assertEqual(parse_maxspeed(['30', '50']), 40.0)
+
+    def test_many_thresholds(self):
+        polygons = generate_isochrones(skip_plots=True, source=self.network, isochrone_times=np.linspace(1, 60, 60))
+        self.assertGreater(len(polygons), 50)
+
+    def test_buckets_match_per_threshold_search(self):
+        graph = self.network.graph('drive')
+        thresholds = np.array([60.0, 120.0, 300.0, 600.0])
+        order, counts = isochrone_buckets(graph, 70, thresholds)
+        hulls = isochrone_hulls(self.network.lon, self.network.lat, order, counts)
+        for threshold, count, hull in zip(thresholds, counts, hulls):
+            travel_times, _ = shortest_path_tree(graph, 70, cutoff=threshold)
+            reached = np.nonzero(np.isfinite(travel_times))[0]
+            np.testing.assert_array_equal(np.sort(order[:count]), reached)
+            expected = shapely.multipoints(np.column_stack([self.network.lon[reached],
+                                                            self.network.lat[reached]])).convex_hull
+            self.assertTrue(hull.equals(expected))
+
+    def test_batch_isochrones(self):
+        graph = self.network.graph('drive')
+        nodes = [0, 70, 143]
+        origins = np.column_stack([self.network.lat[nodes] + 1e-5, self.network.lon[nodes]])
+        times = [1.0, 2.0, 5.0]
+        output = os.path.join(self.directory, 'isochrones.gpkg')
+        single = batch_isochrones(origins, times, source=self.network, output=output, chunk_size=2)
+        pooled = batch_isochrones(origins, times, source=self.network, workers=2, chunk_size=1)
+
+        self.assertEqual(list(single.index), [(o, t) for o in range(3) for t in times])
+        for (origin, threshold), hull in single.geometry.items():
+            order, counts = isochrone_buckets(graph, nodes[origin], [threshold * 60])
+            self.assertTrue(hull.equals(isochrone_hulls(self.network.lon, self.network.lat, order, counts)[0]))
+            self.assertTrue(hull.equals(pooled.geometry.loc[(origin, threshold)]))
+        written = gpd.read_file(output).set_index(['origin', 'threshold']).sort_index()
+        self.assertEqual(list(written.index), list(single.index))
+
+
 class TestIsoTravel(unittest.TestCase):
 
     def setUp(self):
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import shapefile
+from SphereStats.boundary_index import cache_path, load_boundary_index
+from SphereStats.segment_distance import SegmentIndex, polygon_edges, segment_distances
+from SphereStats.spherical_geometry import points_to_polygon_distance
+
+
+class TestBoundaryIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, 'cache')
+        self.shapefile = os.path.join(self.tmp.name, 'borders.shp')
+
+        # A jagged ring with a hole, in lon/lat like Natural Earth
+        angles = np.linspace(0, 2 * np.pi, 2000, endpoint=False)
+        radii = 10 + np.sin(7 * angles)
+        self.outer = np.column_stack([20 * np.cos(angles) * radii / 10, 10 * np.sin(angles) * radii / 10])
+        self.hole = np.array([[-2, -2], [-2, 2], [2, 2], [2, -2]], dtype=float)
+        writer = shapefile.Writer(self.shapefile, shapeType=shapefile.POLYGON)
+        writer.field('name', 'C')
+        writer.poly([self.outer.tolist() + [self.outer[0].tolist()], self.hole.tolist() + [self.hole[0].tolist()]])
+        writer.record('test')
+        writer.close()
+
+        rng = np.random.default_rng(5)
+        self.points = np.column_stack([rng.uniform(-30, 30, 1000), rng.uniform(-40, 40, 1000)])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_matches_brute_force(self):
+        index = load_boundary_index(self.shapefile, cache_dir=self.cache_dir)
+        self.assertEqual(len(index), len(self.outer) + len(self.hole))
+
+        # Rings in lat/lon order
+        edges = [polygon_edges(self.outer[:, ::-1]), polygon_edges(self.hole[:, ::-1])]
+        expected = np.minimum(*(segment_distances(self.points, ring)[0] for ring in edges))
+        distances, _ = points_to_polygon_distance(self.points, index)
+        np.testing.assert_allclose(distances, expected, atol=1e-6)
+
+    def test_index_is_cached(self):
+        self.assertFalse(os.path.exists(cache_path(self.shapefile, cache_dir=self.cache_dir)))
+        built = load_boundary_index(self.shapefile, cache_dir=self.cache_dir)
+        self.assertTrue(os.path.exists(cache_path(self.shapefile, cache_dir=self.cache_dir)))
+        cached = load_boundary_index(self.shapefile, cache_dir=self.cache_dir)
+        np.testing.assert_array_equal(cached.cap_centres, built.cap_centres)
+
+    def test_from_polygon_rings(self):
+        index = SegmentIndex.from_polygon([self.outer[:, ::-1], self.hole[:, ::-1]])
+        self.assertEqual(len(index), len(self.outer) + len(self.hole))
+        distances, edges = points_to_polygon_distance([[0, 0]], index)
+        self.assertGreaterEqual(edges[0], len(self.outer))  # The hole is nearest to its centre
+        self.assertAlmostEqual(distances[0], 222.39, places=2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from SphereStats.contraction_hierarchy import ContractionHierarchy, contract
+from SphereStats.csr_graph import CSRGraph, csr_dijkstra
+from SphereStats.distance_kernels import haversine
+from SphereStats.network_routing import dijkstra
+
+
+def road_graph(n_nodes=150, n_edges=500, one_way=0.2, seed=0):
+    """Random nodes joined to near neighbours, some edges one-way, weights above the great-circle length."""
+    rng = np.random.default_rng(seed)
+    lat, lon = rng.uniform(40, 42, n_nodes), rng.uniform(-75, -73, n_nodes)
+    sources = rng.integers(n_nodes, size=n_edges)
+    nearest = np.argsort((lat[:, None] - lat) ** 2 + (lon[:, None] - lon) ** 2, axis=1)[:, 1:6]
+    targets = nearest[sources, rng.integers(5, size=n_edges)]
+    both_ways = rng.uniform(size=n_edges) > one_way
+    sources, targets = np.concatenate([sources, targets[both_ways]]), np.concatenate([targets, sources[both_ways]])
+    weights = haversine(lat[sources], lon[sources], lat[targets], lon[targets]) * rng.uniform(1, 1.5, len(sources))
+    return CSRGraph.from_edges(lat, lon, sources, targets, weights)
+
+
+def path_weight(graph, path):
+    total = 0.0
+    for source, target in zip(path[:-1], path[1:]):
+        targets, weights = graph.neighbours(source)
+        total += weights[targets == target].min()
+    return total
+
+
+class TestContractionHierarchy(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = road_graph()
+        cls.hierarchy = ContractionHierarchy.build(cls.graph)
+
+    def test_rank_is_permutation(self):
+        np.testing.assert_array_equal(np.sort(self.hierarchy.rank), np.arange(self.graph.n_nodes))
+
+    def test_matches_dijkstra(self):
+        rng = np.random.default_rng(1)
+        for start, goal in rng.integers(self.graph.n_nodes, size=(200, 2)).tolist():
+            path, distance = self.hierarchy.query(start, goal)
+            expected_path, expected = csr_dijkstra(self.graph, start, goal)
+            if expected_path is None:
+                self.assertIsNone(path)
+                self.assertEqual(distance, float('inf'))
+                continue
+            self.assertAlmostEqual(distance, expected, places=9)
+            self.assertEqual((path[0], path[-1]), (start, goal))
+            self.assertAlmostEqual(path_weight(self.graph, path), expected, places=9)
+
+    def test_same_node(self):
+        self.assertEqual(self.hierarchy.query(7, 7), ([7], 0.0))
+
+    def test_unreachable(self):
+        graph = CSRGraph.from_edges([0, 1, 2], [0, 1, 2], [0, 1], [1, 0], [1.0, 1.0])
+        hierarchy = ContractionHierarchy.build(graph)
+        self.assertEqual(hierarchy.query(0, 2), (None, float('inf')))
+        self.assertEqual(hierarchy.query(1, 0), ([1, 0], 1.0))
+
+    def test_dijkstra_dispatch(self):
+        start, goal = self.graph.node(3), self.graph.node(90)
+        path, distance = dijkstra(self.hierarchy, start, goal)
+        expected_path, expected = dijkstra(self.graph, start, goal)
+        self.assertAlmostEqual(distance, expected, places=9)
+        self.assertEqual((path[0], path[-1]), (start, goal))
+
+    def test_contract_dict_graph(self):
+        cities = [(40.7128, -74.0060), (34.0522, -118.2437), (51.5074, -0.1278), (48.8566, 2.3522)]
+        graph = {cities[0]: {cities[1]: 3936.0, cities[2]: 5570.0},
+                 cities[1]: {cities[0]: 3936.0},
+                 cities[2]: {cities[0]: 5570.0, cities[3]: 344.0},
+                 cities[3]: {cities[2]: 344.0}}
+        path, distance = dijkstra(contract(graph), cities[1], cities[3])
+        self.assertEqual(path, [cities[1], cities[0], cities[2], cities[3]])
+        self.assertAlmostEqual(distance, 3936.0 + 5570.0 + 344.0)
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'hierarchy.npz')
+            self.hierarchy.save(path)
+            loaded = ContractionHierarchy.load(path)
+        np.testing.assert_array_equal(loaded.rank, self.hierarchy.rank)
+        for start, goal in [(0, 100), (42, 5), (149, 1)]:
+            self.assertEqual(loaded.query(start, goal), self.hierarchy.query(start, goal))
+
+
+if __name__ == "__main__":
+    unittest.main()
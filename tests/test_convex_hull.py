@@ -1,8 +1,10 @@
 import unittest
 import numpy as np
 import matplotlib.pyplot as plt
+from scipy.spatial import ConvexHull
 from SphereStats.convex_hull import spherical_to_cartesian, convex_hull_on_sphere, plot_convex_hull_3d, \
-    plot_convex_hull_2d  # Importing functions from SphereStats
+    plot_convex_hull_2d, spherical_convex_hull, gnomonic_chunks, hemisphere_centre, IncrementalSphericalHull
+from SphereStats.spherical_polygon import contains
 
 
 class TestConvexHull(unittest.TestCase):
@@ -54,5 +56,81 @@ class TestConvexHull(unittest.TestCase):
             self.fail(f"plot_convex_hull_2d raised an exception: {e}")
 
 
+class TestSphericalConvexHull(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.points = np.column_stack([rng.normal(45, 5, 20000), rng.normal(10, 8, 20000)])
+
+    def test_matches_unfiltered_hull(self):
+        polygon, indices = spherical_convex_hull(self.points, chunk_size=3000)
+        xy = np.concatenate([xy for _, xy in gnomonic_chunks(self.points, hemisphere_centre(self.points))])
+        self.assertEqual(set(indices), set(ConvexHull(xy).vertices))
+        np.testing.assert_array_equal(polygon, self.points[indices])
+
+    def test_polygon_encloses_points(self):
+        polygon, indices = spherical_convex_hull(self.points)
+        others = np.setdiff1d(np.arange(len(self.points)), indices)
+        self.assertTrue(contains(polygon, self.points[others]).all())
+
+    def test_antimeridian(self):
+        points = np.array([[10, 175], [-10, 175], [-10, -175], [10, -175], [0, 179], [0, -179]])
+        polygon, indices = spherical_convex_hull(points)
+        self.assertEqual(set(indices), {0, 1, 2, 3})
+
+    def test_points_beyond_a_hemisphere(self):
+        with self.assertRaises(ValueError):
+            spherical_convex_hull([[0, 0], [0, 120], [0, -120]])
+
+    def test_degenerate_points(self):
+        # Two points, and points along the equator, leave no polygon to return
+        for points in ([[10, 20], [15, 25]], [[0, 0], [0, 10], [0, 20]]):
+            with self.assertRaises(ValueError):
+                spherical_convex_hull(points)
+
+
+class TestIncrementalSphericalHull(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(4)
+        self.points = np.column_stack([rng.normal(45, 5, 50000), rng.normal(10, 8, 50000)])
+
+    def test_matches_batch_hull(self):
+        hull = IncrementalSphericalHull()
+        for start in range(0, len(self.points), 2000):
+            hull.add(self.points[start:start + 2000])
+        _, indices = spherical_convex_hull(self.points)
+        self.assertEqual(set(hull.indices), set(indices))
+        np.testing.assert_array_equal(hull.vertices, self.points[hull.indices])
+        self.assertLess(len(hull.points), 2 * len(hull.indices) + 1024 + 2000)
+
+    def test_interior_batch_is_rejected(self):
+        hull = IncrementalSphericalHull(self.points)
+        stored = len(hull.points)
+        self.assertEqual(hull.add([[45, 10], [46, 11], [44, 9]]), 0)
+        self.assertEqual(len(hull.points), stored)
+        self.assertEqual(hull.n_points, len(self.points) + 3)
+
+    def test_recentres_for_moving_points(self):
+        rng = np.random.default_rng(5)
+        hull = IncrementalSphericalHull()
+        batches = [np.column_stack([rng.normal(0, 2, 500), rng.normal(1.5 * step, 2, 500)]) for step in range(60)]
+        for batch in batches:
+            hull.add(batch)
+        _, indices = spherical_convex_hull(np.concatenate(batches))
+        self.assertEqual(set(hull.indices), set(indices))
+
+    def test_starts_from_degenerate_points(self):
+        hull = IncrementalSphericalHull([[0, 0], [0, 1]])
+        self.assertEqual(len(hull.vertices), 2)
+        hull.add([[1, 0.5], [0.2, 0.5]])
+        self.assertEqual(set(hull.indices), {0, 1, 2})
+
+    def test_points_beyond_a_hemisphere(self):
+        hull = IncrementalSphericalHull([[0, 0], [10, 0], [0, 10]])
+        with self.assertRaises(ValueError):
+            hull.add([[0, 180], [0, 120], [0, -120], [-80, 0]])
+
+
 if __name__ == "__main__":
     unittest.main()
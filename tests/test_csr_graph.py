@@ -0,0 +1,173 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from SphereStats.csr_graph import CSRGraph, cost_matrix, csr_astar, reconstruct_path, shortest_path_tree
+from SphereStats.distance_kernels import haversine
+from SphereStats.network_routing import astar, create_network, dijkstra
+
+
+def random_graph(n_nodes=300, n_edges=1500, seed=0):
+    rng = np.random.default_rng(seed)
+    lat, lon = rng.uniform(40, 41, n_nodes), rng.uniform(-74, -73, n_nodes)
+    # Distinct node pairs, as the dict format cannot hold parallel edges
+    pairs = np.unique(rng.integers(n_nodes, size=(n_edges, 2)), axis=0)
+    return CSRGraph.from_edges(lat, lon, pairs[:, 0], pairs[:, 1], rng.uniform(1, 10, len(pairs)))
+
+
+def grid_graph(n=30, seed=0):
+    """Road-like grid over 10 x 10 degrees with diagonals, weights slightly above the great-circle length."""
+    rng = np.random.default_rng(seed)
+    lat, lon = np.meshgrid(np.linspace(40, 50, n), np.linspace(0, 10, n), indexing='ij')
+    lat, lon = lat.ravel() + rng.normal(0, 0.01, n * n), lon.ravel() + rng.normal(0, 0.01, n * n)
+    ids = np.arange(n * n).reshape(n, n)
+    pairs = [(ids[:, :-1], ids[:, 1:]), (ids[:-1, :], ids[1:, :]),
+             (ids[:-1, :-1], ids[1:, 1:]), (ids[:-1, 1:], ids[1:, :-1])]
+    sources = np.concatenate([np.concatenate([a.ravel(), b.ravel()]) for a, b in pairs])
+    targets = np.concatenate([np.concatenate([b.ravel(), a.ravel()]) for a, b in pairs])
+    weights = haversine(lat[sources], lon[sources], lat[targets], lon[targets]) * rng.uniform(1, 1.05, len(sources))
+    return CSRGraph.from_edges(lat, lon, sources, targets, weights)
+
+
+class TestCSRGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = random_graph()
+
+    def test_from_edges_layout(self):
+        graph = CSRGraph.from_edges([0, 1, 2], [0, 1, 2], [2, 0, 0], [0, 1, 2], [5.0, 1.0, 2.0])
+        np.testing.assert_array_equal(graph.offsets, [0, 2, 2, 3])
+        targets, weights = graph.neighbours(0)
+        np.testing.assert_array_equal(targets, [1, 2])
+        np.testing.assert_array_equal(weights, [1.0, 2.0])
+
+    def test_dict_round_trip(self):
+        as_dict = self.graph.to_dict()
+        converted = CSRGraph.from_dict(as_dict)
+        self.assertEqual(converted.to_dict(), as_dict)
+
+    def test_matches_dict_dijkstra(self):
+        as_dict = self.graph.to_dict()
+        for goal in range(1, 40):
+            path, distance = dijkstra(self.graph, 0, goal)
+            dict_path, dict_distance = dijkstra(as_dict, self.graph.node(0), self.graph.node(goal))
+            self.assertAlmostEqual(distance, dict_distance)
+            if path is None:
+                self.assertIsNone(dict_path)
+            else:
+                self.assertEqual([self.graph.node(node) for node in path], dict_path)
+
+    def test_coordinate_nodes(self):
+        start, goal = self.graph.node(0), self.graph.node(5)
+        path, distance = dijkstra(self.graph, start, goal)
+        self.assertEqual(path[0], start)
+        self.assertEqual(path[-1], goal)
+        self.assertEqual(distance, dijkstra(self.graph, 0, 5)[1])
+
+    def test_unreachable(self):
+        graph = CSRGraph.from_edges([0, 1, 2], [0, 1, 2], [0], [1], [1.0])
+        self.assertEqual(dijkstra(graph, 0, 2), (None, float('inf')))
+
+    def test_cutoff(self):
+        distances, predecessors = shortest_path_tree(self.graph, 0, cutoff=8.0)
+        full, _ = shortest_path_tree(self.graph, 0)
+        np.testing.assert_array_equal(distances, np.where(full <= 8.0, full, np.inf))
+        for node in np.nonzero(np.isfinite(distances))[0]:
+            self.assertIsNotNone(reconstruct_path(predecessors, 0, node))
+
+    def test_create_network(self):
+        cities = [(40.7128, -74.0060), (34.0522, -118.2437), (51.5074, -0.1278)]
+        graph = create_network(cities)
+        self.assertIsInstance(graph, CSRGraph)
+        self.assertEqual(graph.n_edges, 6)
+        self.assertIn(cities[1], graph[cities[0]])
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'graph.npz')
+            self.graph.save(path)
+            loaded = CSRGraph.load(path)
+        np.testing.assert_array_equal(loaded.offsets, self.graph.offsets)
+        np.testing.assert_array_equal(loaded.weights, self.graph.weights)
+
+
+class TestAStar(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = grid_graph()
+
+    def test_matches_dijkstra(self):
+        for start, goal in [(0, 899), (29, 870), (450, 479), (17, 17)]:
+            path, distance, expanded = astar(self.graph, start, goal)
+            self.assertAlmostEqual(distance, dijkstra(self.graph, start, goal)[1], places=9)
+            self.assertEqual((path[0], path[-1]), (start, goal))
+            self.assertAlmostEqual(sum(self.graph[self.graph.node(u)][self.graph.node(v)]
+                                       for u, v in zip(path[:-1], path[1:])), distance, places=9)
+
+    def test_fewer_expansions(self):
+        distances, _ = shortest_path_tree(self.graph, 450, targets=[479])
+        _, _, expanded = csr_astar(self.graph, 450, 479)
+        self.assertLess(expanded * 4, np.isfinite(distances).sum())
+
+    def test_travel_time(self):
+        speeds = np.random.default_rng(1).uniform(30, 110, self.graph.n_edges)
+        graph = CSRGraph(self.graph.lat, self.graph.lon, self.graph.offsets, self.graph.targets,
+                         self.graph.weights / speeds)
+        path, hours, _ = astar(graph, 0, 899, max_speed=110)
+        expected_path, expected_hours = dijkstra(graph, 0, 899)
+        self.assertAlmostEqual(hours, expected_hours, places=9)
+        self.assertEqual(path, expected_path)
+
+    def test_dict_graph(self):
+        as_dict = self.graph.to_dict()
+        start, goal = self.graph.node(3), self.graph.node(800)
+        path, distance, expanded = astar(as_dict, start, goal)
+        self.assertEqual(path, astar(self.graph, start, goal)[0])
+        self.assertAlmostEqual(distance, dijkstra(as_dict, start, goal)[1], places=9)
+        self.assertGreater(expanded, 0)
+
+    def test_unreachable(self):
+        graph = CSRGraph.from_edges([0, 1, 2], [0, 1, 2], [0], [1], [200.0])
+        self.assertEqual(astar(graph, 0, 2), (None, float('inf'), 2))
+
+
+class TestCostMatrix(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = random_graph()
+        self.sources = [0, 17, 42, 299]
+        self.targets = [5, 0, 123, 250, 7]
+
+    def test_matches_dijkstra(self):
+        costs = cost_matrix(self.graph, self.sources, self.targets)
+        self.assertEqual(costs.shape, (4, 5))
+        for i, source in enumerate(self.sources):
+            for j, target in enumerate(self.targets):
+                self.assertAlmostEqual(costs[i, j], dijkstra(self.graph, source, target)[1])
+
+    def test_predecessors(self):
+        costs, predecessors = cost_matrix(self.graph, self.sources, self.targets, return_predecessors=True)
+        self.assertEqual(predecessors.shape, (4, self.graph.n_nodes))
+        for i, source in enumerate(self.sources):
+            for j, target in enumerate(self.targets):
+                path = reconstruct_path(predecessors[i], source, target)
+                self.assertEqual(path, dijkstra(self.graph, source, target)[0])
+
+    def test_all_targets_and_cutoff(self):
+        costs = cost_matrix(self.graph, [3], cutoff=8.0)
+        full, _ = shortest_path_tree(self.graph, 3)
+        np.testing.assert_array_equal(costs[0], np.where(full <= 8.0, full, np.inf))
+
+    def test_process_pool(self):
+        expected = cost_matrix(self.graph, self.sources, self.targets, return_predecessors=True)
+        result = cost_matrix(self.graph, self.sources, self.targets, return_predecessors=True, workers=2)
+        np.testing.assert_array_equal(result[0], expected[0])
+        np.testing.assert_array_equal(result[1], expected[1])
+
+    def test_invalid_ids(self):
+        with self.assertRaises(ValueError):
+            cost_matrix(self.graph, [0], [self.graph.n_nodes])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+import numpy as np
+from SphereStats.distance_kernels import (
+    EARTH_RADIUS,
+    as_prepared,
+    central_angle,
+    chord_length,
+    error_bound,
+    great_circle_distance,
+    haversine,
+    pairwise,
+    prepare_points,
+    to_cartesian,
+)
+
+
+class TestDistanceKernels(unittest.TestCase):
+
+    def setUp(self):
+        self.cities = np.array([
+            [40.7128, -74.0060],   # New York City
+            [34.0522, -118.2437],  # Los Angeles
+            [51.5074, -0.1278],    # London
+            [35.6895, 139.6917],   # Tokyo
+        ])
+
+    def test_haversine_scalar(self):
+        # Warsaw to Rome, same reference value as the sphere_stats tests
+        distance = haversine(52.2296756, 21.0122287, 41.8919300, 12.5113300)
+        self.assertAlmostEqual(distance, 1315.510156, places=6)
+        self.assertEqual(np.ndim(distance), 0)
+
+    def test_haversine_broadcasting(self):
+        lats, lons = self.cities[:, 0], self.cities[:, 1]
+        distances = haversine(lats[0], lons[0], lats, lons)
+        self.assertEqual(distances.shape, (4,))
+        self.assertEqual(distances[0], 0)
+        self.assertAlmostEqual(distances[2], 5570, delta=50)
+
+    def test_haversine_column_against_row(self):
+        # A latitude column against a longitude row broadcasts to a grid
+        lat, lon = np.linspace(-90, 90, 7), np.linspace(-180, 180, 13)
+        grid = haversine(40.7128, -74.0060, lat[:, None], lon[None, :])
+        self.assertEqual(grid.shape, (7, 13))
+        lon_grid, lat_grid = np.meshgrid(lon, lat)
+        np.testing.assert_allclose(grid, haversine(40.7128, -74.0060, lat_grid, lon_grid))
+
+    def test_pairwise_matches_elementwise(self):
+        points = as_prepared(self.cities)
+        matrix = great_circle_distance(*pairwise(points, points))
+        self.assertEqual(matrix.shape, (4, 4))
+        for i, (lat1, lon1) in enumerate(self.cities):
+            for j, (lat2, lon2) in enumerate(self.cities):
+                self.assertAlmostEqual(matrix[i, j], haversine(lat1, lon1, lat2, lon2), places=9)
+
+    def test_out_buffer_is_filled(self):
+        points = prepare_points(self.cities[:, 0], self.cities[:, 1])
+        out = np.empty((4, 4))
+        work = np.empty((4, 4))
+        result = great_circle_distance(*pairwise(points, points), out=out, work=work)
+        self.assertIs(result, out)
+        np.testing.assert_allclose(out, out.T)
+
+    def test_angle_and_chord_are_consistent(self):
+        points = as_prepared(self.cities)
+        p1, p2 = pairwise(points, points)
+        angle = central_angle(p1, p2)
+        chord = chord_length(p1, p2)
+        np.testing.assert_allclose(chord, 2 * EARTH_RADIUS * np.sin(angle / 2), atol=1e-9)
+
+    def test_antipodal_points(self):
+        distance = haversine(90, 0, -90, 0)
+        self.assertAlmostEqual(distance, EARTH_RADIUS * np.pi, places=6)
+
+    def test_float32_precision(self):
+        lats, lons = self.cities[:, 0], self.cities[:, 1]
+        single = haversine(lats[0], lons[0], lats, lons, dtype=np.float32)
+        double = haversine(lats[0], lons[0], lats, lons)
+        self.assertEqual(single.dtype, np.float32)
+        bound = error_bound(double, np.float32)
+        self.assertTrue(np.all(np.abs(single - double) <= bound))
+
+    def test_to_cartesian(self):
+        xyz = to_cartesian([0, 90], [0, 0], dtype=np.float32)
+        self.assertEqual(xyz.shape, (3, 2))
+        self.assertEqual(xyz.dtype, np.float32)
+        np.testing.assert_allclose(xyz[:, 0], [EARTH_RADIUS, 0, 0], atol=1e-3)
+        np.testing.assert_allclose(xyz[:, 1], [0, 0, EARTH_RADIUS], atol=1e-3)
+
+
+if __name__ == "__main__":
+    unittest.main()
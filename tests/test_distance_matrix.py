@@ -0,0 +1,90 @@
+import unittest
+from unittest import mock
+import numpy as np
+from SphereStats.distance_kernels import haversine
+from SphereStats.distance_matrix import block_shape, distance_matrix, distances_from, nearest, pairs_within
+
+
+class TestDistanceMatrix(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.a = np.column_stack([rng.uniform(-90, 90, 37), rng.uniform(-180, 180, 37)])
+        self.b = np.column_stack([rng.uniform(-90, 90, 23), rng.uniform(-180, 180, 23)])
+        self.expected = haversine(self.a[:, None, 0], self.a[:, None, 1], self.b[None, :, 0], self.b[None, :, 1])
+
+    def test_distance_matrix(self):
+        result = distance_matrix(self.a, self.b)
+        self.assertEqual(result.shape, (37, 23))
+        np.testing.assert_allclose(result, self.expected, rtol=1e-12)
+
+    def test_tiny_budget_tiles_rows_and_columns(self):
+        # A budget of a few elements forces partial tiles in both directions
+        self.assertEqual(block_shape(37, 23, 8, max_bytes=16 * 5), (1, 5))
+        result = distance_matrix(self.a, self.b, max_bytes=16 * 5)
+        np.testing.assert_allclose(result, self.expected, rtol=1e-12)
+
+    def test_out_argument(self):
+        out = np.zeros((37, 23))
+        result = distance_matrix(self.a, self.b, out=out, max_bytes=16 * 100)
+        self.assertIs(result, out)
+        np.testing.assert_allclose(out, self.expected, rtol=1e-12)
+
+    def test_out_shape_mismatch(self):
+        with self.assertRaises(ValueError):
+            distance_matrix(self.a, self.b, out=np.empty((23, 37)))
+
+    def test_self_distances(self):
+        result = distance_matrix(self.a)
+        np.testing.assert_allclose(np.diag(result), 0, atol=1e-9)
+        np.testing.assert_allclose(result, result.T, rtol=1e-12)
+
+    def test_thread_workers(self):
+        result = distance_matrix(self.a, self.b, max_bytes=16 * 10, workers=4)
+        np.testing.assert_allclose(result, self.expected, rtol=1e-12)
+
+    def test_process_workers(self):
+        out = np.empty((37, 23))
+        result = distance_matrix(self.a, self.b, out=out, workers=2, backend='process')
+        self.assertIs(result, out)
+        np.testing.assert_allclose(result, self.expected, rtol=1e-12)
+
+    def test_process_staging_rounds(self):
+        # Two rows per worker and round: the 37 rows take ten rounds through the staging buffer
+        with mock.patch('SphereStats.distance_matrix.STAGING_BYTES', 2 * 23 * 8):
+            result = distance_matrix(self.a, self.b, workers=2, backend='process')
+        np.testing.assert_allclose(result, self.expected, rtol=1e-12)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            distance_matrix(self.a, self.b, workers=2, backend='gpu')
+        with self.assertRaises(ValueError):
+            distance_matrix(self.a, self.b, backend='bogus')
+
+    def test_distances_from(self):
+        origin = self.a[0]
+        result = distances_from(origin, self.b, workers=3)
+        self.assertEqual(result.shape, (23,))
+        np.testing.assert_allclose(result, self.expected[0], rtol=1e-12)
+
+    def test_float32_matrix(self):
+        result = distance_matrix(self.a, self.b, dtype=np.float32)
+        self.assertEqual(result.dtype, np.float32)
+        np.testing.assert_allclose(result, self.expected, atol=10.0)
+
+    def test_pairs_within(self):
+        max_distance = 5000
+        rows, cols, distances = pairs_within(self.a, self.b, max_distance, max_bytes=16 * 50)
+        expected_rows, expected_cols = np.nonzero(self.expected <= max_distance)
+        found = sorted(zip(rows.tolist(), cols.tolist()))
+        self.assertEqual(found, sorted(zip(expected_rows.tolist(), expected_cols.tolist())))
+        np.testing.assert_allclose(distances, self.expected[rows, cols], rtol=1e-12)
+
+    def test_nearest(self):
+        indices, distances = nearest(self.a, self.b, max_bytes=16 * 50)
+        np.testing.assert_array_equal(indices, self.expected.argmin(axis=1))
+        np.testing.assert_allclose(distances, self.expected.min(axis=1), rtol=1e-12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,11 +4,13 @@ import unittest
 import sys
 import os
 import numpy as np  # Add numpy import here
+import matplotlib.pyplot as plt
 
 # Add your library path to the Python path for testing
 sys.path.insert(0, os.path.abspath('/Users/ghulamabbaszafari/Desktop/SphereStats'))
 
 from SphereStats.heatmap import haversine, generate_heatmap
+from SphereStats.heatmap import GRID_CACHE, clear_grid_cache, distance_grid, iter_distance_grid, render_heatmap
 
 # Define EARTH_RADIUS here
 EARTH_RADIUS = 6371  # Earth's radius in kilometers
@@ -47,5 +49,54 @@ class TestHeatmap(unittest.TestCase):
         except Exception as e:
             self.fail(f"generate_heatmap raised an exception: {e}")
 
+
+class TestDistanceGrid(unittest.TestCase):
+
+    def setUp(self):
+        clear_grid_cache()
+
+    def test_matches_haversine(self):
+        lat, lon, distances = distance_grid(origin, resolution=0.5, max_bytes=2 ** 14)
+        self.assertEqual(distances.shape, (361, 721))
+        self.assertEqual((lon[1] - lon[0], lat[0], lat[-1]), (0.5, -90, 90))
+        expected = haversine(origin[0], origin[1], lat[:, None], lon[None, :])
+        np.testing.assert_allclose(distances, expected, rtol=0, atol=1e-9)
+
+        blocks = list(iter_distance_grid(origin, resolution=0.5, max_bytes=2 ** 14))
+        self.assertGreater(len(blocks), 1)
+        np.testing.assert_array_equal(np.concatenate([block for _, block in blocks]), distances)
+
+    def test_float32(self):
+        _, _, distances = distance_grid(origin, resolution=2.0, dtype=np.float32)
+        self.assertEqual(distances.dtype, np.float32)
+        np.testing.assert_allclose(distances, distance_grid(origin, resolution=2.0)[2], atol=1.0)
+
+    def test_memoized(self):
+        grid = distance_grid(origin, resolution=1.0)
+        self.assertIs(distance_grid(origin, resolution=1.0), grid)
+        self.assertFalse(grid[2].flags.writeable)
+        self.assertIsNot(distance_grid(origin, resolution=2.0), grid)
+        self.assertEqual(len(GRID_CACHE), 2)
+
+        out = np.zeros((181, 361))
+        lat, lon, distances = distance_grid(origin, resolution=1.0, out=out)
+        self.assertIs(distances, out)
+        np.testing.assert_array_equal(out, grid[2])
+        self.assertEqual(len(GRID_CACHE), 2)
+
+    def test_generate_without_shapefiles(self):
+        # Exercises the grid computation and rendering without the Natural Earth download
+        for dtype in [np.float64, np.float32]:
+            generate_heatmap(None, None, origin, dtype=dtype)
+            plt.close('all')
+        self.assertEqual(GRID_CACHE[next(reversed(GRID_CACHE))][2].dtype, np.float32)
+
+    def test_render(self):
+        ax = render_heatmap(distance_grid(origin, resolution=0.1), show=False)
+        mesh = ax.collections[0]
+        self.assertLessEqual(mesh.get_array().size, 1024 * 512)
+        plt.close('all')
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,14 @@
 
+import os
+import tempfile
 import unittest
+import numpy as np
+import geopandas as gpd
+import shapely
 from SphereStats.isochrone_travel import haversine_distance, generate_isochrones, plot_isochrones  # Corrected module name
+from SphereStats.isochrone_travel import contour_polygons, geodesic_circle, circle_vertex_count, grid_offsets, \
+    grid_travel_times
+from SphereStats.isochrone_travel import batch_isochrones
 
 
 class TestIsochroneTravel(unittest.TestCase):
@@ -25,6 +33,102 @@ class TestIsochroneTravel(unittest.TestCase):
         # Ensure that the isochrones list contains 3 isochrones
         self.assertEqual(len(isochrones), 3, "There should be 3 isochrones.")
 
+    def test_contour_regions(self):
+        isochrones = generate_isochrones(40.7128, -74.0060, [1, 2, 3])
+        regions = [iso.geometry.iloc[0] for iso in isochrones]
+        for hours, region in zip([1, 2, 3], regions):
+            # A 60 km/h circle, in square degrees at New York's latitude
+            expected = np.pi * (60 * hours) ** 2 / (111.195 ** 2 * np.cos(np.radians(40.7128)))
+            self.assertAlmostEqual(region.area / expected, 1.0, delta=0.02)
+        self.assertTrue(regions[1].contains(regions[0]))
+        self.assertTrue(regions[2].contains(regions[1]))
+
+    def test_contour_holes(self):
+        x = np.linspace(-1, 1, 81)
+        radius = np.hypot(*np.meshgrid(x, x))
+        ring = np.abs(radius - 0.6)
+        region, = contour_polygons(x, x, ring, [0.2])
+        self.assertEqual(len(region.geoms), 1)
+        self.assertEqual(len(region.geoms[0].interiors), 1)
+        self.assertAlmostEqual(region.area, np.pi * (0.8 ** 2 - 0.4 ** 2), delta=0.02)
+
+    def test_buffer_fallback(self):
+        isochrones = generate_isochrones(40.7128, -74.0060, [1], method='buffer')
+        contoured = generate_isochrones(40.7128, -74.0060, [1])
+        self.assertTrue(isochrones[0].geometry.iloc[0].contains(contoured[0].geometry.iloc[0]))
+        with self.assertRaises(ValueError):
+            generate_isochrones(40.7128, -74.0060, [1], method='raster')
+
+    def test_analytic_circles(self):
+        analytic = generate_isochrones(40.7128, -74.0060, [1, 2, 3], method='analytic')
+        contoured = generate_isochrones(40.7128, -74.0060, [1, 2, 3])
+        for hours, circle, region in zip([1, 2, 3], analytic, contoured):
+            circle, region = circle.geometry.iloc[0], region.geometry.iloc[0]
+            expected = np.pi * (60 * hours) ** 2 / (111.195 ** 2 * np.cos(np.radians(40.7128)))
+            self.assertAlmostEqual(circle.area / expected, 1.0, delta=0.01)
+            # Mean gap between the boundaries, in km, within the 0.1 km default tolerance
+            self.assertLess(circle.symmetric_difference(region).area / circle.length * 111.195, 0.1)
+
+        # The boundary is on the circle and finer tolerances add vertices
+        lons, lats = np.array(geodesic_circle(40.7128, -74.0060, 120, tolerance=0.1).exterior.coords).T
+        np.testing.assert_allclose(haversine_distance(40.7128, -74.0060, lats, lons), 120)
+        self.assertGreater(circle_vertex_count(120, 0.01), circle_vertex_count(120, 1.0))
+
+    def test_high_latitude_grid(self):
+        # 180 km from Svalbard spans ~17 degrees of longitude: a fixed 10° grid would clip it
+        regions = generate_isochrones(78.2, 15.6, [3])
+        circle = generate_isochrones(78.2, 15.6, [3], method='analytic')[0].geometry.iloc[0]
+        region = regions[0].geometry.iloc[0]
+        self.assertAlmostEqual(region.area / circle.area, 1.0, delta=0.02)
+        np.testing.assert_allclose(region.bounds, circle.bounds, atol=0.2)
+
+        # Finer tolerances give finer grids, bounded in size
+        coarse, fine = grid_offsets([1], tolerance=1.0), grid_offsets([1], tolerance=0.1)
+        self.assertGreater(len(fine[0]), len(coarse[0]))
+        self.assertLessEqual(np.prod([len(axis) for axis in grid_offsets([1], tolerance=1e-4)]), 4_000_000)
+
+        # Rows beyond the pole are dropped from the travel-time grid
+        lats, lons, travel_times = grid_travel_times(89.0, 0.0, *grid_offsets([3], max_lat=89.0))
+        self.assertLessEqual(lats.max(), 90.0)
+        self.assertEqual(travel_times.shape, (len(lats), len(lons)))
+
+    def test_polar_cap(self):
+        cap = geodesic_circle(85.0, 0.0, 1000)
+        self.assertTrue(cap.is_valid)
+        self.assertEqual(cap.bounds[3], 90.0)
+        self.assertAlmostEqual(cap.bounds[2] - cap.bounds[0], 360.0, delta=1.0)
+        self.assertTrue(cap.contains(geodesic_circle(85.0, 0.0, 10).centroid))
+
+    def test_cap_holding_both_poles(self):
+        cap = geodesic_circle(0.0, 0.0, 15000)
+        self.assertTrue(cap.is_valid)
+        self.assertEqual(len(cap.interiors), 1)
+        rng = np.random.default_rng(0)
+        lats, lons = np.degrees(np.arcsin(rng.uniform(-1, 1, 5000))), rng.uniform(-180, 180, 5000)
+        lons = (lons - cap.bounds[0]) % 360 + cap.bounds[0]  # Into the polygon's longitude range
+        inside = shapely.contains_xy(cap, lons, lats)
+        np.testing.assert_array_equal(inside, haversine_distance(0.0, 0.0, lats, lons) <= 15000)
+
+    def test_batch_isochrones(self):
+        origins = [(40.7128, -74.0060), (78.2, 15.6), (-33.87, 151.21)]
+        batch = batch_isochrones(origins, [1, 3], chunk_size=2)
+        self.assertEqual(list(batch.index), [(0, 1.0), (0, 3.0), (1, 1.0), (1, 3.0), (2, 1.0), (2, 3.0)])
+        # Grids are sized per LAT_BAND band, so origins in other bands do not coarsen New York's
+        alone = batch_isochrones(origins[:1], [1, 3])
+        self.assertTrue(alone.geometry.loc[(0, 3.0)].equals(batch.geometry.loc[(0, 3.0)]))
+        for origin, (lat, lon) in enumerate(origins):
+            for hours in [1, 3]:
+                circle = geodesic_circle(lat, lon, 60 * hours)
+                region = batch.geometry.loc[(origin, float(hours))]
+                self.assertAlmostEqual(region.area / circle.area, 1.0, delta=0.01)
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'isochrones.gpkg')
+            pooled = batch_isochrones(origins, [1, 3], method='analytic', workers=2, chunk_size=1, output=output)
+            written = gpd.read_file(output).set_index(['origin', 'threshold']).sort_index()
+        self.assertEqual(list(pooled.index), list(batch.index))
+        self.assertTrue(all(a.equals(b) for a, b in zip(written.geometry, pooled.geometry)))
+
     def test_plot_generation(self):
         try:
             plot_isochrones()  # This will generate and display the plot
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+import unittest
+from SphereStats.lazy_imports import lazy_import
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules whose computational functions must be importable without plotting/GIS libraries
+COMPUTE_MODULES = [
+    'SphereStats',
+    'SphereStats.convex_hull',
+    'SphereStats.distance_calculations',
+    'SphereStats.distance_kernels',
+    'SphereStats.distance_matrix',
+    'SphereStats.flight_travel',
+    'SphereStats.great_circle',
+    'SphereStats.heatmap',
+    'SphereStats.isochrone_travel',
+    'SphereStats.Isochrone_NewYork',
+    'SphereStats.midpoint',
+    'SphereStats.network_routing',
+    'SphereStats.point_to_line_distance',
+    'SphereStats.sphere_stats',
+    'SphereStats.spherical_geometry',
+    'SphereStats.waypoints',
+]
+HEAVY_MODULES = ('matplotlib', 'mpl_toolkits', 'cartopy', 'shapely', 'geopandas', 'osmnx',
+                 'networkx', 'PIL', 'pyproj')
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_lazy_module(self):
+        json_module = lazy_import('json')
+        self.assertIn('not loaded', repr(json_module))
+        self.assertEqual(json_module.dumps([1]), '[1]')
+        self.assertIn('(loaded)', repr(json_module))
+
+    def test_lazy_attribute(self):
+        ordered_dict = lazy_import('collections', 'OrderedDict')
+        self.assertEqual(list(ordered_dict(a=1)), ['a'])
+
+    def test_missing_module_fails_on_use(self):
+        missing = lazy_import('SphereStats.no_such_module')
+        with self.assertRaises(ImportError):
+            missing.anything
+
+    def test_no_heavy_dependencies_at_import(self):
+        # Run in a fresh interpreter: other tests have already imported matplotlib here
+        code = (
+            "import sys\n"
+            f"for name in {COMPUTE_MODULES!r}: __import__(name)\n"
+            f"print(sorted({{m.split('.')[0] for m in sys.modules}} & set({HEAVY_MODULES!r})))\n"
+        )
+        output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout
+        self.assertEqual(output.strip(), '[]')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,13 +5,19 @@ import unittest
 import numpy as np
 import matplotlib.pyplot as plt  # Import plt here to fix the NameError
 from SphereStats.network_routing import (
-    to_cartesian,
     haversine_distance,
     dijkstra,
     create_network,
     plot_network,
     plot_routes  # Added plot_routes import
 )
+from SphereStats.distance_matrix import distance_matrix
+
+
+def edge_set(graph):
+    sources = np.repeat(np.arange(graph.n_nodes), np.diff(graph.offsets))
+    return set(zip(sources.tolist(), graph.targets.tolist()))
+
 
 class TestNetworkRouting(unittest.TestCase):
 
@@ -42,6 +48,41 @@ class TestNetworkRouting(unittest.TestCase):
         self.assertIn(self.cities[0], self.graph)
         self.assertIn(self.cities[1], self.graph[self.cities[0]])
 
+    def test_create_network_knn(self):
+        rng = np.random.default_rng(0)
+        points = np.column_stack([rng.uniform(30, 60, 400), rng.uniform(-20, 40, 400)])
+        graph = create_network(points, k=4, directed=True)
+        distances = distance_matrix(points)
+        np.fill_diagonal(distances, np.inf)
+        for node in [0, 57, 399]:
+            targets, weights = graph.neighbours(node)
+            np.testing.assert_array_equal(np.sort(targets), np.sort(np.argsort(distances[node])[:4]))
+            np.testing.assert_allclose(weights, distances[node, targets], rtol=1e-9)
+
+        undirected = create_network(points, k=4)
+        self.assertGreaterEqual(undirected.n_edges, graph.n_edges)
+        for node in [0, 57, 399]:
+            for target in graph.neighbours(node)[0]:
+                self.assertIn(node, undirected.neighbours(target)[0])
+
+    def test_create_network_max_distance(self):
+        rng = np.random.default_rng(1)
+        points = np.column_stack([rng.uniform(30, 60, 300), rng.uniform(-20, 40, 300)])
+        graph = create_network(points, max_distance=300)
+        distances = distance_matrix(points)
+        expected = (distances <= 300) & ~np.eye(300, dtype=bool)
+        self.assertEqual(graph.n_edges, np.count_nonzero(expected))
+        targets, weights = graph.neighbours(10)
+        np.testing.assert_array_equal(np.sort(targets), np.nonzero(expected[10])[0])
+        self.assertTrue(np.all(weights <= 300))
+
+        directed = create_network(points, max_distance=300, directed=True)
+        self.assertEqual(edge_set(directed), edge_set(graph))
+
+        limited = create_network(points, k=3, max_distance=300, directed=True)
+        self.assertTrue(np.all(limited.weights <= 300))
+        self.assertTrue(np.all(np.diff(limited.offsets) <= 3))
+
     def test_plot_network(self):
         """
         Test the plot_network function. This is primarily to ensure the function executes without errors.
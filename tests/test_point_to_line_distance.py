@@ -1,5 +1,7 @@
 import unittest
+import numpy as np
 from SphereStats.point_to_line_distance import point_to_line_distance
+from SphereStats.spherical_geometry import point_to_line_distance as geometry_point_to_line_distance
 
 
 class TestPointToLineDistance(unittest.TestCase):
@@ -19,6 +21,13 @@ class TestPointToLineDistance(unittest.TestCase):
         expected_distance = 199.62  # Adjust this based on correct calculation
         self.assertAlmostEqual(distance, expected_distance, places=2)
 
+    def test_requested_dtype(self):
+        # Both copies of the function return a scalar of the requested precision
+        args = (28.6139, 77.2090, 51.5074, -0.1278, 1.3521, 103.8198)
+        for function in (point_to_line_distance, geometry_point_to_line_distance):
+            self.assertEqual(type(function(*args, dtype=np.float32)), np.float32)
+            self.assertEqual(type(function(*args)), np.float64)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import numpy as np
+from SphereStats.csr_graph import shortest_path_tree
+from SphereStats.network_routing import dijkstra
+from SphereStats.route_cache import RouteCache
+from tests.test_csr_graph import random_graph
+
+
+class TestRouteCache(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = random_graph(200, 1000)
+        self.cache = RouteCache(self.graph, max_routes=8, max_trees=2)
+
+    def test_matches_dijkstra(self):
+        for start, goal in np.random.default_rng(1).integers(200, size=(100, 2)).tolist():
+            path, distance = self.cache.route(start, goal)
+            expected_path, expected = dijkstra(self.graph, start, goal)
+            self.assertAlmostEqual(distance, expected)
+            self.assertEqual(path, expected_path)
+
+    def test_hits_and_tree_reuse(self):
+        distances, _ = shortest_path_tree(self.graph, 0)
+        order = np.argsort(distances)
+        near, far = int(order[1]), int(order[np.isfinite(distances).sum() - 1])
+        self.cache.route(0, far)
+        self.assertEqual(self.cache.misses, 1)
+        self.cache.route(0, near)
+        self.assertEqual(self.cache.tree_hits, 1)
+        self.cache.route(0, far)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_coordinates(self):
+        start, goal = self.graph.node(3), self.graph.node(77)
+        self.assertEqual(self.cache.route(start, goal), dijkstra(self.graph, start, goal))
+        self.assertEqual(self.cache.route(start, goal), dijkstra(self.graph, start, goal))
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_eviction(self):
+        for goal in range(1, 21):
+            self.cache.route(goal % 5, goal)
+        self.assertEqual(len(self.cache), 8)
+        self.assertGreaterEqual(self.cache.evictions, 12)
+        self.assertLessEqual(self.cache.stats['trees'], 2)
+
+    def test_version_invalidates(self):
+        path, distance = self.cache.route(0, 150)
+        self.assertIsNotNone(path)
+        self.graph.set_weight(path[0], path[1], 1000.0)
+        new_path, new_distance = self.cache.route(0, 150)
+        self.assertEqual(self.cache.hits, 0)
+        self.assertEqual((new_path, new_distance), dijkstra(self.graph, 0, 150))
+        self.assertGreater(new_distance, distance)
+
+        self.graph.update_weights(self.graph.weights * 2)
+        self.assertAlmostEqual(self.cache.route(0, 150)[1], 2 * new_distance)
+        self.assertEqual(self.cache.stats['routes'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import numpy as np
+from SphereStats.distance_kernels import haversine
+from SphereStats.segment_distance import SegmentIndex, polygon_edges, prepare_edges, segment_distances
+from SphereStats.spherical_geometry import point_to_polygon_distance, points_to_polygon_distance
+
+
+class TestSegmentDistance(unittest.TestCase):
+
+    def setUp(self):
+        self.triangle = [
+            (35.0, -120.0),
+            (37.0, -122.0),
+            (36.0, -123.0),
+        ]
+
+    def test_cross_track_inside_segment(self):
+        # A point north of an equatorial segment projects onto its interior
+        edges = prepare_edges([[0, 0]], [[0, 10]])
+        distances, indices = segment_distances([[1, 5]], edges)
+        self.assertAlmostEqual(distances[0], haversine(1, 5, 0, 5), places=6)
+        self.assertEqual(indices[0], 0)
+
+    def test_clamped_to_endpoint(self):
+        # Beyond the end of the segment the nearest point is the endpoint, not the great circle
+        edges = prepare_edges([[0, 0]], [[0, 10]])
+        distances, _ = segment_distances([[0, 20], [1, -3]], edges)
+        self.assertAlmostEqual(distances[0], haversine(0, 20, 0, 10), places=6)
+        self.assertAlmostEqual(distances[1], haversine(1, -3, 0, 0), places=6)
+
+    def test_degenerate_edge(self):
+        edges = prepare_edges([[10, 10]], [[10, 10]])
+        distances, _ = segment_distances([[12, 10]], edges)
+        self.assertAlmostEqual(distances[0], haversine(12, 10, 10, 10), places=6)
+
+    def test_matches_scalar_polygon_distance(self):
+        distance = point_to_polygon_distance(36.5, -121.0, self.triangle)
+        self.assertAlmostEqual(distance, 33.79, places=2)
+
+    def test_batched_polygon_distance(self):
+        rng = np.random.default_rng(7)
+        points = np.column_stack([rng.uniform(30, 42, 200), rng.uniform(-128, -115, 200)])
+        edges = polygon_edges(self.triangle)
+        chunked, chunked_edges = points_to_polygon_distance(points, edges, max_bytes=8 * 64)
+        whole, whole_edges = points_to_polygon_distance(points, self.triangle)
+        np.testing.assert_allclose(chunked, whole)
+        np.testing.assert_array_equal(chunked_edges, whole_edges)
+        for point, distance in zip(points[:10], whole[:10]):
+            self.assertAlmostEqual(point_to_polygon_distance(*point, self.triangle), distance, places=9)
+
+    def test_closed_ring_is_accepted(self):
+        closed = self.triangle + [self.triangle[0]]
+        self.assertEqual(len(polygon_edges(closed).starts), 3)
+
+
+class TestSegmentIndex(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(11)
+        starts = np.column_stack([rng.uniform(-70, 70, 400), rng.uniform(-180, 180, 400)])
+        ends = starts + rng.normal(0, 8, (400, 2))
+        points = np.column_stack([rng.uniform(-90, 90, 2000), rng.uniform(-180, 180, 2000)])
+        match = SegmentIndex(starts, ends).nearest(points)
+        distances, indices = segment_distances(points, prepare_edges(starts, ends))
+        np.testing.assert_allclose(match.distance, distances, atol=1e-6)
+        np.testing.assert_array_equal(match.segment, indices)
+
+    def test_fraction_and_cross_track(self):
+        index = SegmentIndex([[0, 0]], [[0, 10]])
+        match = index.nearest([[1, 5], [-2, 2.5], [0, 20]])
+        np.testing.assert_allclose(match.fraction, [0.5, 0.25, 1.0], atol=1e-9)
+        self.assertAlmostEqual(match.cross_track[0], haversine(1, 5, 0, 5), places=6)
+        self.assertAlmostEqual(match.cross_track[1], -haversine(-2, 2.5, 0, 2.5), places=6)
+        self.assertAlmostEqual(match.distance[2], haversine(0, 20, 0, 10), places=6)
+
+    def test_long_segments_are_cut(self):
+        index = SegmentIndex([[0, 0], [0, 0]], [[0, 1], [0, 90]])
+        self.assertEqual(len(index), 2)
+        self.assertGreater(len(index.cap_radii), 2)
+        match = index.nearest([[1, 60]])
+        self.assertEqual(match.segment[0], 1)
+        self.assertAlmostEqual(match.distance[0], haversine(1, 60, 0, 60), places=6)
+
+    def test_empty_index(self):
+        with self.assertRaises(ValueError):
+            SegmentIndex(np.empty((0, 2)), np.empty((0, 2))).nearest([[0, 0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
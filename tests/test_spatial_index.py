@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from SphereStats.distance_matrix import distance_matrix
+from SphereStats.spatial_index import SphereIndex
+
+
+class TestSphereIndex(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.points = np.column_stack([np.degrees(np.arcsin(rng.uniform(-1, 1, 500))),
+                                       rng.uniform(-180, 180, 500)])
+        self.queries = np.array([
+            [40.7128, -74.0060],   # New York City
+            [-33.8688, 151.2093],  # Sydney
+            [89.9, 0.0],           # Near the North Pole
+            [0.0, 179.99],         # Next to the antimeridian
+        ])
+        self.index = SphereIndex(self.points)
+        self.expected = distance_matrix(self.queries, self.points)
+
+    def test_query_knn(self):
+        distances, indices = self.index.query_knn(self.queries, k=3)
+        self.assertEqual(distances.shape, (4, 3))
+        expected_indices = np.argsort(self.expected, axis=1)[:, :3]
+        np.testing.assert_array_equal(indices, expected_indices)
+        np.testing.assert_allclose(distances, np.take_along_axis(self.expected, expected_indices, axis=1),
+                                   rtol=1e-9)
+
+    def test_query_knn_single_point(self):
+        distance, index = self.index.query_knn(self.queries[0])
+        self.assertEqual(index, self.expected[0].argmin())
+        self.assertAlmostEqual(distance, self.expected[0].min(), places=6)
+
+    def test_query_knn_max_distance(self):
+        distances, indices = self.index.query_knn(self.queries, k=2, max_distance=1.0)
+        missing = np.isinf(distances)
+        self.assertTrue(np.all(indices[missing] == len(self.index)))
+
+    def test_query_radius(self):
+        r = 1500
+        matches, distances = self.index.query_radius(self.queries, r, return_distances=True, sort=True)
+        for row, (match, found) in enumerate(zip(matches, distances)):
+            np.testing.assert_array_equal(np.sort(match), np.nonzero(self.expected[row] <= r)[0])
+            np.testing.assert_allclose(found, self.expected[row, match], rtol=1e-9)
+            self.assertTrue(np.all(np.diff(found) >= 0))
+
+    def test_query_pairs(self):
+        r = 800
+        pairs, distances = self.index.query_pairs(r)
+        expected = distance_matrix(self.points)
+        within = np.triu(expected <= r, k=1)
+        self.assertEqual(len(pairs), np.count_nonzero(within))
+        self.assertTrue(np.all(within[pairs[:, 0], pairs[:, 1]]))
+        np.testing.assert_allclose(distances, expected[pairs[:, 0], pairs[:, 1]], rtol=1e-9)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index.pkl')
+            self.index.save(path)
+            loaded = SphereIndex.load(path)
+        distances, indices = loaded.query_knn(self.queries, k=2)
+        expected_distances, expected_indices = self.index.query_knn(self.queries, k=2)
+        np.testing.assert_array_equal(indices, expected_indices)
+        np.testing.assert_array_equal(distances, expected_distances)
+
+
+if __name__ == "__main__":
+    unittest.main()
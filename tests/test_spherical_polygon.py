@@ -0,0 +1,54 @@
+import unittest
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+from SphereStats.spherical_geometry import points_to_polygon_distance
+from SphereStats.spherical_polygon import SphericalPolygon, contains
+
+
+class TestSphericalPolygon(unittest.TestCase):
+
+    def setUp(self):
+        self.square = [[0, 0], [0, 10], [10, 10], [10, 0]]
+
+    def test_simple_polygon(self):
+        np.testing.assert_array_equal(contains(self.square, [[5, 5], [15, 5], [-1, 5]]), [True, False, False])
+        self.assertTrue(contains(self.square, (5, 5)))
+
+    def test_vertex_order_does_not_matter(self):
+        points = [[5, 5], [15, 5], [-5, -5]]
+        np.testing.assert_array_equal(contains(self.square, points), contains(self.square[::-1], points))
+
+    def test_antimeridian(self):
+        polygon = [[-5, 170], [-5, -170], [5, -170], [5, 170]]
+        np.testing.assert_array_equal(contains(polygon, [[0, 180], [0, 175], [0, -175], [0, 0], [0, 160]]),
+                                      [True, True, True, False, False])
+
+    def test_polar_cap(self):
+        cap = [[80, lon] for lon in range(-180, 180, 10)]
+        np.testing.assert_array_equal(contains(cap, [[90, 0], [85, 33], [75, 0], [-90, 0]]),
+                                      [True, True, False, False])
+        south = [[-70, lon] for lon in range(180, -180, -15)]
+        np.testing.assert_array_equal(contains(south, [[-90, 0], [-60, 0]]), [True, False])
+
+    def test_hole(self):
+        polygon = SphericalPolygon([self.square, [[4, 4], [4, 6], [6, 6], [6, 4]]])
+        np.testing.assert_array_equal(polygon.contains([[5, 5], [2, 2], [20, 20]]), [False, True, False])
+
+    def test_matches_shapely_away_from_edges(self):
+        rng = np.random.default_rng(0)
+        angles = np.linspace(0, 2 * np.pi, 12, endpoint=False)
+        radii = 1 + rng.uniform(0, 1, 12)
+        polygon = np.column_stack([10 + radii * np.cos(angles), 20 + radii * np.sin(angles)])
+        points = np.column_stack([rng.uniform(7, 13, 5000), rng.uniform(17, 23, 5000)])
+
+        # Planar and great-circle edges differ by a few km at this size
+        distances, _ = points_to_polygon_distance(points, polygon)
+        far = distances > 5
+        expected = shapely.contains_xy(Polygon(polygon[:, ::-1]), points[:, 1], points[:, 0])
+        inside = contains(polygon, points, max_bytes=8 * 1024)
+        np.testing.assert_array_equal(inside[far], expected[far])
+
+
+if __name__ == "__main__":
+    unittest.main()